@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端基准测试
+启动替身服务器（独立进程），在 offscreen 平台下驱动 TaskMonitorAPI、宠物挂件和进度窗口，
+统计服务器状态变化到界面刷新的延迟、每小时 CPU 时间和内存增长，结果保存为 JSON 便于回归比较。
+
+用法: python benchmarks/bench_e2e.py --duration 120 --transport http
+      python benchmarks/bench_e2e.py --baseline benchmarks/results/e2e_websocket_20250101-120000.json
+"""
+
+import argparse
+import bisect
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QTimer, QT_VERSION_STR, PYQT_VERSION_STR
+from task_monitor_api import TaskMonitorAPI, TaskStatus
+from multi_server_monitor import MultiServerMonitor
+from pet_widget import PetWidget
+from progress_window import ProgressWindow
+from power_monitor import wakeup_counter
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SCRIPT = os.path.join(ROOT, "benchmarks", "scenarios", "mixed.json")
+
+# 与基线比较的指标 (路径, 名称)，均为越小越好
+COMPARED_METRICS = [
+    (("latency_ms", "status", "p50"), "状态延迟 p50 (ms)"),
+    (("latency_ms", "status", "p95"), "状态延迟 p95 (ms)"),
+    (("latency_ms", "step", "p50"), "步骤延迟 p50 (ms)"),
+    (("latency_ms", "step", "p95"), "步骤延迟 p95 (ms)"),
+    (("cpu_seconds_per_hour",), "CPU (秒/小时)"),
+    (("rss_growth_mb_per_hour",), "内存增长 (MB/小时)"),
+]
+
+
+def free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def current_rss_mb():
+    """当前进程的常驻内存（MB），无法获取时返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 / 1024
+    except ImportError:
+        return None
+
+
+def percentiles(samples: list) -> dict:
+    """延迟样本的分位数（毫秒）"""
+    if not samples:
+        return {"count": 0}
+    samples = sorted(samples)
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+
+    return {"count": len(samples), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99),
+            "max": round(samples[-1] * 1000, 2)}
+
+
+def event_keys(task_id, status, progress) -> list:
+    """一次状态对应的比较键：状态变化和步骤变化"""
+    keys = [("status", task_id, status)]
+    if progress:
+        keys.append(("step", task_id, progress.get("node_id"), progress.get("step")))
+    return keys
+
+
+def load_server_events(path: str) -> dict:
+    """读取替身服务器的状态变化日志：键 -> 时间列表"""
+    events = {}
+    previous = set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            keys = set(event_keys(event.get("task_id"), event.get("status"), event.get("current_task_progress")))
+            # 只记录新出现的键（状态或步骤真正变化的时刻）
+            for key in keys - previous:
+                events.setdefault(key, []).append(event["t"])
+            previous = keys
+    return events
+
+
+class UiRecorder:
+    """记录进度窗口每次刷新时显示的新状态和新步骤"""
+
+    def __init__(self, window: ProgressWindow):
+        self.window = window
+        self.task_id = None
+        self.status = None
+        self.progress = None
+        self.records = []
+        self.recording = False
+        render = window._render_delta
+
+        def timed_render(delta):
+            render(delta)
+            self.on_render(delta, time.time())
+
+        window._render_delta = timed_render
+
+    def on_render(self, delta: dict, now: float):
+        previous = set(event_keys(self.task_id, self.status, self.progress))
+        self.task_id = delta.get("task_id", self.task_id)
+        self.status = delta.get("status", self.status)
+        self.progress = delta.get("current_task_progress", self.progress)
+        if not self.recording:
+            return
+        for key in set(event_keys(self.task_id, self.status, self.progress)) - previous:
+            self.records.append((key, now))
+
+
+def match_latencies(server_events: dict, ui_records: list) -> dict:
+    """为每个界面记录找到服务器上最近一次相同的变化，计算延迟"""
+    latencies = {"status": [], "step": []}
+    for key, ui_time in ui_records:
+        times = server_events.get(key)
+        if not times:
+            continue
+        index = bisect.bisect_right(times, ui_time) - 1
+        if index >= 0:
+            latencies[key[0]].append(ui_time - times[index])
+    return latencies
+
+
+def start_server(args, port: int, event_log: str) -> subprocess.Popen:
+    """启动替身服务器进程并等待就绪"""
+    command = [sys.executable, os.path.join(ROOT, "fake_comfyui_server.py"), "--port", str(port),
+               "--script", args.script, "--speed", str(args.speed), "--latency", str(args.latency),
+               "--jitter", str(args.jitter), "--error-rate", str(args.error_rate), "--event-log", event_log]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/task_monitor/status", timeout=1)
+            return process
+        except requests.exceptions.RequestException:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("替身服务器启动超时")
+
+
+def run(args) -> dict:
+    """运行一次基准测试，返回结果"""
+    port = free_port()
+    event_log = tempfile.NamedTemporaryFile(suffix=".jsonl", delete=False).name
+    server = start_server(args, port, event_log)
+
+    app = QApplication(sys.argv)
+    task_monitor = TaskMonitorAPI(f"http://127.0.0.1:{port}", args.refresh_interval, args.max_refresh_interval)
+    task_monitor.set_transport(args.transport)
+    server_monitor = MultiServerMonitor(task_monitor, "bench")
+
+    # 与主程序相同的连接方式
+    pet_widget = PetWidget("meizi")
+    progress_window = ProgressWindow()
+    server_monitor.status_changed.connect(lambda status: pet_widget.set_task_status(TaskStatus(status)))
+    server_monitor.progress_delta.connect(progress_window.apply_delta)
+    server_monitor.progress_delta.connect(
+        lambda _: pet_widget.set_progress(server_monitor.get_overall_progress_percentage()))
+    pet_widget.show()
+    progress_window.show()
+    recorder = UiRecorder(progress_window)
+
+    rss_samples = []
+    state = {}
+
+    def sample_memory():
+        rss = current_rss_mb()
+        if rss is not None:
+            rss_samples.append((time.monotonic(), rss))
+
+    def begin():
+        recorder.recording = True
+        state["cpu"] = time.process_time()
+        state["wall"] = time.monotonic()
+        sample_memory()
+        memory_timer.start(5000)
+
+    def finish():
+        state["cpu"] = time.process_time() - state["cpu"]
+        state["wall"] = time.monotonic() - state["wall"]
+        sample_memory()
+        app.quit()
+
+    memory_timer = QTimer()
+    memory_timer.timeout.connect(sample_memory)
+    QTimer.singleShot(int(args.warmup * 1000), begin)
+    QTimer.singleShot(int((args.warmup + args.duration) * 1000), finish)
+
+    server_monitor.start_monitoring()
+    app.exec_()
+    server_monitor.shutdown()
+    server.terminate()
+    server.wait(timeout=5)
+
+    server_events = load_server_events(event_log)
+    os.remove(event_log)
+    latencies = match_latencies(server_events, recorder.records)
+
+    growth = None
+    if len(rss_samples) >= 2:
+        # 最小二乘斜率，避免单次采样的抖动
+        count = len(rss_samples)
+        mean_t = sum(t for t, _ in rss_samples) / count
+        mean_m = sum(m for _, m in rss_samples) / count
+        variance = sum((t - mean_t) ** 2 for t, _ in rss_samples)
+        if variance > 0:
+            slope = sum((t - mean_t) * (m - mean_m) for t, m in rss_samples) / variance
+            growth = round(slope * 3600, 2)
+
+    step_events = sum(len(times) for key, times in server_events.items() if key[0] == "step")
+    return {
+        "latency_ms": {kind: percentiles(samples) for kind, samples in latencies.items()},
+        "step_events_server": step_events,
+        "step_events_shown": len(latencies["step"]),
+        "cpu_seconds": round(state["cpu"], 3),
+        "cpu_percent": round(state["cpu"] / state["wall"] * 100, 2),
+        "cpu_seconds_per_hour": round(state["cpu"] / state["wall"] * 3600, 1),
+        "rss_mb_start": round(rss_samples[0][1], 1) if rss_samples else None,
+        "rss_mb_end": round(rss_samples[-1][1], 1) if rss_samples else None,
+        "rss_growth_mb_per_hour": growth,
+        "wakeups_per_minute": {source: round(rate, 1) for source, rate in wakeup_counter.per_minute().items()},
+        "diff_stats": task_monitor.get_diff_stats()
+    }
+
+
+def lookup(results: dict, path: tuple):
+    """按路径取指标值"""
+    for key in path:
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare(results: dict, baseline: dict):
+    """打印与基线的对比"""
+    print(f"\n{'指标':<22} {'基线':>10} {'本次':>10} {'变化':>8}")
+    for path, label in COMPARED_METRICS:
+        old = lookup(baseline["results"], path)
+        new = lookup(results, path)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "-"
+        print(f"{label:<22} {old:>10} {new:>10} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端基准测试")
+    parser.add_argument("--duration", type=float, default=60, help="计量时长（秒）")
+    parser.add_argument("--warmup", type=float, default=5, help="预热时长（秒），不计入结果")
+    parser.add_argument("--transport", choices=["websocket", "http"], default="websocket")
+    parser.add_argument("--refresh-interval", type=int, default=1000)
+    parser.add_argument("--max-refresh-interval", type=int, default=5000)
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="替身服务器的任务脚本")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="结果文件，默认写入 benchmarks/results/")
+    parser.add_argument("--baseline", help="用于比较的历史结果文件")
+    args = parser.parse_args()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+    config["script"] = os.path.relpath(args.script, ROOT)
+    results = run(args)
+    report = {
+        "benchmark": "e2e",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "environment": {
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "pyqt": PYQT_VERSION_STR,
+            "platform": platform.platform()
+        },
+        "results": results
+    }
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"e2e_{args.transport}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+
+    print(json.dumps(results, indent=4, ensure_ascii=False))
+    print(f"\n结果已保存: {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ProgressWindow 更新开销基准测试
+对比旧实现（每次更新重建文本/颜色表并调用 setStyleSheet）与当前的增量 + 合并刷新实现
+
+用法: python benchmarks/bench_progress_window.py [--updates 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+from progress_window import ProgressWindow
+
+
+def make_payloads(count: int) -> list:
+    """生成一段采样过程的状态数据"""
+    payloads = []
+    for i in range(count):
+        payloads.append({
+            "status": "running",
+            "task_id": "bench-task",
+            "workflow_progress": {"total_nodes": 10, "executed_nodes": 4},
+            "current_task_progress": {"node_id": "5", "node_type": "KSampler",
+                                      "step": i % 200, "total_steps": 200},
+            "execution_time": i * 0.1,
+            "queue": {"running_count": 1, "pending_count": 3}
+        })
+    return payloads
+
+
+def legacy_update(window: ProgressWindow, progress_data: dict):
+    """旧版 update_progress 的逐次全量刷新"""
+    window.auto_hide_timer.stop()
+    status = progress_data.get("status", "idle")
+    status_text = {
+        "idle": "空闲", "running": "运行中", "completed": "已完成",
+        "error": "错误", "queued": "排队中"
+    }.get(status, status)
+    window.status_label.setText(f"状态: {status_text}")
+    status_colors = {
+        "idle": "#888888", "running": "#00ff00", "completed": "#4CAF50",
+        "error": "#f44336", "queued": "#ff9800"
+    }
+    color = status_colors.get(status, "#888888")
+    window.status_label.setStyleSheet(f"""
+            QLabel {{
+                color: {color};
+                font-size: 12px;
+                padding: 2px;
+            }}
+        """)
+    task_id = progress_data.get("task_id")
+    window.task_id_label.setText(f"任务ID: {task_id}" if task_id else "任务ID: 无")
+    window._update_workflow(progress_data.get("workflow_progress", {}))
+    window._update_node(progress_data.get("current_task_progress"))
+    window._update_time(progress_data.get("execution_time", 0))
+    window._update_queue(progress_data.get("queue", {}))
+
+
+def measure(app: QApplication, window: ProgressWindow, label: str, func, payloads: list) -> float:
+    """执行并返回每次调用的平均微秒数（包含最后一次合并刷新）"""
+    app.processEvents()
+    start = time.perf_counter()
+    for payload in payloads:
+        func(payload)
+    window.flush_updates()
+    app.processEvents()
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / len(payloads) * 1e6
+    print(f"{label:<28} {per_call:8.1f} us/次")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ProgressWindow 更新开销基准测试")
+    parser.add_argument("--updates", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    window = ProgressWindow()
+    window.show()
+    payloads = make_payloads(args.updates)
+
+    legacy = measure(app, window, "旧实现(全量+setStyleSheet)", lambda p: legacy_update(window, p), payloads)
+
+    def update_and_flush(payload):
+        window.update_progress(payload)
+        window.flush_updates()
+
+    immediate = measure(app, window, "全量更新(缓存样式)", update_and_flush, payloads)
+
+    def delta_and_flush(payload):
+        window.apply_delta({"current_task_progress": payload["current_task_progress"],
+                            "execution_time": payload["execution_time"]})
+        window.flush_updates()
+
+    delta = measure(app, window, "增量更新", delta_and_flush, payloads)
+
+    coalesced = measure(app, window, "增量更新(合并刷新)", lambda p: window.apply_delta(
+        {"current_task_progress": p["current_task_progress"], "execution_time": p["execution_time"]}), payloads)
+
+    print(f"\n相对旧实现: 全量 {legacy / immediate:.1f}x, 增量 {legacy / delta:.1f}x, 合并 {legacy / coalesced:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,24 +7,32 @@ ComfyUI 桌面宠物监控器
 
 import sys
 import os
+import argparse
+import time
 script_directory = os.path.dirname(os.path.abspath(__file__))
 if script_directory not in sys.path:
     sys.path.insert(1, script_directory) 
+from startup_profiler import StartupProfiler
+startup_profiler = StartupProfiler("--profile-startup" in sys.argv[1:])
+
 from PyQt5.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QAction, QMessageBox
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QIcon
+startup_profiler.mark("导入 PyQt5")
 
+# 启动时只导入显示宠物首帧所需的模块；监控、历史、设置对话框和进度窗口在首帧显示后再加载
 from config import ConfigManager
-from task_monitor_api import TaskMonitorAPI, TaskStatus
+from monitor_core import TaskStatus
+from power_monitor import wakeup_counter
 from pet_widget import PetWidget
-from progress_window import ProgressWindow
-from settings_dialog import SettingsDialog
+startup_profiler.mark("导入宠物模块")
 
 class ComfyUIPetMonitor(QApplication):
     """ComfyUI 宠物监控主应用"""
 
-    def __init__(self, argv):
+    def __init__(self, argv, options=None):
         super().__init__(argv)
+        self.options = options or parse_arguments([])
 
         # 设置应用属性
         self.setApplicationName("ComfyUI Pet Monitor")
@@ -34,49 +42,156 @@ class ComfyUIPetMonitor(QApplication):
         # 初始化组件
         self.config_manager = ConfigManager()
         self.task_monitor = None
+        self.server_monitor = None
+        self.power_monitor = None
+        self.history_recorder = None
+        self.eta_estimator = None
+        self.metrics_server = None
+        self.status_recorder = None
+        self.thumbnail_provider = None
         self.pet_widget = None
         self.progress_window = None
         self.settings_dialog = None
+        self.queue_browser = None
+        self.config_watcher = None
         self.tray_icon = None
 
         # 状态变量
         self.is_progress_window_visible = False
+        startup_profiler.mark("创建应用")
+
+        # 先显示宠物首帧，其余组件在下一轮事件循环中初始化
+        self.init_pet_widget()
+        startup_profiler.mark("加载宠物首帧")
+        QTimer.singleShot(0, self.finish_startup)
 
+    def init_pet_widget(self):
+        """创建宠物挂件并按保存的缩放比例和位置立即显示"""
+        selected_pet = self.config_manager.get("pet_settings.selected_pet", "meizi")
+        size_scale = self.config_manager.get("pet_settings.size_scale", 1.0)
+        self.pet_widget = PetWidget(selected_pet, size_scale)
+        self.pet_widget.double_clicked.connect(self.toggle_progress_window)
+        self.pet_widget.settings_requested.connect(self.show_settings)
+        self.pet_widget.quit_requested.connect(self.quit_application)
+        self.pet_widget.position_changed.connect(self.on_pet_position_changed)  # 连接位置变化信号
+        self.pet_widget.drag_finished.connect(self.on_pet_drag_finished)
+
+        position = self.config_manager.get("pet_settings.position", {"x": 1400, "y": 800})
+        self.pet_widget.set_position(position["x"], position["y"])
+        self.apply_window_flags()
+        self.pet_widget.show()
+
+    def finish_startup(self):
+        """首帧显示后初始化监控组件、托盘和其余设置"""
+        startup_profiler.mark("显示宠物首帧")
         self.init_components()
+        startup_profiler.mark("初始化监控组件")
         self.setup_tray_icon()
+        startup_profiler.mark("创建托盘图标")
         self.apply_settings()
+        startup_profiler.mark("应用设置")
+
+        # 配置文件被外部修改时立即应用
+        from config_watcher import ConfigFileWatcher
+        self.config_watcher = ConfigFileWatcher(self.config_manager, parent=self)
+        self.config_watcher.config_reloaded.connect(self.on_config_reloaded)
+        QTimer.singleShot(0, lambda: startup_profiler.finish("事件循环就绪"))
 
     def init_components(self):
         """初始化组件"""
+        from task_monitor_api import TaskMonitorAPI
+        from multi_server_monitor import MultiServerMonitor
+        from power_monitor import PowerStateMonitor
+        from eta_estimator import EtaEstimator
+
         # 初始化任务监控API
         server_url = self.config_manager.get_comfyui_url()
         refresh_interval = self.config_manager.get("monitor_settings.refresh_interval", 1000)
-
-        self.task_monitor = TaskMonitorAPI(server_url, refresh_interval)
-        self.task_monitor.status_changed.connect(self.on_status_changed)
-        self.task_monitor.progress_updated.connect(self.on_progress_updated)
-        self.task_monitor.error_occurred.connect(self.on_error_occurred)
-        self.task_monitor.connection_changed.connect(self.on_connection_changed)
-
-        # 初始化宠物挂件
-        selected_pet = self.config_manager.get("pet_settings.selected_pet", "meizi")
-        self.pet_widget = PetWidget(selected_pet)
-        self.pet_widget.double_clicked.connect(self.toggle_progress_window)
-        self.pet_widget.settings_requested.connect(self.show_settings)
-        self.pet_widget.quit_requested.connect(self.quit_application)
-        self.pet_widget.position_changed.connect(self.on_pet_position_changed)  # 连接位置变化信号
-
-        # 初始化进度窗口
-        self.progress_window = ProgressWindow()
-        self.progress_window.close_requested.connect(self.hide_progress_window)
-
-        # 设置进度窗口透明度
+        max_refresh_interval = self.config_manager.get("monitor_settings.max_refresh_interval", 5000)
+
+        self.task_monitor = TaskMonitorAPI(server_url, refresh_interval, max_refresh_interval)
+
+        # 多服务器汇总监控（主服务器之外的服务器在 apply_settings 中接入）
+        primary_name = self.config_manager.get_comfyui_servers()[0][0]
+        self.server_monitor = MultiServerMonitor(self.task_monitor, primary_name)
+        self.server_monitor.status_changed.connect(self.on_status_changed)
+        self.server_monitor.progress_delta.connect(self.on_progress_delta)
+        self.server_monitor.error_occurred.connect(self.on_error_occurred)
+        self.server_monitor.server_connection_changed.connect(self.on_connection_changed)
+        self.server_monitor.preview_frame.connect(self.on_preview_frame)
+
+        # 状态录制与回放（命令行参数 --record / --replay）
+        if self.options.record is not None or self.options.replay:
+            from status_recorder import StatusRecorder, ReplayTransport
+        if self.options.record is not None:
+            self.status_recorder = StatusRecorder(self.options.record or None)
+            self.server_monitor.set_recorder(self.status_recorder)
+            print(f"正在录制状态数据: {self.status_recorder.path}")
+        if self.options.replay:
+            replay = ReplayTransport(self.options.replay, self.options.replay_speed, self.options.replay_server)
+            replay.finished.connect(lambda: print("回放结束"))
+            self.task_monitor.set_replay(replay)
+            print(f"回放 {self.options.replay}: {len(replay.entries)} 条数据")
+
+        # 剩余时间估计：从历史单步耗时学习，模型在重启后继续使用
+        self.eta_estimator = EtaEstimator(self.config_manager.get("monitor_settings.eta_model_file", "eta_model.json"))
+        self.eta_estimator.persist = not self.options.replay
+        self.server_monitor.set_eta_estimator(self.eta_estimator)
+
+        # 任务历史：每个任务结束时在后台线程写入一行（回放的数据不记录）
+        if self.config_manager.get("monitor_settings.history_enabled", True) and not self.options.replay:
+            import sqlite3
+            from task_history import TaskHistoryStore, TaskHistoryRecorder
+            history_file = self.config_manager.get("monitor_settings.history_file", "task_history.db")
+            try:
+                self.history_recorder = TaskHistoryRecorder(TaskHistoryStore(history_file))
+                self.server_monitor.server_progress_updated.connect(self.history_recorder.observe)
+            except sqlite3.Error as e:
+                print(f"任务历史初始化失败: {e}")
+
+        # 输出缩略图：任务完成后在线程池中下载并缩放，回放时没有真实的输出
+        if self.config_manager.get("monitor_settings.thumbnails_enabled", True) and not self.options.replay:
+            from thumbnail_provider import ThumbnailProvider
+            self.thumbnail_provider = ThumbnailProvider(
+                size=self.config_manager.get("monitor_settings.thumbnail_size", 80),
+                disk_budget_mb=self.config_manager.get("monitor_settings.thumbnail_cache_mb", 64))
+            self.thumbnail_provider.thumbnails_changed.connect(self.on_thumbnails_changed)
+            self.server_monitor.server_progress_updated.connect(self.on_server_progress_updated)
+
+        # 省电模式：宠物和进度窗口都不可见或锁屏时挂起动画并降低轮询频率
+        self.power_monitor = PowerStateMonitor()
+        self.power_monitor.state_changed.connect(self.on_power_state_changed)
+
+    def get_progress_window(self):
+        """获取进度窗口，首次使用时才创建"""
+        if self.progress_window is None:
+            from progress_window import ProgressWindow
+            self.progress_window = ProgressWindow()
+            self.progress_window.close_requested.connect(self.hide_progress_window)
+            self.apply_progress_window_settings()
+            self.power_monitor.watch(self.progress_window)
+            if self.thumbnail_provider:
+                self.progress_window.set_thumbnails(self.thumbnail_provider.current_thumbnails())
+        return self.progress_window
+
+    def apply_progress_window_settings(self):
+        """应用进度窗口的透明度、偏移量和自动隐藏"""
         opacity = self.config_manager.get("monitor_settings.progress_window_opacity", 0.8)
         self.progress_window.set_opacity(opacity)
 
-        # 设置进度窗口偏移量
         offset = self.config_manager.get("monitor_settings.progress_window_offset", {"x": 0, "y": 50})
         self.progress_window.set_offset(offset["x"], offset["y"])
+        self.progress_window.set_auto_hide(self.config_manager.get("monitor_settings.auto_hide_progress", True))
+
+    def apply_window_flags(self):
+        """应用置顶设置（标志未变化时不调用 setWindowFlags，避免窗口被隐藏后重建）"""
+        always_on_top = self.config_manager.get("display_settings.always_on_top", True)
+        if always_on_top:
+            flags = self.pet_widget.windowFlags() | Qt.WindowStaysOnTopHint
+        else:
+            flags = self.pet_widget.windowFlags() & ~Qt.WindowStaysOnTopHint
+        if flags != self.pet_widget.windowFlags():
+            self.pet_widget.setWindowFlags(flags)
 
     def setup_tray_icon(self):
         """设置系统托盘图标"""
@@ -108,6 +223,11 @@ class ComfyUIPetMonitor(QApplication):
         show_progress_action.triggered.connect(self.show_progress_window)
         tray_menu.addAction(show_progress_action)
 
+        # 队列与历史
+        queue_browser_action = QAction("队列与历史", self)
+        queue_browser_action.triggered.connect(self.show_queue_browser)
+        tray_menu.addAction(queue_browser_action)
+
         tray_menu.addSeparator()
 
         # 设置
@@ -120,6 +240,11 @@ class ComfyUIPetMonitor(QApplication):
         about_action.triggered.connect(self.show_about)
         tray_menu.addAction(about_action)
 
+        # 诊断信息
+        diagnostics_action = QAction("诊断信息", self)
+        diagnostics_action.triggered.connect(self.show_diagnostics)
+        tray_menu.addAction(diagnostics_action)
+
         tray_menu.addSeparator()
 
         # 退出
@@ -141,46 +266,76 @@ class ComfyUIPetMonitor(QApplication):
         size_scale = self.config_manager.get("pet_settings.size_scale", 1.0)
         position = self.config_manager.get("pet_settings.position", {"x": 1400, "y": 800})
 
-        self.pet_widget.set_pet(selected_pet)
+        self.pet_widget.set_pet(selected_pet, size_scale)
         self.pet_widget.set_animation_speed(animation_speed)
-        self.pet_widget.set_size_scale(size_scale)
+        self.pet_widget.set_animation_mode(self.config_manager.get("pet_settings.animation_mode", "loop"))
+        frame_budget = self.config_manager.get("pet_settings.frame_memory_budget_mb", 64)
+        prefetch_frames = self.config_manager.get("pet_settings.prefetch_frames", 8)
+        indexed_color = self.config_manager.get("pet_settings.indexed_color_frames", True)
+        self.pet_widget.set_frame_budget(frame_budget, prefetch_frames, indexed_color)
         self.pet_widget.set_position(position["x"], position["y"])
 
         # 应用显示设置
-        always_on_top = self.config_manager.get("display_settings.always_on_top", True)
-        if always_on_top:
-            self.pet_widget.setWindowFlags(
-                self.pet_widget.windowFlags() | Qt.WindowStaysOnTopHint
-            )
-        else:
-            self.pet_widget.setWindowFlags(
-                self.pet_widget.windowFlags() & ~Qt.WindowStaysOnTopHint
-            )
+        self.apply_window_flags()
+        self.pet_widget.set_drag_enabled(self.config_manager.get("display_settings.enable_drag", True))
 
         # 应用监控设置
         refresh_interval = self.config_manager.get("monitor_settings.refresh_interval", 1000)
         self.task_monitor.set_refresh_interval(refresh_interval)
-
-        server_url = self.config_manager.get_comfyui_url()
-        self.task_monitor.set_base_url(server_url)
-
-        # 应用进度窗口设置
-        opacity = self.config_manager.get("monitor_settings.progress_window_opacity", 0.8)
-        self.progress_window.set_opacity(opacity)
-
-        offset = self.config_manager.get("monitor_settings.progress_window_offset", {"x": 0, "y": 50})
-        self.progress_window.set_offset(offset["x"], offset["y"])
+        self.server_monitor.set_refresh_interval(refresh_interval)
+        max_refresh_interval = self.config_manager.get("monitor_settings.max_refresh_interval", 5000)
+        self.task_monitor.set_max_refresh_interval(max_refresh_interval)
+        self.server_monitor.set_max_refresh_interval(max_refresh_interval)
+
+        transport = self.config_manager.get("monitor_settings.transport", "websocket")
+        self.task_monitor.set_transport(transport)
+        self.server_monitor.set_transport(transport)
+
+        power_save_interval = self.config_manager.get("monitor_settings.power_save_interval", 10000)
+        self.task_monitor.set_power_save_interval(power_save_interval)
+        self.server_monitor.set_power_save_interval(power_save_interval)
+
+        servers = self.config_manager.get_comfyui_servers()
+        if self.options.replay:
+            # 回放时只使用主服务器（回放数据）
+            servers = servers[:1]
+        self.server_monitor.set_servers(servers)
+        if self.queue_browser is not None:
+            self.queue_browser.set_servers(self.config_manager.get_comfyui_servers())
+        self.apply_metrics_settings()
+
+        # 应用进度窗口设置（窗口尚未创建时在创建时应用）
+        if self.progress_window is not None:
+            self.apply_progress_window_settings()
 
         # 显示宠物
         self.pet_widget.show()
+        self.power_monitor.watch(self.pet_widget)
 
         # 开始监控
-        self.task_monitor.start_monitoring()
+        self.server_monitor.start_monitoring()
+
+    def apply_metrics_settings(self):
+        """按设置启动、重启或停止指标接口"""
+        enabled = self.config_manager.get("monitor_settings.metrics_enabled", False)
+        host = self.config_manager.get("monitor_settings.metrics_host", "127.0.0.1")
+        port = self.config_manager.get("monitor_settings.metrics_port", 9464)
+
+        if self.metrics_server and (not enabled or (self.metrics_server.host, self.metrics_server.port) != (host, port)):
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if enabled and not self.metrics_server:
+            from metrics import MetricsServer
+            self.metrics_server = MetricsServer(host, port)
+            if not self.metrics_server.start():
+                self.metrics_server = None
 
     def on_status_changed(self, status: str):
         """状态变化处理"""
         try:
             task_status = TaskStatus(status)
+            # 先同步进度，progress 动画模式下新任务从对应帧开始
+            self.pet_widget.set_progress(self.server_monitor.get_overall_progress_percentage())
             self.pet_widget.set_task_status(task_status)
 
             # 更新托盘图标提示
@@ -197,22 +352,46 @@ class ComfyUIPetMonitor(QApplication):
         except ValueError:
             print(f"未知状态: {status}")
 
-    def on_progress_updated(self, progress_data):
-        """进度更新处理"""
+    def on_progress_delta(self, delta):
+        """进度增量更新处理（窗口隐藏期间的变化在显示时整体刷新）"""
+        if "workflow_progress" in delta or "current_task_progress" in delta or "server_name" in delta:
+            self.pet_widget.set_progress(self.server_monitor.get_overall_progress_percentage())
+
         if self.is_progress_window_visible:
-            self.progress_window.update_progress(progress_data)
+            self.progress_window.apply_delta(delta)
+
+    def on_server_progress_updated(self, server_name: str, data: dict):
+        """某个服务器的任务完成后加载其输出缩略图"""
+        monitor = self.server_monitor.monitors.get(server_name)
+        if data.get("status") == TaskStatus.COMPLETED.value and data.get("task_id") and monitor:
+            self.thumbnail_provider.request_outputs(monitor.base_url, data["task_id"])
+
+    def on_thumbnails_changed(self):
+        """缩略图就绪后更新进度窗口（窗口尚未创建时在创建时设置）"""
+        if self.progress_window is not None:
+            self.progress_window.set_thumbnails(self.thumbnail_provider.current_thumbnails())
+
+    def on_preview_frame(self, server_name: str, message, offset: int, image_format: str):
+        """实时预览帧：只显示进度窗口中当前展示的服务器，窗口隐藏时不解码"""
+        if self.is_progress_window_visible and server_name == self.server_monitor.last_aggregate.get("server_name"):
+            self.progress_window.submit_preview(message, offset, image_format)
 
     def on_error_occurred(self, error_msg: str):
         """错误处理"""
         print(f"错误: {error_msg}")
         # 可以在这里添加错误通知
 
-    def on_connection_changed(self, is_connected: bool):
+    def on_connection_changed(self, server_name: str, is_connected: bool):
         """连接状态变化处理"""
         if is_connected:
-            print("已连接到 ComfyUI 服务器")
+            print(f"已连接到 ComfyUI 服务器 {server_name}")
         else:
-            print("与 ComfyUI 服务器连接断开")
+            print(f"与 ComfyUI 服务器 {server_name} 连接断开")
+
+    def on_power_state_changed(self):
+        """窗口可见性或锁屏状态变化处理"""
+        self.pet_widget.set_suspended(not self.power_monitor.is_active(self.pet_widget))
+        self.server_monitor.set_power_saving(not self.power_monitor.any_active())
 
     def on_pet_position_changed(self, x: int, y: int):
         """宠物位置变化处理"""
@@ -221,6 +400,11 @@ class ComfyUIPetMonitor(QApplication):
             center_pos = self.pet_widget.get_center_position()
             self.progress_window.update_position_from_pet_center(center_pos["x"], center_pos["y"])
 
+    def on_pet_drag_finished(self, x: int, y: int):
+        """拖动结束后保存位置（配置写入会合并并在后台进行）"""
+        self.config_manager.set("pet_settings.position", {"x": x, "y": y})
+        self.config_manager.save_config()
+
     def toggle_progress_window(self):
         """切换进度窗口显示"""
         if self.is_progress_window_visible:
@@ -230,13 +414,13 @@ class ComfyUIPetMonitor(QApplication):
 
     def show_progress_window(self):
         """显示进度窗口"""
-        if not self.is_progress_window_visible:
+        if not self.is_progress_window_visible and self.server_monitor:
             center_pos = self.pet_widget.get_center_position()
-            self.progress_window.show_at_center_position(center_pos["x"], center_pos["y"])
+            self.get_progress_window().show_at_center_position(center_pos["x"], center_pos["y"])
             self.is_progress_window_visible = True
 
             # 立即更新进度信息
-            progress_data = self.task_monitor.get_progress_info()
+            progress_data = self.server_monitor.get_progress_info()
             self.progress_window.update_progress(progress_data)
 
     def hide_progress_window(self):
@@ -245,6 +429,17 @@ class ComfyUIPetMonitor(QApplication):
             self.progress_window.hide()
             self.is_progress_window_visible = False
 
+    def show_queue_browser(self):
+        """显示队列与历史窗口"""
+        if not self.queue_browser:
+            from queue_browser import QueueBrowser
+            self.queue_browser = QueueBrowser(self.config_manager.get_comfyui_servers())
+            self.server_monitor.server_progress_updated.connect(self.queue_browser.on_server_progress)
+
+        self.queue_browser.show()
+        self.queue_browser.raise_()
+        self.queue_browser.activateWindow()
+
     def toggle_pet_visibility(self):
         """切换宠物显示"""
         if self.pet_widget.isVisible():
@@ -257,6 +452,7 @@ class ComfyUIPetMonitor(QApplication):
     def show_settings(self):
         """显示设置对话框"""
         if not self.settings_dialog:
+            from settings_dialog import SettingsDialog
             self.settings_dialog = SettingsDialog(self.config_manager)
             self.settings_dialog.settings_changed.connect(self.on_settings_changed)
 
@@ -272,6 +468,11 @@ class ComfyUIPetMonitor(QApplication):
         self.config_manager.set("pet_settings.position", pet_pos)
         self.config_manager.save_config()
 
+    def on_config_reloaded(self):
+        """配置文件被外部修改后重新应用设置"""
+        print("配置文件已更新，重新应用设置")
+        self.apply_settings()
+
     def show_about(self):
         """显示关于对话框"""
         QMessageBox.about(
@@ -288,6 +489,49 @@ class ComfyUIPetMonitor(QApplication):
             "• 可自定义设置"
         )
 
+    def show_diagnostics(self):
+        """显示诊断信息"""
+        lines = ["定时器唤醒（次/分钟）:"]
+        for source, rate in sorted(wakeup_counter.per_minute().items()):
+            lines.append(f"  {source}: {rate:.0f}")
+
+        lines.append("")
+        lines.append(f"省电模式: {'是' if self.task_monitor.scheduler.power_saving else '否'}")
+        for name, monitor in self.server_monitor.monitors.items():
+            stats = monitor.get_diff_stats()
+            lines.append(f"{name}: 轮询间隔 {monitor.get_effective_refresh_interval()} ms"
+                         f" ({monitor.get_effective_poll_rate():.2f} 次/秒)，"
+                         f"无变化 {stats['noop_ticks']}/{stats['ticks']}")
+
+        lines.append("")
+        lines.extend(self.frame_memory_lines())
+
+        if self.history_recorder:
+            summary = self.history_recorder.store.summary(since=time.time() - 24 * 3600)
+            counts = summary["status_counts"]
+            lines.append("")
+            lines.append(f"最近 24 小时任务: {summary['count']}（完成 {counts.get('completed', 0)}，"
+                         f"错误 {counts.get('error', 0)}，中断 {counts.get('interrupted', 0)}），"
+                         f"平均耗时 {summary['avg_duration']:.1f} 秒")
+
+        QMessageBox.information(None, "诊断信息", "\n".join(lines))
+
+    def frame_memory_lines(self) -> list:
+        """当前宠物帧占用的内存"""
+        report = self.pet_widget.frames.memory_report()
+        mb = 1024 * 1024
+        lines = [f"宠物帧内存: {report['pet']} {report['total_bytes'] / mb:.2f} MB"
+                 f"（上限 {report['budget_bytes'] / mb:.0f} MB）"]
+        if report["unique_frames"] is not None:
+            lines.append(f"  帧存储: {report['frames']} 帧，去重后 {report['unique_frames']} 帧，"
+                         f"{'索引色' if report['indexed'] else 'ARGB'} {report['store_bytes'] / mb:.2f} MB")
+        else:
+            lines.append(f"  逐帧解码: {report['frames']} 帧")
+        if report["source_bytes"]:
+            lines.append(f"  原始帧: {report['source_bytes'] / mb:.2f} MB")
+        lines.append(f"  显示缓存: {report['pixmap_count']} 帧 {report['pixmap_bytes'] / mb:.2f} MB")
+        return lines
+
     def on_tray_activated(self, reason):
         """托盘图标激活处理"""
         if reason == QSystemTrayIcon.DoubleClick:
@@ -300,18 +544,49 @@ class ComfyUIPetMonitor(QApplication):
             pet_pos = self.pet_widget.get_position()
             self.config_manager.set("pet_settings.position", pet_pos)
             self.config_manager.save_config()
+        self.config_manager.flush()
+
+        # 停止监控并结束后台请求线程
+        if self.server_monitor:
+            self.server_monitor.shutdown()
+
+        # 结束队列与历史的请求线程
+        if self.queue_browser:
+            self.queue_browser.shutdown()
 
-        # 停止监控
-        if self.task_monitor:
-            self.task_monitor.stop_monitoring()
+        # 写完录制数据
+        if self.status_recorder:
+            self.status_recorder.close()
+
+        # 停止指标接口
+        if self.metrics_server:
+            self.metrics_server.stop()
+
+        # 保存剩余时间模型，写完剩余的任务历史
+        if self.eta_estimator:
+            self.eta_estimator.save()
+        if self.history_recorder:
+            self.history_recorder.close()
 
         # 退出应用
         self.quit()
 
+def parse_arguments(argv):
+    """解析命令行参数（Qt 自身的参数原样保留）"""
+    parser = argparse.ArgumentParser(description="ComfyUI 桌面宠物监控器")
+    parser.add_argument("--record", nargs="?", const="", metavar="PATH",
+                        help="把收到的状态数据录制到 gzip JSONL 文件（默认 recordings/ 下按时间命名）")
+    parser.add_argument("--replay", metavar="PATH", help="回放录制文件，代替连接服务器")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="回放倍速，0 表示不等待")
+    parser.add_argument("--replay-server", help="录制文件中包含多个服务器时要回放的服务器")
+    parser.add_argument("--profile-startup", action="store_true", help="输出启动各阶段和模块导入的耗时（单个模块可配合 python -X importtime 查看）")
+    options, _ = parser.parse_known_args(argv)
+    return options
+
 def main():
     """主函数"""
     # 创建应用
-    app = ComfyUIPetMonitor(sys.argv)
+    app = ComfyUIPetMonitor(sys.argv, parse_arguments(sys.argv[1:]))
 
     # 检查是否支持系统托盘
     if not QSystemTrayIcon.isSystemTrayAvailable():
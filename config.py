@@ -1,26 +1,66 @@
+import copy
+import hashlib
 import json
 import os
-from typing import Dict, Any
+import threading
+import time
+from typing import Dict, Any, Optional
+
+_MISSING = object()  # 键索引中表示路径不存在
+_UNRESOLVED = object()  # 键索引中尚无该路径
 
 class ConfigManager:
-    """配置管理器"""
+    """配置管理器
+
+    get() 通过点分隔路径的缓存索引查找，每个路径只在配置变化后的首次访问时解析一次。
+    save_config() 只安排保存：短时间内的多次保存合并为一次，由后台线程写入临时文件后替换，
+    程序退出前调用 flush() 写完。reload_if_changed() 在文件被外部修改后重新加载。
+    """
 
-    def __init__(self, config_file: str = "config.json"):
+    def __init__(self, config_file: str = "config.json", save_delay: float = 0.5):
         self.config_file = config_file
+        self.save_delay = save_delay  # 合并保存的等待时间（秒）
+        self.key_index: Dict[str, Any] = {}  # 点分隔路径 -> 值
+        self.file_digest = None  # 最近一次读取或写入的文件内容摘要，用于忽略自身的写入
+
+        # 后台保存：pending_text 为等待写入的内容；写文件时持有 write_lock，不阻塞 save_config()
+        self.save_lock = threading.Lock()
+        self.save_condition = threading.Condition(self.save_lock)
+        self.write_lock = threading.Lock()
+        self.pending_text: Optional[str] = None
+        self.save_thread = None
+        self.last_save_ok = True
         self.default_config = {
             "comfyui_server": {
                 "host": "127.0.0.1",
                 "port": 8188,
-                "protocol": "http"
+                "protocol": "http",
+                "extra_servers": []  # 额外监控的服务器 [{"name": "...", "url": "http://host:port"}]
             },
             "pet_settings": {
                 "selected_pet": "meizi",
                 "animation_speed": 250,  # 毫秒
+                "animation_mode": "loop",  # loop: 运行时循环播放；progress: 按任务进度选择帧
                 "size_scale": 1.0,
+                "frame_memory_budget_mb": 64,  # 解码帧 LRU 的内存上限
+                "prefetch_frames": 8,  # 在当前帧之后预取的帧数
+                "indexed_color_frames": True,  # 颜色不超过 256 种的宠物以 8 位索引色存储帧
                 "position": {"x": 1400, "y": 800}
             },
             "monitor_settings": {
-                "refresh_interval": 1000,  # 毫秒
+                "refresh_interval": 1000,  # 毫秒，任务运行时的轮询间隔
+                "max_refresh_interval": 5000,  # 毫秒，空闲时逐步放慢到的最大轮询间隔
+                "power_save_interval": 10000,  # 毫秒，宠物和进度窗口都不可见或锁屏时的轮询间隔
+                "history_enabled": True,  # 记录每个任务的耗时和结果
+                "history_file": "task_history.db",
+                "eta_model_file": "eta_model.json",  # 按节点类型学习的单步耗时，用于预测剩余时间
+                "thumbnails_enabled": True,  # 任务完成后在进度窗口显示输出缩略图
+                "thumbnail_size": 80,  # 缩略图边长（像素）
+                "thumbnail_cache_mb": 64,  # 缩略图磁盘缓存上限
+                "metrics_enabled": False,  # 在本地提供 Prometheus 指标接口
+                "metrics_host": "127.0.0.1",
+                "metrics_port": 9464,
+                "transport": "websocket",  # websocket: 订阅 /ws 推送，不可用时回退到 HTTP 轮询；http: 仅轮询
                 "auto_hide_progress": True,
                 "progress_window_opacity": 0.8,
                 "progress_window_offset": {"x": 0, "y": 50}  # 相对于宠物中心点的偏移
@@ -33,39 +73,133 @@ class ConfigManager:
         }
         self.config = self.load_config()
 
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self._config
+
+    @config.setter
+    def config(self, config: Dict[str, Any]):
+        self._config = config
+        self.key_index.clear()
+
     def load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
         if os.path.exists(self.config_file):
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
+                with open(self.config_file, 'rb') as f:
+                    content = f.read()
+                config = json.loads(content.decode('utf-8'))
+                self.file_digest = hashlib.blake2b(content, digest_size=16).digest()
                 # 合并默认配置，确保所有必要的键都存在
                 return self._merge_config(self.default_config, config)
-            except (json.JSONDecodeError, IOError) as e:
+            except (json.JSONDecodeError, UnicodeDecodeError, IOError) as e:
                 print(f"配置文件加载失败: {e}")
-                return self.default_config.copy()
+                return copy.deepcopy(self.default_config)
         else:
-            return self.default_config.copy()
+            return copy.deepcopy(self.default_config)
 
-    def save_config(self) -> bool:
-        """保存配置文件"""
+    def reload_if_changed(self) -> bool:
+        """文件内容与最近一次读取或写入的不同时重新加载，返回是否加载了新配置"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
-            return True
-        except IOError as e:
-            print(f"配置文件保存失败: {e}")
+            with open(self.config_file, 'rb') as f:
+                content = f.read()
+        except IOError:
             return False
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        with self.save_lock:
+            if digest == self.file_digest or self.pending_text is not None:
+                # 自身写入的结果，或还有未写入的修改（稍后会覆盖文件）
+                return False
+        try:
+            config = json.loads(content.decode('utf-8'))
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            # 编辑器可能分多次写入，等待下一次变化
+            print(f"配置文件重新加载失败: {e}")
+            return False
+        if not isinstance(config, dict):
+            return False
+        self.file_digest = digest
+        self.config = self._merge_config(self.default_config, config)
+        return True
+
+    def reset_to_defaults(self):
+        """恢复默认配置"""
+        self.config = copy.deepcopy(self.default_config)
+
+    def save_config(self) -> bool:
+        """安排保存配置文件（合并短时间内的多次保存，在后台线程中写入）"""
+        text = json.dumps(self.config, indent=4, ensure_ascii=False)
+        with self.save_lock:
+            self.pending_text = text
+            if self.save_thread is None or not self.save_thread.is_alive():
+                self.save_thread = threading.Thread(target=self._save_loop, name="ConfigSaver", daemon=True)
+                self.save_thread.start()
+            self.save_condition.notify()
+        return True
+
+    def flush(self) -> bool:
+        """立即写入尚未保存的配置，返回最近一次写入是否成功"""
+        with self.save_lock:
+            text, self.pending_text = self.pending_text, None
+        if text is not None:
+            self._write(text)
+        else:
+            # 等待后台线程正在进行的写入完成
+            with self.write_lock:
+                pass
+        return self.last_save_ok
+
+    def _save_loop(self):
+        """后台保存：收到保存请求后等待 save_delay，期间的新请求合并为一次写入"""
+        while True:
+            with self.save_lock:
+                while self.pending_text is None:
+                    if not self.save_condition.wait(timeout=30):
+                        # 长时间没有保存请求时结束线程，下次保存时重新创建
+                        self.save_thread = None
+                        return
+                deadline = time.monotonic() + self.save_delay
+                while self.pending_text is not None and deadline > time.monotonic():
+                    self.save_condition.wait(timeout=deadline - time.monotonic())
+                text, self.pending_text = self.pending_text, None
+            if text is not None:
+                self._write(text)
+
+    def _write(self, text: str):
+        """写入临时文件后原子替换"""
+        content = text.encode('utf-8')
+        temp_file = self.config_file + ".tmp"
+        with self.write_lock:
+            previous_digest = self.file_digest
+            try:
+                with open(temp_file, 'wb') as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # 先记录摘要，文件监视收到这次替换时不会当作外部修改
+                self.file_digest = hashlib.blake2b(content, digest_size=16).digest()
+                os.replace(temp_file, self.config_file)
+                self.last_save_ok = True
+            except IOError as e:
+                self.file_digest = previous_digest
+                print(f"配置文件保存失败: {e}")
+                self.last_save_ok = False
 
     def get(self, key_path: str, default=None):
         """获取配置值，支持点分隔的路径"""
-        keys = key_path.split('.')
+        value = self.key_index.get(key_path, _UNRESOLVED)
+        if value is _UNRESOLVED:
+            value = self.key_index[key_path] = self._resolve(key_path)
+        return default if value is _MISSING else value
+
+    def _resolve(self, key_path: str):
+        """沿点分隔路径查找值，路径不存在时返回 _MISSING"""
         value = self.config
-        for key in keys:
+        for key in key_path.split('.'):
             if isinstance(value, dict) and key in value:
                 value = value[key]
             else:
-                return default
+                return _MISSING
         return value
 
     def set(self, key_path: str, value):
@@ -77,6 +211,7 @@ class ConfigManager:
                 config[key] = {}
             config = config[key]
         config[keys[-1]] = value
+        self.key_index.clear()
 
     def get_comfyui_url(self) -> str:
         """获取 ComfyUI 服务器 URL"""
@@ -85,23 +220,48 @@ class ConfigManager:
         port = self.get("comfyui_server.port", 8188)
         return f"{protocol}://{host}:{port}"
 
+    def get_comfyui_servers(self) -> list:
+        """获取所有需要监控的服务器 [(名称, URL)]，第一个为主服务器"""
+        host = self.get("comfyui_server.host", "127.0.0.1")
+        port = self.get("comfyui_server.port", 8188)
+        servers = [(f"{host}:{port}", self.get_comfyui_url())]
+        names = {servers[0][0]}
+
+        extra_servers = self.get("comfyui_server.extra_servers", [])
+        if not isinstance(extra_servers, list):
+            extra_servers = []
+        for server in extra_servers:
+            # 跳过手工编辑配置时写错的条目
+            if not isinstance(server, dict):
+                continue
+            url = str(server.get("url") or "").strip().rstrip('/')
+            if not url:
+                continue
+            name = server.get("name") or url
+            if name in names:
+                name = url
+            if name in names:
+                continue
+            names.add(name)
+            servers.append((name, url))
+        return servers
+
     def get_available_pets(self) -> list:
         """获取可用的宠物列表"""
+        from pet_source import is_pet_directory
         pets = []
         images_dir = "images"
         if os.path.exists(images_dir):
             for item in os.listdir(images_dir):
                 item_path = os.path.join(images_dir, item)
-                if os.path.isdir(item_path):
-                    # 检查是否包含序列图片
-                    files = os.listdir(item_path)
-                    if any(f.endswith('.png') for f in files):
-                        pets.append(item)
+                # 包含清单、动图或序列图片的目录
+                if os.path.isdir(item_path) and is_pet_directory(item_path):
+                    pets.append(item)
         return pets
 
     def _merge_config(self, default: dict, user: dict) -> dict:
-        """递归合并配置，用户配置覆盖默认配置"""
-        result = default.copy()
+        """递归合并配置，用户配置覆盖默认配置（结果不与默认配置共享嵌套对象）"""
+        result = copy.deepcopy(default)
         for key, value in user.items():
             if key in result and isinstance(result[key], dict) and isinstance(value, dict):
                 result[key] = self._merge_config(result[key], value)
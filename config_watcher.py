@@ -0,0 +1,45 @@
+import os
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+from config import ConfigManager
+
+class ConfigFileWatcher(QObject):
+    """监视配置文件，被外部修改后重新加载并发出 config_reloaded
+
+    同时监视文件和所在目录：编辑器常用"写临时文件再重命名"的方式保存，
+    原文件被替换后会从监视列表中消失，需要在检查时重新添加。
+    短时间内的多次变化合并为一次检查；程序自身的保存由 ConfigManager 按内容摘要忽略。
+    """
+
+    # 信号定义
+    config_reloaded = pyqtSignal()  # 已加载外部修改后的配置
+
+    def __init__(self, config_manager: ConfigManager, delay: int = 200, parent=None):
+        super().__init__(parent)
+        self.config_manager = config_manager
+        self.path = os.path.abspath(config_manager.config_file)
+
+        self.check_timer = QTimer(self)
+        self.check_timer.setSingleShot(True)
+        self.check_timer.setInterval(delay)
+        self.check_timer.timeout.connect(self.check)
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._on_changed)
+        self.watcher.directoryChanged.connect(self._on_changed)
+        self.watcher.addPath(os.path.dirname(self.path))
+        self._watch_file()
+
+    def _watch_file(self):
+        """文件存在且未被监视时加入监视列表"""
+        if self.path not in self.watcher.files() and os.path.exists(self.path):
+            self.watcher.addPath(self.path)
+
+    def _on_changed(self, _):
+        """文件或目录变化：等待写入完成后再检查"""
+        self.check_timer.start()
+
+    def check(self):
+        """检查配置文件内容是否被外部修改"""
+        self._watch_file()
+        if self.config_manager.reload_if_changed():
+            self.config_reloaded.emit()
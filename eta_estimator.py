@@ -0,0 +1,175 @@
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+ETA_MODEL_FILE = "eta_model.json"
+
+class RunningAverage:
+    """指数加权平均：前几个样本按算术平均累计，之后按固定权重衰减，每个样本 O(1)"""
+
+    def __init__(self, alpha: float = 0.2, value: float = 0.0, samples: int = 0):
+        self.alpha = alpha
+        self.value = value
+        self.samples = samples
+
+    def add(self, sample: float):
+        """加入一个样本"""
+        self.samples += 1
+        weight = max(self.alpha, 1.0 / self.samples)
+        self.value += (sample - self.value) * weight
+
+    def known(self) -> bool:
+        """是否已有样本"""
+        return self.samples > 0
+
+    def to_list(self) -> list:
+        return [self.value, self.samples]
+
+class EtaEstimator:
+    """根据历史的单步耗时预测任务剩余时间和队列清空时间
+
+    按 node_type 学习每步秒数，另外学习平均节点耗时和平均任务耗时。
+    剩余时间 = 当前节点剩余步数 × 该类型每步秒数 + 其余节点数 × 平均节点耗时。
+    模型保存在 JSON 文件中，重启后继续使用。
+    """
+
+    def __init__(self, model_file: str = ETA_MODEL_FILE, alpha: float = 0.2):
+        self.model_file = model_file
+        self.alpha = alpha
+        self.step_seconds: Dict[str, RunningAverage] = {}  # node_type -> 每步秒数
+        self.node_seconds = RunningAverage(alpha)  # 单个节点耗时
+        self.task_seconds = RunningAverage(alpha)  # 整个任务耗时
+        self.tracking: Dict[str, Dict[str, Any]] = {}  # 服务器名称 -> 当前任务的观测状态
+        self.dirty = False
+        self.persist = True  # 回放录制数据时不保存模型
+        self.load()
+
+    def load(self):
+        """读取已保存的模型"""
+        if not os.path.exists(self.model_file):
+            return
+        try:
+            with open(self.model_file, 'r', encoding='utf-8') as f:
+                model = json.load(f)
+            self.step_seconds = {node_type: RunningAverage(self.alpha, *values)
+                                 for node_type, values in model.get("step_seconds", {}).items()}
+            self.node_seconds = RunningAverage(self.alpha, *model.get("node_seconds", [0.0, 0]))
+            self.task_seconds = RunningAverage(self.alpha, *model.get("task_seconds", [0.0, 0]))
+        except (json.JSONDecodeError, IOError, TypeError) as e:
+            print(f"ETA 模型加载失败: {e}")
+
+    def save(self) -> bool:
+        """模型有变化时写入文件"""
+        if not self.dirty or not self.persist:
+            return True
+        model = {
+            "step_seconds": {node_type: average.to_list() for node_type, average in self.step_seconds.items()},
+            "node_seconds": self.node_seconds.to_list(),
+            "task_seconds": self.task_seconds.to_list()
+        }
+        temp_file = self.model_file + ".tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(model, f, indent=4, ensure_ascii=False)
+            os.replace(temp_file, self.model_file)
+            self.dirty = False
+            return True
+        except IOError as e:
+            print(f"ETA 模型保存失败: {e}")
+            return False
+
+    def observe(self, server: str, data: Dict[str, Any], now: Optional[float] = None):
+        """处理某个服务器的一次状态更新，学习步骤、节点和任务耗时"""
+        now = time.monotonic() if now is None else now
+        status = data.get("status", "idle")
+        task_id = data.get("task_id")
+        tracked = self.tracking.get(server)
+
+        if tracked is not None and (status != "running" or task_id != tracked["task_id"]):
+            if status == "completed" and task_id == tracked["task_id"]:
+                self._finish_node(tracked, now)
+                self.task_seconds.add(data.get("execution_time") or now - tracked["task_start"])
+                self.dirty = True
+                self.save()
+            del self.tracking[server]
+            tracked = None
+
+        if status != "running" or not task_id:
+            return
+
+        if tracked is None:
+            tracked = {"task_id": task_id, "task_start": now, "node_id": None, "node_type": None,
+                       "node_start": now, "step": 0, "step_time": None}
+            self.tracking[server] = tracked
+
+        progress = data.get("current_task_progress")
+        if not progress or progress.get("node_id") is None:
+            return
+
+        step = progress.get("step", 0)
+        if progress["node_id"] != tracked["node_id"]:
+            # 进入新节点：上一个节点的耗时计入平均节点耗时
+            self._finish_node(tracked, now)
+            tracked.update(node_id=progress["node_id"], node_type=progress.get("node_type"),
+                           node_start=now, step=step, step_time=now)
+        elif step > tracked["step"]:
+            # 同一节点步数增加：（间隔 / 步数差）计入该节点类型的每步秒数
+            if tracked["step_time"] is not None and tracked["node_type"]:
+                average = self.step_seconds.setdefault(tracked["node_type"], RunningAverage(self.alpha))
+                average.add((now - tracked["step_time"]) / (step - tracked["step"]))
+                self.dirty = True
+            tracked.update(step=step, step_time=now)
+
+    def _finish_node(self, tracked: Dict[str, Any], now: float):
+        """记录一个节点的耗时"""
+        if tracked["node_id"] is not None:
+            self.node_seconds.add(now - tracked["node_start"])
+            self.dirty = True
+
+    def estimate(self, server: str, data: Dict[str, Any], now: Optional[float] = None) -> Optional[float]:
+        """预计当前任务的剩余秒数，无法估计时返回 None"""
+        if data.get("status") != "running":
+            return None
+        now = time.monotonic() if now is None else now
+        tracked = self.tracking.get(server)
+
+        workflow_progress = data.get("workflow_progress") or {}
+        total_nodes = workflow_progress.get("total_nodes", 0)
+        executed_nodes = workflow_progress.get("executed_nodes", 0)
+        remaining_nodes = max(0, total_nodes - executed_nodes - 1)
+
+        # 当前节点的剩余时间
+        current_remaining = None
+        progress = data.get("current_task_progress") or {}
+        average = self.step_seconds.get(progress.get("node_type"))
+        total_steps = progress.get("total_steps", 0)
+        if average is not None and total_steps > 0:
+            current_remaining = (total_steps - progress.get("step", 0)) * average.value
+            if tracked is not None and tracked["step_time"] is not None:
+                current_remaining -= now - tracked["step_time"]
+        elif self.node_seconds.known() and tracked is not None and tracked["node_id"] is not None:
+            current_remaining = self.node_seconds.value - (now - tracked["node_start"])
+
+        if self.node_seconds.known() and current_remaining is not None:
+            return max(0.0, current_remaining + remaining_nodes * self.node_seconds.value)
+
+        # 节点数据不足时退回到平均任务耗时
+        if self.task_seconds.known():
+            return max(0.0, self.task_seconds.value - (data.get("execution_time") or 0))
+        if current_remaining is not None and remaining_nodes == 0:
+            return max(0.0, current_remaining)
+        return None
+
+    def queue_drain(self, server: str, data: Dict[str, Any], now: Optional[float] = None) -> Optional[float]:
+        """预计队列清空的秒数：当前任务剩余时间 + 等待任务数 × 平均任务耗时"""
+        queue = data.get("queue") or {}
+        pending_count = queue.get("pending_count", 0)
+        eta = self.estimate(server, data, now)
+        if data.get("status") == "running" and eta is None:
+            return None
+        if pending_count and not self.task_seconds.known():
+            return None
+        if not pending_count and eta is None:
+            return None
+        return (eta or 0.0) + pending_count * self.task_seconds.value
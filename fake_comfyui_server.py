@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地 ComfyUI 替身服务器
+实现 /task_monitor/status、/queue、/history、/view 与 /ws 事件流，用于在没有 GPU 主机时调试和压测监控器
+
+可按脚本回放任务生命周期（完成、出错、中断、排队），并注入响应延迟和错误。
+
+用法: python fake_comfyui_server.py --port 8189
+      python fake_comfyui_server.py --script tasks.json --speed 2 --latency 0.2 --error-rate 0.1
+      python fake_comfyui_server.py --history-seed 10000   # 预先生成一万条历史
+
+脚本为 JSON 列表，每项描述一个任务，未给出的字段使用命令行参数:
+    [{"nodes": 6, "steps": 20, "step_interval": 0.1, "idle_time": 3,
+      "node_type": "KSampler", "outcome": "completed", "pending": 0}]
+outcome 可以是 completed、error 或 interrupted；pending 为任务运行期间报告的等待任务数。
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socket
+import struct
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WS_MAGIC = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+def make_png(width: int, height: int, green: int = 96) -> bytes:
+    """生成一张水平渐变的 RGB PNG，作为 /view 返回的输出图片和实时预览帧"""
+    row = b"\x00" + bytes(channel for x in range(width)
+                           for channel in (x * 255 // max(1, width - 1), green, 255 - x * 255 // max(1, width - 1)))
+    pixels = zlib.compress(row * height, 1)
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack("!I", len(data)) + kind + data + struct.pack("!I", zlib.crc32(kind + data))
+
+    header = struct.pack("!IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+
+
+class WebSocketClient:
+    """一个已完成握手的 WebSocket 连接"""
+
+    def __init__(self, connection: socket.socket, reader):
+        self.connection = connection
+        self.reader = reader
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send_frame(self, opcode: int, payload: bytes):
+        """发送一个不分片、不加掩码的帧"""
+        header = bytearray([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header.append(length)
+        elif length < 65536:
+            header.append(126)
+            header += struct.pack("!H", length)
+        else:
+            header.append(127)
+            header += struct.pack("!Q", length)
+
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                self.connection.sendall(bytes(header) + payload)
+            except OSError:
+                self.closed = True
+
+    def send_json(self, message: dict):
+        """发送文本事件"""
+        self.send_frame(0x1, json.dumps(message).encode("utf-8"))
+
+    def read_frame(self):
+        """读取客户端帧，返回 (opcode, payload)，连接关闭时返回 (None, b"")"""
+        try:
+            head = self._read_exact(2)
+            opcode = head[0] & 0x0F
+            masked = head[1] & 0x80
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", self._read_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", self._read_exact(8))[0]
+            mask = self._read_exact(4) if masked else b"\x00\x00\x00\x00"
+            data = bytearray(self._read_exact(length))
+            for i in range(length):
+                data[i] ^= mask[i % 4]
+            return opcode, bytes(data)
+        except (OSError, ConnectionError):
+            return None, b""
+
+    def _read_exact(self, size: int) -> bytes:
+        """读取指定长度的数据"""
+        buffer = b""
+        while len(buffer) < size:
+            chunk = self.reader.read(size - len(buffer))
+            if not chunk:
+                raise ConnectionError("连接已关闭")
+            buffer += chunk
+        return buffer
+
+
+class FakeComfyUI:
+    """按脚本循环执行模拟任务的状态机"""
+
+    def __init__(self, nodes: int = 6, steps: int = 20, step_interval: float = 0.1,
+                 idle_time: float = 3.0, node_type: str = "KSampler", script: list = None,
+                 speed: float = 1.0, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 history_size: int = 10000, output_size: tuple = (1024, 1024), preview_size: int = 256):
+        self.nodes = nodes
+        self.steps = steps
+        self.step_interval = step_interval
+        self.idle_time = idle_time
+        self.node_type = node_type
+        self.script = script or [{}]
+        self.speed = speed  # 时间倍率：2 表示所有等待时间减半
+
+        # 故障注入：状态接口的额外延迟（秒）、随机抖动和返回 HTTP 500 的概率
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+        # 状态变化回调 (monotonic 时间, 状态副本)，供基准测试计算端到端延迟
+        self.on_change = None
+        self.tasks_run = 0
+
+        self.lock = threading.Lock()
+        self.clients = []
+        self.status = {
+            "status": "idle",
+            "task_id": None,
+            "workflow_progress": {"total_nodes": 0, "executed_nodes": 0},
+            "current_task_progress": None,
+            "queue": {"running_count": 0, "pending_count": 0},
+            "error_info": None
+        }
+        self.running = False
+
+        # 队列与历史：等待中的任务 (序号, prompt_id)，历史按完成顺序保存，超过上限时删除最旧的
+        self.next_number = 0
+        self.running_item = None
+        self.pending_items = deque()
+        self.history = OrderedDict()
+        self.history_size = history_size
+        self.output_size = output_size
+        self.output_png = None  # 首次请求 /view 时生成
+
+        # 采样过程中广播的预览帧（PREVIEW_IMAGE 二进制消息，PNG 格式），0 表示不发送
+        self.preview_size = preview_size
+        self.preview_frames = []
+
+    def get_output_image(self) -> bytes:
+        """所有输出文件共用的图片数据"""
+        with self.lock:
+            if self.output_png is None:
+                self.output_png = make_png(*self.output_size)
+            return self.output_png
+
+    def make_queue_item(self, number: int, prompt_id: str) -> list:
+        """构造 /queue 中的一项 [序号, prompt_id, prompt, extra_data, 输出节点]"""
+        prompt = {str(index + 1): {"class_type": self.node_type, "inputs": {"seed": index}}
+                  for index in range(self.nodes)}
+        return [number, prompt_id, prompt, {"client_id": "fake"}, [str(self.nodes)]]
+
+    def take_next_item(self, pending: int) -> tuple:
+        """取出下一个要执行的任务，并把等待队列补齐到 pending 个"""
+        with self.lock:
+            if self.pending_items:
+                item = self.pending_items.popleft()
+            else:
+                item = (self.next_number, str(uuid.uuid4()))
+                self.next_number += 1
+            while len(self.pending_items) > pending:
+                self.pending_items.pop()
+            while len(self.pending_items) < pending:
+                self.pending_items.append((self.next_number, str(uuid.uuid4())))
+                self.next_number += 1
+            self.running_item = item
+        return item
+
+    def get_queue(self) -> dict:
+        """返回 ComfyUI 格式的队列"""
+        with self.lock:
+            running = [self.running_item] if self.running_item else []
+            pending = list(self.pending_items)
+        # ComfyUI 的等待队列是堆，返回顺序不保证按序号排列
+        pending.reverse()
+        return {"queue_running": [self.make_queue_item(*item) for item in running],
+                "queue_pending": [self.make_queue_item(*item) for item in pending]}
+
+    def add_history(self, number: int, prompt_id: str, outcome: str, started: float, error_info: dict = None,
+                    ended: float = None):
+        """记录一个结束的任务"""
+        ended = time.time() if ended is None else ended
+        messages = [["execution_start", {"prompt_id": prompt_id, "timestamp": int(started * 1000)}]]
+        outputs = {}
+        if outcome == "completed":
+            messages.append(["execution_success", {"prompt_id": prompt_id, "timestamp": int(ended * 1000)}])
+            outputs = {str(self.nodes): {"images": [
+                {"filename": f"ComfyUI_{number:05d}_.png", "subfolder": "", "type": "output"}]}}
+        elif outcome == "error":
+            messages.append(["execution_error", dict(error_info, prompt_id=prompt_id, timestamp=int(ended * 1000))])
+        else:
+            messages.append(["execution_interrupted", {"prompt_id": prompt_id, "timestamp": int(ended * 1000)}])
+        entry = {
+            "prompt": self.make_queue_item(number, prompt_id),
+            "outputs": outputs,
+            "status": {"status_str": "success" if outcome == "completed" else "error",
+                       "completed": outcome == "completed", "messages": messages}
+        }
+        with self.lock:
+            self.history[prompt_id] = entry
+            while len(self.history) > self.history_size:
+                self.history.popitem(last=False)
+
+    def seed_history(self, count: int):
+        """预先生成已完成的历史，用于测试大量历史的加载"""
+        started = time.time() - count * 10
+        for index in range(count):
+            number = self.next_number
+            self.next_number += 1
+            self.add_history(number, str(uuid.uuid4()), "completed", started + index * 10,
+                             ended=started + index * 10 + 8)
+
+    def get_history(self, offset: int = -1, max_items: int = None) -> dict:
+        """与 ComfyUI 相同的分页语义：offset 为负且给出 max_items 时返回最新的 max_items 条"""
+        with self.lock:
+            if offset < 0 and max_items is not None:
+                offset = len(self.history) - max_items
+            items = list(self.history.items())[max(0, offset):]
+        if max_items is not None:
+            items = items[:max_items]
+        return dict(items)
+
+    def clear_history(self):
+        """清空历史"""
+        with self.lock:
+            self.history.clear()
+
+    def get_status(self) -> dict:
+        """返回当前状态的副本"""
+        with self.lock:
+            return json.loads(json.dumps(self.status))
+
+    def add_client(self, client: WebSocketClient):
+        """注册 WebSocket 客户端"""
+        with self.lock:
+            self.clients.append(client)
+            remaining = self.status["queue"]["running_count"] + self.status["queue"]["pending_count"]
+        client.send_json({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": remaining}}}})
+
+    def remove_client(self, client: WebSocketClient):
+        """移除 WebSocket 客户端"""
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def broadcast_preview(self, step: int):
+        """广播一帧实时预览"""
+        if not self.preview_size:
+            return
+        if not self.preview_frames:
+            header = struct.pack("!II", 1, 2)
+            self.preview_frames = [header + make_png(self.preview_size, self.preview_size, green)
+                                   for green in range(0, 256, 32)]
+        frame = self.preview_frames[step % len(self.preview_frames)]
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.send_frame(0x2, frame)
+
+    def broadcast(self, event_type: str, data: dict):
+        """向所有客户端广播事件"""
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            client.send_json({"type": event_type, "data": data})
+
+    def _update(self, **fields):
+        """更新状态字段"""
+        with self.lock:
+            self.status.update(fields)
+            snapshot = json.loads(json.dumps(self.status)) if self.on_change else None
+        if snapshot is not None:
+            self.on_change(time.monotonic(), snapshot)
+
+    def _sleep(self, seconds: float):
+        """按时间倍率等待"""
+        time.sleep(seconds / self.speed)
+
+    def status_delay(self) -> float:
+        """本次状态请求注入的延迟"""
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def task_settings(self, task: dict) -> dict:
+        """脚本中的一项与默认参数合并"""
+        settings = {
+            "nodes": self.nodes,
+            "steps": self.steps,
+            "step_interval": self.step_interval,
+            "idle_time": self.idle_time,
+            "node_type": self.node_type,
+            "outcome": "completed",
+            "pending": 0
+        }
+        settings.update(task)
+        return settings
+
+    def run_task(self, task: dict = None):
+        """执行一个模拟任务"""
+        task = self.task_settings(task or {})
+        nodes = task["nodes"]
+        pending = task["pending"]
+        number, prompt_id = self.take_next_item(pending)
+        started = time.time()
+        self._update(
+            status="running",
+            task_id=prompt_id,
+            workflow_progress={"total_nodes": nodes, "executed_nodes": 0},
+            current_task_progress=None,
+            queue={"running_count": 1, "pending_count": pending},
+            error_info=None
+        )
+        self.broadcast("status", {"status": {"exec_info": {"queue_remaining": 1 + pending}}})
+        self.broadcast("execution_start", {"prompt_id": prompt_id})
+
+        # 出错或中断的任务在中间节点的一半处结束
+        fail_at = nodes // 2 if task["outcome"] in ("error", "interrupted") else None
+
+        for index in range(nodes):
+            node_id = str(index + 1)
+            self.broadcast("executing", {"node": node_id, "prompt_id": prompt_id})
+            steps = task["steps"] if index == nodes // 2 else 1
+            for step in range(1, steps + 1):
+                if not self.running:
+                    return
+                if index == fail_at and step > steps // 2:
+                    self._end_task(number, prompt_id, started, task, node_id, index)
+                    return
+                self._update(current_task_progress={
+                    "node_id": node_id, "node_type": task["node_type"],
+                    "step": step, "total_steps": steps
+                })
+                self.broadcast("progress", {"value": step, "max": steps, "node": node_id, "prompt_id": prompt_id})
+                if steps > 1:
+                    self.broadcast_preview(step)
+                self._sleep(task["step_interval"])
+            self._update(workflow_progress={"total_nodes": nodes, "executed_nodes": index + 1})
+
+        self._end_task(number, prompt_id, started, task, None, nodes)
+
+    def _end_task(self, number: int, prompt_id: str, started: float, task: dict, node_id, executed_nodes: int):
+        """按脚本指定的结果结束任务"""
+        queue = {"running_count": 0, "pending_count": task["pending"]}
+        outcome = task["outcome"]
+        error_info = None
+        if outcome == "error":
+            error_info = {"node_id": node_id, "node_type": task["node_type"],
+                          "exception_message": "模拟错误", "exception_type": "RuntimeError"}
+            self._update(status="error", current_task_progress=None, queue=queue, error_info=error_info)
+            self.broadcast("execution_error", dict(error_info, prompt_id=prompt_id))
+        elif outcome == "interrupted":
+            self._update(status="idle", task_id=None, current_task_progress=None, queue=queue,
+                         workflow_progress={"total_nodes": 0, "executed_nodes": 0})
+            self.broadcast("execution_interrupted", {"prompt_id": prompt_id, "node_id": node_id})
+        else:
+            self._update(status="completed", current_task_progress=None, queue=queue)
+            self.broadcast("execution_success", {"prompt_id": prompt_id})
+            self.broadcast("executing", {"node": None, "prompt_id": prompt_id})
+        with self.lock:
+            self.running_item = None
+        self.add_history(number, prompt_id, outcome, started, error_info)
+        self.broadcast("status", {"status": {"exec_info": {"queue_remaining": task["pending"]}}})
+        self.tasks_run += 1
+
+    def run(self):
+        """循环回放脚本：每个任务前先空闲一段时间"""
+        self.running = True
+        while self.running:
+            for task in self.script:
+                self._sleep(self.task_settings(task)["idle_time"])
+                if not self.running:
+                    return
+                self.run_task(task)
+
+    def stop(self):
+        """停止模拟"""
+        self.running = False
+
+
+def make_handler(fake: FakeComfyUI):
+    """创建绑定到状态机的请求处理器"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # 响应头和响应体分两次写出，关闭 Nagle 算法以免小响应等待延迟确认（约 40 ms）
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/task_monitor/status":
+                delay = fake.status_delay()
+                if delay:
+                    time.sleep(delay)
+                if fake.error_rate and random.random() < fake.error_rate:
+                    self._send_error_response()
+                else:
+                    self._send_json(fake.get_status())
+            elif path == "/queue":
+                self._send_json(fake.get_queue())
+            elif path == "/history":
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+                max_items = int(query["max_items"][0]) if "max_items" in query else None
+                self._send_json(fake.get_history(int(query.get("offset", ["-1"])[0]), max_items))
+            elif path.startswith("/history/"):
+                prompt_id = path[len("/history/"):]
+                self._send_json({k: v for k, v in fake.get_history().items() if k == prompt_id})
+            elif path == "/view":
+                body = fake.get_output_image()
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+                self._serve_websocket()
+            else:
+                self.send_error(404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/history":
+                if body.get("clear"):
+                    fake.clear_history()
+                self._send_json({})
+            else:
+                self.send_error(404)
+
+        def _send_json(self, data: dict):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_error_response(self):
+            body = b"injected error"
+            self.send_response(500)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _serve_websocket(self):
+            key = self.headers.get("Sec-WebSocket-Key", "")
+            accept = base64.b64encode(hashlib.sha1((key + WS_MAGIC).encode()).digest()).decode()
+            self.send_response(101)
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+
+            client = WebSocketClient(self.connection, self.rfile)
+            fake.add_client(client)
+            try:
+                while True:
+                    opcode, payload = client.read_frame()
+                    if opcode is None or opcode == 0x8:
+                        break
+                    if opcode == 0x9:
+                        client.send_frame(0xA, payload)
+            finally:
+                fake.remove_client(client)
+                client.closed = True
+                self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host: str, port: int, fake: FakeComfyUI) -> ThreadingHTTPServer:
+    """启动服务器与状态机线程，返回服务器对象"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=fake.run, daemon=True).start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地 ComfyUI 替身服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8189)
+    parser.add_argument("--nodes", type=int, default=6, help="每个任务的节点数")
+    parser.add_argument("--steps", type=int, default=20, help="采样节点的步数")
+    parser.add_argument("--step-interval", type=float, default=0.1, help="每步耗时（秒）")
+    parser.add_argument("--idle-time", type=float, default=3.0, help="任务之间的空闲时间（秒）")
+    parser.add_argument("--script", help="任务脚本 JSON 文件，循环回放")
+    parser.add_argument("--speed", type=float, default=1.0, help="时间倍率，2 表示两倍速回放")
+    parser.add_argument("--latency", type=float, default=0.0, help="状态接口的额外延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="状态接口返回 HTTP 500 的概率")
+    parser.add_argument("--history-size", type=int, default=10000, help="保留的历史条数上限")
+    parser.add_argument("--history-seed", type=int, default=0, help="启动时预先生成的历史条数")
+    parser.add_argument("--output-size", default="1024x1024", help="/view 返回的输出图片尺寸，如 3840x2160")
+    parser.add_argument("--preview-size", type=int, default=256, help="采样时广播的预览帧边长，0 表示不发送")
+    parser.add_argument("--event-log", help="把每次状态变化（time.time() 时间戳）写入 JSON Lines 文件")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            script = json.load(f)
+
+    fake = FakeComfyUI(args.nodes, args.steps, args.step_interval, args.idle_time, script=script,
+                       speed=args.speed, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       history_size=args.history_size,
+                       output_size=tuple(int(value) for value in args.output_size.lower().split("x")),
+                       preview_size=args.preview_size)
+    fake.seed_history(args.history_seed)
+    # 行缓冲：进程被直接结束时也不会丢失已写入的事件
+    event_log = open(args.event_log, 'w', encoding='utf-8', buffering=1) if args.event_log else None
+    if event_log:
+        fake.on_change = lambda _, status: event_log.write(json.dumps(dict(status, t=time.time())) + "\n")
+
+    server = serve(args.host, args.port, fake)
+    print(f"替身服务器已启动: http://{args.host}:{args.port}", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.stop()
+        server.shutdown()
+    finally:
+        if event_log:
+            event_log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+from typing import Iterable, List, Optional
+from PyQt5.QtGui import QImage
+
+# 缓存目录与文件格式标识
+CACHE_DIR = os.path.join("cache", "frames")
+CACHE_MAGIC = b"PETFRM02"
+CACHE_FORMAT = QImage.Format_ARGB32_Premultiplied
+
+class CachedFrameSet:
+    """一个已写入磁盘的帧缓存文件，支持按索引随机读取单帧"""
+
+    def __init__(self, path: str, frames: List[dict]):
+        self.path = path
+        self.frames = frames
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def read_frame(self, index: int) -> Optional[QImage]:
+        """读取单帧（可在任意线程调用）"""
+        frame = self.frames[index]
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(frame["offset"])
+                pixels = f.read(frame["length"])
+        except OSError:
+            return None
+        if len(pixels) != frame["length"]:
+            return None
+
+        image = QImage(pixels, frame["width"], frame["height"], frame["bytes_per_line"], CACHE_FORMAT)
+        # QImage 不拥有 pixels 的内存，复制一份与读取缓冲解耦
+        return image.copy()
+
+    def read_all(self) -> List[QImage]:
+        """一次读取全部帧"""
+        with open(self.path, "rb") as f:
+            blob = f.read()
+        images = []
+        for frame in self.frames:
+            start = frame["offset"]
+            image = QImage(blob[start:start + frame["length"]], frame["width"], frame["height"],
+                           frame["bytes_per_line"], CACHE_FORMAT)
+            images.append(image.copy())
+        return images
+
+class FrameDiskCache:
+    """预缩放宠物帧的磁盘缓存
+
+    同一宠物、同一缩放比例的全部帧存放在一个文件中：
+    标识之后是逐帧的原始预乘 ARGB 像素，末尾是帧索引 JSON 及其长度，
+    因此可以边解码边写入，读取时可按索引随机访问单帧。
+    像素不压缩：解压的开销比重新解码 PNG 还大，原始数据读入即可使用。
+    缓存键包含源图片的文件名、修改时间和大小，源图片变化后自动失效。
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.write_lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(pet_name: str, scale: float, image_files: List[str]) -> str:
+        """根据宠物、缩放比例和源文件状态计算缓存键"""
+        digest = hashlib.sha1(f"{pet_name}|{scale:.4f}".encode("utf-8"))
+        for image_file in image_files:
+            try:
+                stat = os.stat(image_file)
+            except OSError:
+                continue
+            digest.update(f"|{os.path.basename(image_file)}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def _prefix(self, pet_name: str, scale: float) -> str:
+        """同一宠物和缩放比例的缓存文件名前缀"""
+        return f"{pet_name}_{scale:.4f}_"
+
+    def cache_path(self, pet_name: str, scale: float, image_files: List[str]) -> str:
+        """缓存文件路径"""
+        key = self.cache_key(pet_name, scale, image_files)
+        return os.path.join(self.cache_dir, f"{self._prefix(pet_name, scale)}{key}.frames")
+
+    def open(self, pet_name: str, scale: float, image_files: List[str]) -> Optional[CachedFrameSet]:
+        """打开缓存文件并读取帧索引，未命中或文件损坏时返回 None"""
+        path = self.cache_path(pet_name, scale, image_files)
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                    return None
+                f.seek(-4, os.SEEK_END)
+                index_length = struct.unpack("<I", f.read(4))[0]
+                f.seek(-4 - index_length, os.SEEK_END)
+                index = json.loads(f.read(index_length))
+            return CachedFrameSet(path, index["frames"])
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+    def load(self, pet_name: str, scale: float, image_files: List[str]) -> Optional[List[QImage]]:
+        """读取缓存的全部帧，未命中或文件损坏时返回 None"""
+        frame_set = self.open(pet_name, scale, image_files)
+        if frame_set is None:
+            return None
+        try:
+            return frame_set.read_all()
+        except OSError as e:
+            print(f"帧缓存读取失败: {e}")
+            return None
+
+    def save(self, pet_name: str, scale: float, image_files: List[str], images: Iterable[QImage]) -> bool:
+        """逐帧写入缓存（images 可以是生成器），并删除该宠物同一缩放比例的旧缓存"""
+        path = self.cache_path(pet_name, scale, image_files)
+
+        with self.write_lock:
+            temp_path = path + ".tmp"
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                frames = []
+                with open(temp_path, "wb") as f:
+                    f.write(CACHE_MAGIC)
+                    offset = len(CACHE_MAGIC)
+                    for image in images:
+                        image = image.convertToFormat(CACHE_FORMAT)
+                        data = image.constBits().asstring(image.sizeInBytes())
+                        frames.append({
+                            "width": image.width(),
+                            "height": image.height(),
+                            "bytes_per_line": image.bytesPerLine(),
+                            "offset": offset,
+                            "length": len(data)
+                        })
+                        f.write(data)
+                        offset += len(data)
+
+                    index = json.dumps({"pet": pet_name, "scale": scale, "frames": frames}).encode("utf-8")
+                    f.write(index)
+                    f.write(struct.pack("<I", len(index)))
+                os.replace(temp_path, path)
+                self._remove_stale(pet_name, scale, os.path.basename(path))
+                return True
+            except OSError as e:
+                print(f"帧缓存写入失败: {e}")
+                return False
+            finally:
+                # 写入失败或被中途取消时不留下临时文件
+                if os.path.exists(temp_path):
+                    try:
+                        os.remove(temp_path)
+                    except OSError:
+                        pass
+
+    def _remove_stale(self, pet_name: str, scale: float, keep: str):
+        """删除同一宠物和缩放比例下已失效的缓存文件"""
+        prefix = self._prefix(pet_name, scale)
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(prefix) and name.endswith(".frames") and name != keep:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
@@ -0,0 +1,424 @@
+from collections import OrderedDict
+from typing import List, Optional
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+from frame_cache import FrameDiskCache, CachedFrameSet, CACHE_FORMAT
+from frame_store import FrameStore
+
+def scale_frame(image: QImage, scale: float) -> QImage:
+    """按比例缩放一帧（只使用 QImage，可在后台线程调用）"""
+    if scale != 1.0:
+        image = image.scaled(image.size() * scale, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image.convertToFormat(CACHE_FORMAT)
+
+def decode_frame(image_file: str, scale: float) -> QImage:
+    """解码并缩放一帧（只使用 QImage，可在后台线程调用）"""
+    image = QImage(image_file)
+    if image.isNull():
+        return image
+    return scale_frame(image, scale)
+
+class FrameDecodeSignals(QObject):
+    """后台任务的回调信号（QRunnable 本身不能发信号）"""
+
+    decoded = pyqtSignal(int, int, QImage)  # (加载代次, 帧索引, 图像)
+    cache_written = pyqtSignal(int, bool)  # (加载代次, 是否成功)
+    store_built = pyqtSignal(int, object)  # (存储构建代次, FrameStore 或 None)
+
+class FrameDecodeTask(QRunnable):
+    """解码单帧：优先读取磁盘缓存，否则解码源图片"""
+
+    def __init__(self, signals: FrameDecodeSignals, generation: int, index: int,
+                 image_file: str, scale: float, frame_set: Optional[CachedFrameSet]):
+        super().__init__()
+        self.signals = signals
+        self.generation = generation
+        self.index = index
+        self.image_file = image_file
+        self.scale = scale
+        self.frame_set = frame_set
+
+    def run(self):
+        image = None
+        if self.frame_set is not None:
+            image = self.frame_set.read_frame(self.index)
+        if image is None:
+            image = decode_frame(self.image_file, self.scale)
+        try:
+            self.signals.decoded.emit(self.generation, self.index, image)
+        except RuntimeError:
+            # 程序退出时信号对象可能已被销毁
+            pass
+
+class FrameCacheBuildCancelled(Exception):
+    """缓存构建任务被新的加载取代"""
+
+class FrameCacheBuildTask(QRunnable):
+    """按顺序逐帧解码，交给界面显示的同时流式写入磁盘缓存"""
+
+    def __init__(self, signals: FrameDecodeSignals, generation: int, disk_cache: FrameDiskCache,
+                 pet_name: str, image_files: List[str], scale: float):
+        super().__init__()
+        self.signals = signals
+        self.generation = generation
+        self.disk_cache = disk_cache
+        self.pet_name = pet_name
+        self.image_files = image_files
+        self.scale = scale
+        self.cancelled = False  # 切换宠物或缩放比例后不再继续解码旧序列
+
+    def run(self):
+        def frames():
+            for index, image_file in enumerate(self.image_files):
+                if self.cancelled:
+                    raise FrameCacheBuildCancelled()
+                image = decode_frame(image_file, self.scale)
+                try:
+                    self.signals.decoded.emit(self.generation, index, image)
+                except RuntimeError:
+                    # 程序退出时信号对象可能已被销毁
+                    raise FrameCacheBuildCancelled()
+                yield image
+
+        try:
+            ok = self.disk_cache.save(self.pet_name, self.scale, self.image_files, frames())
+            self.signals.cache_written.emit(self.generation, ok)
+        except (FrameCacheBuildCancelled, RuntimeError):
+            pass
+
+class FrameStoreBuildTask(QRunnable):
+    """把一个宠物的全部帧构建为 FrameStore：来自磁盘缓存时一次读入，来自内存时按比例缩放"""
+
+    def __init__(self, signals: FrameDecodeSignals, store_generation: int, indexed: bool,
+                 frame_set: Optional[CachedFrameSet] = None, images: Optional[List[QImage]] = None,
+                 scale: float = 1.0, owner=None):
+        super().__init__()
+        self.signals = signals
+        self.store_generation = store_generation
+        self.indexed = indexed
+        self.frame_set = frame_set
+        self.images = images
+        self.scale = scale
+        self.owner = owner  # images 为视图时引用的精灵图或旧存储，构建期间保持存活
+
+    def run(self):
+        try:
+            if self.frame_set is not None:
+                images = self.frame_set.read_all()
+            else:
+                images = [scale_frame(image, self.scale) for image in self.images]
+            store = FrameStore.build(images, self.indexed)
+        except OSError as e:
+            print(f"帧存储构建失败: {e}")
+            store = None
+        try:
+            self.signals.store_built.emit(self.store_generation, store)
+        except RuntimeError:
+            # 程序退出时信号对象可能已被销毁
+            pass
+
+class FrameProvider(QObject):
+    """宠物帧提供者
+
+    首帧同步加载以便立即显示，其余帧在线程池中以 QImage 解码，
+    解码结果放入有内存上限的 LRU，并在当前帧之后预取若干帧。
+    全部帧可用后（磁盘缓存就绪或帧已在内存中）在后台构建 FrameStore：
+    去重后存放在一块连续缓冲区中，未超出内存上限时改为从中取帧，LRU 只保留最近显示的几帧。
+    frame() 从不阻塞：帧尚未解码时返回 None，解码完成后发出 frame_ready。
+    """
+
+    # 使用 FrameStore 时保留的 QPixmap 数：从存储转换一帧远快于一个动画间隔
+    STORE_PIXMAP_COUNT = 2
+
+    # 信号定义
+    frame_ready = pyqtSignal(int)  # 某一帧解码完成
+
+    def __init__(self, memory_budget_mb: float = 64, prefetch_count: int = 8, parent=None):
+        super().__init__(parent)
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.prefetch_count = prefetch_count
+        self.disk_cache = FrameDiskCache()
+
+        self.pet_name = None
+        self.image_files = []
+        self.source_frames = None  # 内存中的帧（打包宠物或动图），为 None 时逐个解码 image_files
+        self.sheet = None  # source_frames 为视图时引用的精灵图
+        self.scale = 1.0
+        self.frame_set = None  # 磁盘缓存命中时的帧集合
+        self.store = None  # 全部帧的紧凑存储，就绪后取代逐帧解码
+        self.store_generation = 0
+        self.indexed_color = True  # 颜色足够少时以索引色存储
+
+        # LRU：帧索引（使用 FrameStore 时为槽位）-> QPixmap
+        self.frames = OrderedDict()
+        self.frames_bytes = 0
+        self.pending = set()
+        self.generation = 0
+        self.building_cache = False  # 构建缓存期间由构建任务顺序提供解码结果
+        self.build_task = None
+
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(2)
+        self.signals = FrameDecodeSignals()
+        self.signals.decoded.connect(self._on_decoded)
+        self.signals.cache_written.connect(self._on_cache_written)
+        self.signals.store_built.connect(self._on_store_built)
+
+    def _reset(self, pet_name: str, scale: float):
+        """丢弃当前帧序列及其后台任务"""
+        self.generation += 1
+        if self.build_task is not None:
+            self.build_task.cancelled = True
+            self.build_task = None
+        self.building_cache = False
+        self.pet_name = pet_name
+        self.scale = scale
+        self.image_files = []
+        self.source_frames = None
+        self.sheet = None
+        self.frame_set = None
+        self.store = None
+        self.store_generation += 1
+        self.frames.clear()
+        self.frames_bytes = 0
+        self.pending.clear()
+
+    def load(self, pet_name: str, image_files: List[str], scale: float) -> Optional[QPixmap]:
+        """切换到新的帧序列，同步返回首帧"""
+        self._reset(pet_name, scale)
+        # 跳过无法识别的图片文件（只读取文件头）
+        self.image_files = [image_file for image_file in image_files if QImageReader(image_file).canRead()]
+
+        if not self.image_files:
+            return None
+
+        self.frame_set = self.disk_cache.open(pet_name, scale, self.image_files)
+        if self.frame_set is not None and len(self.frame_set) != len(self.image_files):
+            self.frame_set = None
+
+        first = self.frame_set.read_frame(0) if self.frame_set is not None else None
+        if first is None:
+            first = decode_frame(self.image_files[0], scale)
+        if first.isNull():
+            return None
+        self._store(0, QPixmap.fromImage(first))
+
+        # 缓存未命中时在后台构建磁盘缓存
+        self.building_cache = self.frame_set is None
+        if self.building_cache:
+            self.build_task = FrameCacheBuildTask(
+                self.signals, self.generation, self.disk_cache, pet_name, self.image_files, scale)
+            self.thread_pool.start(self.build_task)
+        else:
+            self._build_store()
+
+        first = self.frames[0]
+        self.prefetch(0)
+        return first
+
+    def load_frames(self, pet_name: str, frames: List[QImage], scale: float,
+                    sheet: Optional[QImage] = None) -> Optional[QPixmap]:
+        """切换到已在内存中的帧（精灵图切片或动图各帧），返回首帧
+
+        这些帧无需解码，FrameStore 就绪前显示时才缩放并转换为 QPixmap，之后释放原帧。
+        帧是精灵图的视图时需同时传入精灵图，保证其像素数据在使用期间有效。
+        """
+        self._reset(pet_name, scale)
+        if not frames:
+            return None
+        self.source_frames = frames
+        self.sheet = sheet
+        first = self._convert(0)
+        self._build_store()
+        return first
+
+    def unload(self):
+        """释放当前帧序列（切换宠物前调用，避免新旧两套帧同时驻留内存）"""
+        self._reset(None, self.scale)
+
+    def set_indexed_color(self, enabled: bool):
+        """设置是否以索引色存储帧，已加载的帧按新设置重新构建存储"""
+        if enabled == self.indexed_color:
+            return
+        self.indexed_color = enabled
+        self._build_store()
+
+    def set_memory_budget(self, memory_budget_mb: float):
+        """设置解码帧的内存上限"""
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._evict()
+
+    def set_prefetch_count(self, count: int):
+        """设置预取帧数"""
+        self.prefetch_count = max(0, count)
+
+    def frame_count(self) -> int:
+        """帧数"""
+        if self.store is not None:
+            return len(self.store)
+        if self.source_frames is not None:
+            return len(self.source_frames)
+        return len(self.image_files)
+
+    def memory_usage(self) -> int:
+        """当前宠物的帧占用的字节数"""
+        return self.memory_report()["total_bytes"]
+
+    def memory_report(self) -> dict:
+        """当前宠物各部分帧数据占用的字节数"""
+        if self.sheet is not None:
+            source_bytes = self.sheet.sizeInBytes()
+        elif self.source_frames is not None:
+            source_bytes = sum(image.sizeInBytes() for image in self.source_frames)
+        else:
+            source_bytes = 0
+        store_bytes = self.store.byte_size() if self.store is not None else 0
+        return {
+            "pet": self.pet_name,
+            "frames": self.frame_count(),
+            "unique_frames": self.store.unique_count() if self.store is not None else None,
+            "indexed": self.store is not None and self.store.is_indexed(),
+            "store_bytes": store_bytes,
+            "source_bytes": source_bytes,  # 存储就绪前在内存中的精灵图或动图帧
+            "pixmap_bytes": self.frames_bytes,
+            "pixmap_count": len(self.frames),
+            "total_bytes": store_bytes + source_bytes + self.frames_bytes,
+            "budget_bytes": self.memory_budget
+        }
+
+    def frame(self, index: int) -> Optional[QPixmap]:
+        """获取一帧，未解码时安排解码并返回 None"""
+        if self.store is not None:
+            return self._store_frame(index)
+        pixmap = self.frames.get(index)
+        if pixmap is not None:
+            self.frames.move_to_end(index)
+        elif self.source_frames is not None:
+            return self._convert(index)
+        else:
+            self._request(index)
+        self.prefetch(index)
+        return pixmap
+
+    def prefetch(self, index: int):
+        """预取当前帧之后的若干帧"""
+        count = self.frame_count()
+        if count == 0 or self.store is not None or self.source_frames is not None:
+            return
+        for offset in range(1, min(self.prefetch_count, count - 1) + 1):
+            next_index = (index + offset) % count
+            if next_index not in self.frames:
+                self._request(next_index)
+
+    def _request(self, index: int):
+        """安排后台解码"""
+        if index in self.pending or not 0 <= index < self.frame_count():
+            return
+        self.pending.add(index)
+        if self.building_cache:
+            # 构建任务会按顺序解码全部帧，不重复解码
+            return
+        self.thread_pool.start(FrameDecodeTask(
+            self.signals, self.generation, index, self.image_files[index], self.scale, self.frame_set))
+
+    def _convert(self, index: int) -> Optional[QPixmap]:
+        """把内存中的一帧按缩放比例转换为 QPixmap"""
+        if not 0 <= index < len(self.source_frames):
+            return None
+        pixmap = QPixmap.fromImage(scale_frame(self.source_frames[index], self.scale))
+        if pixmap.isNull():
+            return None
+        self._store(index, pixmap)
+        return pixmap
+
+    def _store_frame(self, index: int) -> Optional[QPixmap]:
+        """从 FrameStore 取一帧，内容相同的帧共用一个 QPixmap"""
+        if not 0 <= index < len(self.store):
+            return None
+        slot = self.store.slot(index)
+        pixmap = self.frames.get(slot)
+        if pixmap is not None:
+            self.frames.move_to_end(slot)
+            return pixmap
+        pixmap = QPixmap.fromImage(self.store.image(index))
+        self._store(slot, pixmap)
+        return pixmap
+
+    def _build_store(self):
+        """在后台把全部帧构建为 FrameStore"""
+        self.store_generation += 1
+        if self.store is not None:
+            # 按新设置重建：旧存储在构建期间保持存活
+            images = [self.store.image(index) for index in range(len(self.store))]
+            task = FrameStoreBuildTask(self.signals, self.store_generation, self.indexed_color,
+                                       images=images, owner=self.store)
+        elif self.source_frames is not None:
+            task = FrameStoreBuildTask(self.signals, self.store_generation, self.indexed_color,
+                                       images=self.source_frames, scale=self.scale, owner=self.sheet)
+        elif self.frame_set is not None:
+            task = FrameStoreBuildTask(self.signals, self.store_generation, self.indexed_color,
+                                       frame_set=self.frame_set)
+        else:
+            return
+        self.thread_pool.start(task)
+
+    def _store(self, index: int, pixmap: QPixmap):
+        """放入 LRU 并按内存上限淘汰"""
+        self.frames[index] = pixmap
+        self.frames_bytes += pixmap.width() * pixmap.height() * 4
+        self._evict()
+
+    def _evict(self):
+        """淘汰最久未使用的帧，至少保留最近使用的一帧；使用 FrameStore 时存储本身也计入上限"""
+        if self.store is not None:
+            budget = self.memory_budget - self.store.byte_size()
+            count = self.STORE_PIXMAP_COUNT
+        else:
+            budget = self.memory_budget
+            count = len(self.frames)
+        while len(self.frames) > 1 and (self.frames_bytes > budget or len(self.frames) > count):
+            _, pixmap = self.frames.popitem(last=False)
+            self.frames_bytes -= pixmap.width() * pixmap.height() * 4
+
+    def _on_decoded(self, generation: int, index: int, image: QImage):
+        """后台解码完成（在 GUI 线程中转换为 QPixmap）"""
+        if generation != self.generation or self.store is not None:
+            return
+        self.pending.discard(index)
+        if image.isNull() or index in self.frames:
+            return
+        self._store(index, QPixmap.fromImage(image))
+        self.frame_ready.emit(index)
+
+    def _on_cache_written(self, generation: int, ok: bool):
+        """磁盘缓存构建完成，之后的解码改为读取缓存"""
+        if generation != self.generation:
+            return
+        self.building_cache = False
+        self.build_task = None
+        if ok:
+            frame_set = self.disk_cache.open(self.pet_name, self.scale, self.image_files)
+            if frame_set is not None and len(frame_set) == len(self.image_files):
+                self.frame_set = frame_set
+                self._build_store()
+
+        # 构建期间被请求但已被淘汰的帧重新安排解码
+        pending, self.pending = self.pending, set()
+        for index in pending:
+            if index not in self.frames:
+                self._request(index)
+
+    def _on_store_built(self, store_generation: int, store: Optional[FrameStore]):
+        """FrameStore 构建完成，改为从存储取帧并释放原帧"""
+        if store_generation != self.store_generation or store is None or len(store) != self.frame_count():
+            return
+        in_memory = self.store is not None or self.source_frames is not None
+        if not in_memory and store.byte_size() > self.memory_budget:
+            # 全部帧超出内存上限时继续按需解码
+            return
+        self.store = store
+        self.source_frames = None
+        self.sheet = None
+        self.pending.clear()
+        self.frames.clear()
+        self.frames_bytes = 0
@@ -0,0 +1,114 @@
+import hashlib
+from typing import List, Optional
+from PyQt5 import sip
+from PyQt5.QtCore import QRect, Qt
+from PyQt5.QtGui import QImage, QPainter
+from frame_cache import CACHE_FORMAT
+
+# 索引色最多的颜色数
+INDEXED_MAX_COLORS = 256
+
+def image_buffer(image: QImage) -> sip.voidptr:
+    """QImage 像素数据的只读缓冲区（不复制）"""
+    pointer = image.constBits()
+    pointer.setsize(image.sizeInBytes())
+    return pointer
+
+def slice_frames(sheet: QImage, rects: List[QRect]) -> List[QImage]:
+    """把精灵图切成各帧的 QImage 视图，与精灵图共享像素数据（调用方需保持精灵图存活）"""
+    base = int(sheet.constBits())
+    bytes_per_line = sheet.bytesPerLine()
+    depth = sheet.depth() // 8
+    return [QImage(sip.voidptr(base + rect.y() * bytes_per_line + rect.x() * depth),
+                   rect.width(), rect.height(), bytes_per_line, sheet.format())
+            for rect in rects]
+
+def collect_colors(images: List[QImage], limit: int = INDEXED_MAX_COLORS) -> Optional[List[int]]:
+    """全部帧用到的颜色（非预乘 ARGB），超过 limit 种时返回 None"""
+    colors = set()
+    for image in images:
+        colors.update(memoryview(image_buffer(image.convertToFormat(QImage.Format_ARGB32))).cast('I'))
+        if len(colors) > limit:
+            return None
+    return sorted(colors)
+
+class FrameStore:
+    """一个宠物全部帧的紧凑存储
+
+    内容相同的帧只保存一份，去重后的帧自上而下排在同一张 QImage 中，
+    所有像素位于一块连续的缓冲区；帧索引通过 slots 映射到去重后的槽位。
+    全部帧不超过 256 种颜色时可使用 8 位索引色，每像素 1 字节，且与原图逐像素一致。
+    只使用 QImage，可在后台线程构建，之后只读。
+    """
+
+    def __init__(self, atlas: QImage, rects: List[QRect], slots: List[int]):
+        self.atlas = atlas
+        self.rects = rects  # 槽位 -> 在 atlas 中的区域
+        self.slots = slots  # 帧索引 -> 槽位
+
+    @classmethod
+    def build(cls, images: List[QImage], indexed: bool = False) -> Optional["FrameStore"]:
+        """由各帧构建存储；indexed 为 True 且颜色足够少时使用索引色"""
+        unique = []
+        slots = []
+        seen = {}
+        for image in images:
+            image = image.convertToFormat(CACHE_FORMAT)
+            if image.bytesPerLine() != image.width() * 4:
+                # 精灵图视图的行跨度是整张精灵图的宽度，复制为紧凑的一帧再计算内容摘要
+                image = image.copy()
+            key = (image.width(), image.height(), hashlib.blake2b(image_buffer(image), digest_size=16).digest())
+            slot = seen.get(key)
+            if slot is None:
+                slot = seen[key] = len(unique)
+                unique.append(image)
+            slots.append(slot)
+        if not unique:
+            return None
+
+        rects = []
+        y = 0
+        for image in unique:
+            rects.append(QRect(0, y, image.width(), image.height()))
+            y += image.height()
+        atlas = QImage(max(image.width() for image in unique), y, CACHE_FORMAT)
+        atlas.fill(Qt.transparent)
+        painter = QPainter(atlas)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        for image, rect in zip(unique, rects):
+            painter.drawImage(rect.topLeft(), image)
+        painter.end()
+
+        if indexed:
+            colors = collect_colors(unique)
+            if colors is not None:
+                # 颜色表包含全部颜色，转换时逐像素精确匹配，不抖动
+                atlas = atlas.convertToFormat(QImage.Format_ARGB32).convertToFormat(
+                    QImage.Format_Indexed8, colors, Qt.ThresholdDither | Qt.AvoidDither)
+        return cls(atlas, rects, slots)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def slot(self, index: int) -> int:
+        """帧索引对应的槽位，内容相同的帧槽位相同"""
+        return self.slots[index]
+
+    def image(self, index: int) -> QImage:
+        """某一帧（与 atlas 共享像素数据的视图，转换为 QPixmap 时才复制）"""
+        view = slice_frames(self.atlas, [self.rects[self.slots[index]]])[0]
+        if self.is_indexed():
+            view.setColorTable(self.atlas.colorTable())
+        return view
+
+    def unique_count(self) -> int:
+        """去重后的帧数"""
+        return len(self.rects)
+
+    def is_indexed(self) -> bool:
+        """是否为索引色"""
+        return self.atlas.format() == QImage.Format_Indexed8
+
+    def byte_size(self) -> int:
+        """像素缓冲区占用的字节数"""
+        return self.atlas.sizeInBytes()
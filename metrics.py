@@ -0,0 +1,198 @@
+import bisect
+import threading
+from typing import Dict, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    """格式化标签：{name="value",...}"""
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _format_value(value: float) -> str:
+    """格式化样本值"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class Metric:
+    """指标基类：按标签组合保存样本，所有操作持有同一把锁，可在任意线程调用"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str, lock: threading.Lock):
+        self.name = name
+        self.description = description
+        self.lock = lock
+        self.values: Dict[Tuple[Tuple[str, str], ...], object] = {}
+
+    @staticmethod
+    def _key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def render(self) -> List[str]:
+        """输出文本格式"""
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    """可任意设置的当前值"""
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+class Histogram(Metric):
+    """分桶统计：每个桶的累计次数、总和与总次数"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, description: str, lock: threading.Lock, buckets: Tuple[float, ...]):
+        super().__init__(name, description, lock)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                # [各桶计数..., 总和, 总次数]
+                series = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}"]
+        for key, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+class MetricsRegistry:
+    """指标注册表，输出 Prometheus 文本格式"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics: List[Metric] = []
+
+    def counter(self, name: str, description: str) -> Counter:
+        return self._register(Counter(name, description, self.lock))
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        return self._register(Gauge(name, description, self.lock))
+
+    def histogram(self, name: str, description: str, buckets: Tuple[float, ...]) -> Histogram:
+        return self._register(Histogram(name, description, self.lock, buckets))
+
+    def _register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """所有指标的文本格式"""
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# 全局指标：由 TaskMonitorAPI、PetWidget 和 ProgressWindow 中的埋点更新
+registry = MetricsRegistry()
+poll_latency = registry.histogram(
+    "comfyui_monitor_poll_latency_seconds", "状态轮询请求耗时",
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+polls_total = registry.counter("comfyui_monitor_polls_total", "发起的状态轮询次数")
+poll_failures_total = registry.counter("comfyui_monitor_poll_failures_total", "失败的状态轮询次数")
+connection_changes_total = registry.counter("comfyui_monitor_connection_changes_total", "服务器连接状态变化次数")
+task_duration = registry.histogram(
+    "comfyui_monitor_task_duration_seconds", "任务耗时（按最终状态）",
+    (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600))
+queue_depth = registry.gauge("comfyui_monitor_queue_depth", "服务器队列中的任务数")
+frames_rendered_total = registry.counter("comfyui_monitor_pet_frames_rendered_total", "宠物动画绘制的帧数")
+preview_frames_total = registry.counter("comfyui_monitor_preview_frames_total", "收到的实时预览帧数（按处理结果）")
+progress_update_seconds = registry.histogram(
+    "comfyui_monitor_progress_update_seconds", "进度窗口刷新耗时",
+    (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05))
+
+class MetricsServer:
+    """在后台线程中提供 /metrics 接口"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9464, metrics_registry: MetricsRegistry = registry):
+        self.host = host
+        self.port = port
+        self.registry = metrics_registry
+        self.server = None
+        self.thread = None
+
+    def start(self) -> bool:
+        """启动服务，端口被占用时返回 False"""
+        if self.server is not None:
+            return True
+
+        # 只有启用接口时才加载 http.server（导入约 30 ms）
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics_registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics_registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            print(f"指标服务启动失败: {e}")
+            return False
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="MetricsServer", daemon=True)
+        self.thread.start()
+        return True
+
+    def stop(self):
+        """停止服务"""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.thread = None
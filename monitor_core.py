@@ -0,0 +1,315 @@
+import hashlib
+import json
+import threading
+import time
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+import metrics
+
+class TaskStatus(Enum):
+    """任务状态枚举"""
+    IDLE = "idle"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    ERROR = "error"
+    QUEUED = "queued"
+
+# HTTP 超时（秒）：(连接超时, 读取超时)
+HTTP_TIMEOUT = (1.5, 4.0)
+
+# 每个线程一个 HTTP 会话：requests.Session 不保证线程安全
+_thread_sessions = threading.local()
+
+def create_http_session(pool_connections: int = 4):
+    """创建复用 keep-alive 连接的 HTTP 会话，pool_connections 为保留连接池的主机数"""
+    # 首次使用时才加载 requests（约 90 ms），无界面模式不需要它
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=8, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def get_http_session():
+    """获取当前线程的 HTTP 会话（缩略图、队列历史等后台任务使用）"""
+    session = getattr(_thread_sessions, "session", None)
+    if session is None:
+        session = _thread_sessions.session = create_http_session()
+    return session
+
+class PollScheduler:
+    """自适应轮询调度器：运行中快速轮询，空闲时按倍率逐步放慢"""
+
+    def __init__(self, min_interval: int = 1000, max_interval: int = 5000, backoff: float = 1.5,
+                 power_save_interval: int = 10000):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff = backoff
+        self.current_interval = min_interval
+        # 省电模式下固定使用低频轮询
+        self.power_save_interval = power_save_interval
+        self.power_saving = False
+
+    def set_bounds(self, min_interval: int, max_interval: int):
+        """设置间隔上下限（毫秒）"""
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.current_interval = min(max(self.current_interval, self.min_interval), self.max_interval)
+
+    def reset(self):
+        """恢复到最快轮询（省电模式下为省电间隔）"""
+        self.current_interval = self.power_save_interval if self.power_saving else self.min_interval
+
+    def update(self, status: TaskStatus, queue_active: bool) -> int:
+        """根据最新状态计算下一次轮询间隔"""
+        if self.power_saving:
+            self.current_interval = self.power_save_interval
+        elif status in (TaskStatus.RUNNING, TaskStatus.QUEUED) or queue_active:
+            self.current_interval = self.min_interval
+        else:
+            self.current_interval = min(int(self.current_interval * self.backoff), self.max_interval)
+        return self.current_interval
+
+    def effective_rate(self) -> float:
+        """当前有效轮询频率（次/秒）"""
+        return 1000.0 / self.current_interval if self.current_interval > 0 else 0.0
+
+class StatusDiffer:
+    """比较相邻两次状态数据，输出只包含变化字段的增量"""
+
+    # 服务器返回的字段：这些字段都没有变化的一次轮询记为空操作
+    PAYLOAD_FIELDS = ("status", "task_id", "workflow_progress", "current_task_progress", "queue", "error_info")
+
+    def __init__(self, derived_fields: tuple = ("execution_time",)):
+        # 派生字段（如本地计算的执行时间）变化时也会出现在增量中，但不影响空操作计数
+        self.fields = self.PAYLOAD_FIELDS + tuple(derived_fields)
+        self.previous = {}
+        self.total_ticks = 0
+        self.noop_ticks = 0
+
+    def reset(self):
+        """清空上一次的数据，下一次比较输出全部字段"""
+        self.previous = {}
+
+    def diff(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """返回与上一次相比变化的字段"""
+        self.total_ticks += 1
+        delta = {}
+        payload_changed = False
+        for field in self.fields:
+            value = data.get(field)
+            if field not in self.previous or self.previous[field] != value:
+                delta[field] = value
+                self.previous[field] = value
+                if field in self.PAYLOAD_FIELDS:
+                    payload_changed = True
+
+        if not payload_changed:
+            self.noop_ticks += 1
+        return delta
+
+    def stats(self) -> Dict[str, Any]:
+        """空操作统计"""
+        ratio = self.noop_ticks / self.total_ticks if self.total_ticks else 0.0
+        return {"ticks": self.total_ticks, "noop_ticks": self.noop_ticks, "noop_ratio": ratio}
+
+class FetchError(Exception):
+    """网络请求失败"""
+
+class StatusFetcher:
+    """带条件请求的状态获取：ETag 命中或响应体摘要相同时不解析 JSON
+
+    fetch() 是阻塞调用，返回 ("fetched", 数据)、("not_modified", None) 或 ("failed", 错误信息)。
+    子类可以重写 _get() 更换 HTTP 客户端。
+    """
+
+    def __init__(self):
+        # 条件请求状态：上次请求的 URL、ETag 与响应体摘要
+        self.last_url = None
+        self.etag = None
+        self.content_digest = None
+        # 每个服务器的获取器有自己的会话，服务器再多也不会互相挤掉连接池
+        self.session = None
+
+    def fetch(self, url: str) -> Tuple[str, Any]:
+        """请求状态接口"""
+        try:
+            if url != self.last_url:
+                self.last_url = url
+                self.etag = None
+                self.content_digest = None
+
+            headers = {"If-None-Match": self.etag} if self.etag else {}
+            status_code, etag, content = self._get(url, headers)
+
+            if status_code == 304:
+                return "not_modified", None
+            if status_code != 200:
+                return "failed", f"HTTP {status_code}"
+
+            digest = hashlib.blake2b(content, digest_size=16).digest()
+            if digest == self.content_digest:
+                self.etag = etag
+                return "not_modified", None
+            data = json.loads(content)
+            if not isinstance(data, dict):
+                return "failed", f"响应格式错误: 期望 JSON 对象，实际为 {type(data).__name__}"
+            # 解析成功后才记录 ETag 和摘要，否则错误的响应会被 304 一直"命中"
+            self.etag = etag
+            self.content_digest = digest
+            return "fetched", data
+
+        except FetchError as e:
+            return "failed", str(e)
+        except json.JSONDecodeError as e:
+            return "failed", f"JSON 解析错误: {e}"
+        except Exception as e:
+            return "failed", f"未知错误: {e}"
+
+    def _get(self, url: str, headers: Dict[str, str]) -> Tuple[int, Optional[str], bytes]:
+        """发送 GET 请求，返回 (状态码, ETag, 响应体)；网络错误抛出 FetchError"""
+        import requests
+        if self.session is None:
+            self.session = create_http_session(pool_connections=1)
+        try:
+            response = self.session.get(url, headers=headers, timeout=HTTP_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            raise FetchError(str(e))
+        return response.status_code, response.headers.get("ETag"), response.content
+
+class MonitorState:
+    """单个服务器的任务状态机：跟踪任务切换、计算执行时间并比较字段差异
+
+    不依赖 Qt，由 TaskMonitorAPI（界面）和 monitor_daemon（无界面）共用。
+    """
+
+    def __init__(self, server: str = ""):
+        self.server = server  # 指标标签
+        self.last_status = TaskStatus.IDLE
+        self.last_task_data = {}
+
+        # 执行时间跟踪
+        self.execution_start_time = None
+        self.current_execution_time = 0
+        self.last_task_id = None
+
+        # 字段级差异比较
+        self.differ = StatusDiffer()
+
+    def update(self, data: Dict[str, Any], now: Optional[float] = None) -> Tuple[bool, Dict[str, Any]]:
+        """处理一次状态数据，返回 (状态是否变化, 变化的字段)；非对象数据或未知状态值抛出 ValueError"""
+        if not isinstance(data, dict):
+            raise ValueError(f"状态数据不是 JSON 对象: {type(data).__name__}")
+        now = time.time() if now is None else now
+        status_str = data.get("status", "idle")
+        try:
+            current_status = TaskStatus(status_str)
+        except ValueError:
+            raise ValueError(f"未知状态: {status_str}")
+        current_task_id = data.get("task_id")
+
+        # 检查任务是否变化
+        if current_task_id != self.last_task_id:
+            self.last_task_id = current_task_id
+            if current_status == TaskStatus.RUNNING:
+                # 新任务开始
+                self.execution_start_time = now
+                self.current_execution_time = 0
+            else:
+                # 任务结束或空闲
+                self.execution_start_time = None
+                self.current_execution_time = 0
+
+        # 计算当前执行时间
+        if self.execution_start_time and current_status == TaskStatus.RUNNING:
+            self.current_execution_time = now - self.execution_start_time
+        elif current_status in [TaskStatus.COMPLETED, TaskStatus.ERROR]:
+            # 任务完成，保持最后的执行时间
+            if self.execution_start_time:
+                self.current_execution_time = now - self.execution_start_time
+                self.execution_start_time = None
+                metrics.task_duration.observe(self.current_execution_time, status=status_str)
+        elif current_status == TaskStatus.IDLE:
+            # 空闲状态，重置时间
+            self.execution_start_time = None
+            self.current_execution_time = 0
+
+        queue = data.get("queue") or {}
+        metrics.queue_depth.set(queue.get("running_count", 0), server=self.server, state="running")
+        metrics.queue_depth.set(queue.get("pending_count", 0), server=self.server, state="pending")
+
+        # 检查状态是否变化
+        status_changed = current_status != self.last_status
+        self.last_status = current_status
+
+        # 更新数据，添加我们计算的执行时间
+        updated_data = data.copy()
+        updated_data["execution_time"] = self.current_execution_time
+        self.last_task_data = updated_data
+        return status_changed, self.differ.diff(updated_data)
+
+    def refresh(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """服务器数据未变化时的一次更新：运行中只刷新本地计算的执行时间"""
+        if self.last_status == TaskStatus.RUNNING and self.execution_start_time:
+            now = time.time() if now is None else now
+            self.current_execution_time = now - self.execution_start_time
+            self.last_task_data["execution_time"] = self.current_execution_time
+        return self.differ.diff(self.last_task_data)
+
+    def queue_active(self) -> bool:
+        """队列中是否有运行或等待的任务"""
+        queue = self.last_task_data.get("queue") or {}
+        return queue.get("running_count", 0) + queue.get("pending_count", 0) > 0
+
+    def is_task_running(self) -> bool:
+        """检查是否有任务正在运行"""
+        return self.last_status in [TaskStatus.RUNNING, TaskStatus.QUEUED]
+
+    def get_progress_info(self) -> Dict[str, Any]:
+        """获取进度信息"""
+        if not self.last_task_data:
+            return {}
+
+        progress_info = {
+            "status": self.last_status.value,
+            "task_id": self.last_task_data.get("task_id"),
+            "execution_time": self.last_task_data.get("execution_time", 0),
+            "workflow_progress": self.last_task_data.get("workflow_progress", {}),
+            "current_task_progress": self.last_task_data.get("current_task_progress"),
+            "queue": self.last_task_data.get("queue", {}),
+            "error_info": self.last_task_data.get("error_info")
+        }
+
+        return progress_info
+
+    def get_workflow_progress_percentage(self) -> float:
+        """获取工作流进度百分比"""
+        workflow_progress = self.last_task_data.get("workflow_progress", {})
+        total_nodes = workflow_progress.get("total_nodes", 0)
+        executed_nodes = workflow_progress.get("executed_nodes", 0)
+
+        if total_nodes > 0:
+            return (executed_nodes / total_nodes) * 100
+        return 0.0
+
+    def get_current_node_progress_percentage(self) -> float:
+        """获取当前节点进度百分比"""
+        current_progress = self.last_task_data.get("current_task_progress")
+        if current_progress:
+            step = current_progress.get("step", 0)
+            total_steps = current_progress.get("total_steps", 0)
+            if total_steps > 0:
+                return (step / total_steps) * 100
+        return 0.0
+
+    def get_overall_progress_percentage(self) -> float:
+        """获取整体进度百分比（已完成节点加上当前节点的步骤进度）"""
+        workflow_progress = self.last_task_data.get("workflow_progress") or {}
+        total_nodes = workflow_progress.get("total_nodes", 0)
+        if total_nodes <= 0:
+            return 0.0
+
+        executed_nodes = workflow_progress.get("executed_nodes", 0)
+        node_fraction = self.get_current_node_progress_percentage() / 100
+        return min(100.0, (executed_nodes + node_fraction) / total_nodes * 100)
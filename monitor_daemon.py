@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ComfyUI 任务监控守护进程（无界面）
+不依赖 PyQt5，适合在没有桌面环境的渲染节点上运行；状态变化以文本行或 JSON 事件输出到标准输出。
+
+用法: python monitor_daemon.py                      # 监控 config.json 中配置的所有服务器
+      python monitor_daemon.py --url http://127.0.0.1:8188 --format json
+      python monitor_daemon.py --once               # 查询一次后退出
+"""
+
+import argparse
+import http.client
+import json
+import signal
+import sys
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+from monitor_core import TaskStatus, HTTP_TIMEOUT, PollScheduler, FetchError, StatusFetcher, MonitorState
+from config import ConfigManager
+import metrics
+
+class LightStatusFetcher(StatusFetcher):
+    """用标准库 http.client 发送请求并保持连接，避免加载 requests 拖慢启动"""
+
+    def __init__(self):
+        super().__init__()
+        self.connection = None
+        self.connection_key = None
+
+    def _get(self, url: str, headers: Dict[str, str]) -> Tuple[int, Optional[str], bytes]:
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path + ("?" + parts.query if parts.query else "")
+        key = (parts.scheme, parts.netloc)
+        reused = self.connection is not None and key == self.connection_key
+        if not reused:
+            self.close()
+            connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            self.connection = connection_class(parts.netloc, timeout=HTTP_TIMEOUT[1])
+            self.connection_key = key
+
+        try:
+            self.connection.request("GET", path or "/", headers=headers)
+            response = self.connection.getresponse()
+            return response.status, response.getheader("ETag"), response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            if reused:
+                # 服务器可能已关闭空闲连接，用新连接重试一次
+                return self._get(url, headers)
+            raise FetchError(str(e))
+
+    def close(self):
+        """关闭连接"""
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+class ServerPoller:
+    """单个服务器的轮询状态"""
+
+    def __init__(self, name: str, url: str, refresh_interval: int, max_refresh_interval: int):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.state = MonitorState(self.url)
+        self.scheduler = PollScheduler(refresh_interval, max_refresh_interval)
+        self.fetcher = LightStatusFetcher()
+        self.is_connected = None  # None 表示尚未请求过
+        self.next_poll = 0.0
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """请求一次状态，返回产生的事件"""
+        events = []
+        started = time.perf_counter()
+        metrics.polls_total.inc(server=self.url)
+        result, value = self.fetcher.fetch(f"{self.url}/task_monitor/status")
+        metrics.poll_latency.observe(time.perf_counter() - started, server=self.url)
+
+        if result == "failed":
+            metrics.poll_failures_total.inc(server=self.url)
+            if self.is_connected is not False:
+                self.is_connected = False
+                metrics.connection_changes_total.inc(server=self.url, connected="false")
+                events.append({"event": "connection", "connected": False, "error": value})
+            # 服务器不可用时同样逐步放慢轮询
+            self.scheduler.update(TaskStatus.IDLE, False)
+            return events
+
+        if not self.is_connected:
+            self.is_connected = True
+            metrics.connection_changes_total.inc(server=self.url, connected="true")
+            events.append({"event": "connection", "connected": True})
+
+        if result == "fetched":
+            try:
+                status_changed, delta = self.state.update(value)
+            except ValueError as e:
+                events.append({"event": "error", "error": str(e)})
+                return events
+            if status_changed:
+                events.append({"event": "status", "status": self.state.last_status.value,
+                               "task_id": self.state.last_task_data.get("task_id")})
+        else:
+            delta = self.state.refresh()
+
+        if delta:
+            events.append({"event": "progress", "delta": delta})
+        self.scheduler.update(self.state.last_status, self.state.queue_active())
+        return events
+
+def format_text(name: str, event: Dict[str, Any], state: MonitorState) -> str:
+    """把事件格式化为一行文本，不需要输出的事件返回空字符串"""
+    kind = event["event"]
+    if kind == "connection":
+        return f"{name} 已连接" if event["connected"] else f"{name} 连接断开: {event.get('error')}"
+    if kind == "error":
+        return f"{name} {event['error']}"
+    if kind == "status":
+        return f"{name} {event['status']} task={event.get('task_id') or '-'} {state.current_execution_time:.1f}s"
+
+    # 进度：只在节点或步骤变化时输出，执行时间单独变化时不输出
+    delta = event["delta"]
+    if state.last_status != TaskStatus.RUNNING or not (
+            "workflow_progress" in delta or "current_task_progress" in delta):
+        return ""
+    workflow_progress = state.last_task_data.get("workflow_progress") or {}
+    line = (f"{name} running {workflow_progress.get('executed_nodes', 0)}/{workflow_progress.get('total_nodes', 0)} "
+            f"节点 {state.get_overall_progress_percentage():.0f}%")
+    current = state.last_task_data.get("current_task_progress")
+    if current and current.get("total_steps"):
+        line += f" 步骤 {current.get('step', 0)}/{current['total_steps']}"
+    return line + f" {state.current_execution_time:.1f}s"
+
+def emit(poller: ServerPoller, events: List[Dict[str, Any]], output_format: str):
+    """输出事件"""
+    now = time.time()
+    for event in events:
+        if output_format == "json":
+            line = json.dumps({"t": round(now, 3), "server": poller.name, **event},
+                              ensure_ascii=False, separators=(",", ":"))
+        else:
+            line = format_text(poller.name, event, poller.state)
+            if not line:
+                continue
+            line = time.strftime("%H:%M:%S", time.localtime(now)) + " " + line
+        print(line, flush=True)
+
+def resolve_servers(args) -> Tuple[List[Tuple[str, str]], int, int]:
+    """确定要监控的服务器和轮询间隔：命令行优先，其次是配置文件"""
+    config_manager = ConfigManager(args.config)
+    servers = [(url.rstrip('/'), url) for url in args.url] or config_manager.get_comfyui_servers()
+    refresh_interval = args.interval or config_manager.get("monitor_settings.refresh_interval", 1000)
+    max_refresh_interval = args.max_interval or config_manager.get("monitor_settings.max_refresh_interval", 5000)
+    return servers, refresh_interval, max_refresh_interval
+
+def run(args) -> int:
+    """轮询循环：每次处理下一个到期的服务器，直到收到退出信号"""
+    servers, refresh_interval, max_refresh_interval = resolve_servers(args)
+    pollers = [ServerPoller(name, url, refresh_interval, max_refresh_interval) for name, url in servers]
+
+    metrics_server = None
+    if args.metrics_port:
+        metrics_server = metrics.MetricsServer(args.metrics_host, args.metrics_port)
+        metrics_server.start()
+
+    stop_event = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop_event.set())
+
+    try:
+        if args.once:
+            for poller in pollers:
+                emit(poller, poller.poll(), args.format)
+            return 0 if all(poller.is_connected for poller in pollers) else 1
+
+        while not stop_event.is_set():
+            poller = min(pollers, key=lambda p: p.next_poll)
+            delay = poller.next_poll - time.monotonic()
+            if delay > 0 and stop_event.wait(delay):
+                break
+            emit(poller, poller.poll(), args.format)
+            poller.next_poll = time.monotonic() + poller.scheduler.current_interval / 1000
+        return 0
+    except BrokenPipeError:
+        # 输出管道被关闭（例如 | head）
+        return 0
+    finally:
+        for poller in pollers:
+            poller.fetcher.close()
+        if metrics_server is not None:
+            metrics_server.stop()
+
+def parse_arguments(argv: List[str]) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="ComfyUI 任务监控守护进程（无界面）")
+    parser.add_argument("--url", action="append", default=[], help="服务器地址，可重复；默认读取配置文件")
+    parser.add_argument("--config", default="config.json", help="配置文件")
+    parser.add_argument("--format", choices=["text", "json"], default="text", help="输出格式")
+    parser.add_argument("--interval", type=int, help="任务运行时的轮询间隔（毫秒）")
+    parser.add_argument("--max-interval", type=int, help="空闲时的最大轮询间隔（毫秒）")
+    parser.add_argument("--once", action="store_true", help="每个服务器查询一次后退出")
+    parser.add_argument("--metrics-port", type=int, help="在该端口提供 /metrics 接口")
+    parser.add_argument("--metrics-host", default="127.0.0.1")
+    return parser.parse_args(argv)
+
+def main():
+    """主函数"""
+    sys.exit(run(parse_arguments(sys.argv[1:])))
+
+if __name__ == "__main__":
+    main()
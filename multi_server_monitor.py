@@ -0,0 +1,301 @@
+from typing import Dict, Any, List, Optional, Tuple
+from PyQt5.QtCore import QObject, QTimer, QByteArray, pyqtSignal
+from task_monitor_api import TaskMonitorAPI
+from monitor_core import TaskStatus, StatusDiffer
+
+# 汇总时的状态优先级：数值越大越"忙"
+STATUS_RANK = {
+    TaskStatus.IDLE: 0,
+    TaskStatus.COMPLETED: 1,
+    TaskStatus.ERROR: 2,
+    TaskStatus.QUEUED: 3,
+    TaskStatus.RUNNING: 4
+}
+
+class MultiServerMonitor(QObject):
+    """同时监控多个 ComfyUI 服务器，并向宠物和进度窗口提供汇总视图"""
+
+    # 信号定义
+    status_changed = pyqtSignal(str)  # 汇总状态变化信号
+    progress_updated = pyqtSignal(dict)  # 汇总进度更新信号
+    progress_delta = pyqtSignal(dict)  # 汇总增量更新信号（只包含变化的字段）
+    error_occurred = pyqtSignal(str)  # 错误信号（带服务器名称）
+    server_connection_changed = pyqtSignal(str, bool)  # 单个服务器连接状态变化 (名称, 是否连接)
+    server_progress_updated = pyqtSignal(str, dict)  # 单个服务器进度更新 (名称, 数据)
+    preview_frame = pyqtSignal(str, QByteArray, int, str)  # 实时预览帧 (名称, 消息, 图片数据偏移, 图片格式)
+
+    def __init__(self, primary: TaskMonitorAPI, primary_name: str = "默认"):
+        super().__init__()
+        # 每个服务器一个独立的 TaskMonitorAPI，各自拥有请求线程，慢主机互不影响
+        self.monitors: Dict[str, TaskMonitorAPI] = {}
+        # 已移除、后台线程尚未退出的监控器（保留引用，避免线程运行中被销毁）
+        self.retired: List[TaskMonitorAPI] = []
+        self.primary = primary
+        self.primary_name = primary_name
+        self.last_status = TaskStatus.IDLE
+        self.last_aggregate = {}
+        self.is_monitoring = False
+        self.differ = StatusDiffer(("execution_time", "eta", "queue_drain", "server_name", "servers"))
+        self.eta_estimator = None
+
+        self.monitors[primary_name] = primary
+        self._attach(primary)
+
+        # 同一轮询周期内多个服务器的更新合并为一次汇总
+        self.aggregate_timer = QTimer()
+        self.aggregate_timer.setSingleShot(True)
+        self.aggregate_timer.setInterval(0)
+        self.aggregate_timer.timeout.connect(self._emit_aggregate)
+
+    def _attach(self, monitor: TaskMonitorAPI):
+        """接入一个服务器监控器的信号（名称在信号触发时查找，主服务器改名后随之变化）"""
+        monitor.status_changed.connect(self._schedule_aggregate)
+        monitor.progress_updated.connect(
+            lambda data, monitor=monitor: self._on_server_progress(monitor, data))
+        monitor.connection_changed.connect(
+            lambda connected, monitor=monitor: self._on_connection_changed(monitor, connected))
+        monitor.error_occurred.connect(
+            lambda message, monitor=monitor: self._on_error(monitor, message))
+        monitor.preview_frame.connect(
+            lambda message, offset, image_format, monitor=monitor:
+            self._on_preview_frame(monitor, message, offset, image_format))
+
+    def _name_of(self, monitor: TaskMonitorAPI) -> Optional[str]:
+        """监控器当前的名称，已被移除时返回 None"""
+        for name, candidate in self.monitors.items():
+            if candidate is monitor:
+                return name
+        return None
+
+    def set_servers(self, servers: List[Tuple[str, str]]):
+        """设置服务器列表 [(名称, URL)]，第一个为主服务器"""
+        if not servers:
+            return
+
+        primary_name, primary_url = servers[0]
+        if primary_name != self.primary_name:
+            self.monitors.pop(self.primary_name, None)
+            self.primary_name = primary_name
+            # 新名称原先属于额外服务器时由主服务器取代
+            displaced = self.monitors.get(primary_name)
+            if displaced is not None and displaced is not self.primary:
+                self._retire(displaced)
+            self.monitors[primary_name] = self.primary
+        self.primary.set_base_url(primary_url)
+
+        wanted = dict(servers[1:])
+        wanted.pop(primary_name, None)
+
+        # 移除不再需要的服务器
+        for name in list(self.monitors):
+            if name != self.primary_name and name not in wanted:
+                self._retire(self.monitors.pop(name))
+
+        # 新增或更新服务器
+        for name, url in wanted.items():
+            monitor = self.monitors.get(name)
+            if monitor is None:
+                monitor = TaskMonitorAPI(url, self.primary.refresh_interval, self.primary.scheduler.max_interval)
+                monitor.set_transport(self.primary.transport)
+                monitor.set_power_save_interval(self.primary.scheduler.power_save_interval)
+                monitor.set_power_saving(self.primary.scheduler.power_saving)
+                monitor.set_recorder(self.primary.recorder)
+                self.monitors[name] = monitor
+                self._attach(monitor)
+                if self.is_monitoring:
+                    monitor.start_monitoring()
+            else:
+                monitor.set_base_url(url)
+
+        self._schedule_aggregate()
+
+    def _retire(self, monitor: TaskMonitorAPI):
+        """停止一个被移除的监控器，不在界面线程等待其正在进行的请求"""
+        self.retired.append(monitor)
+        monitor.fetch_thread.finished.connect(lambda monitor=monitor: self._forget(monitor))
+        monitor.release()
+
+    def _forget(self, monitor: TaskMonitorAPI):
+        """被移除的监控器的后台线程已退出，释放引用"""
+        # finished 在线程退出前发出，这里的等待只是等它真正结束，不会阻塞在请求上
+        monitor.fetch_thread.wait()
+        if monitor in self.retired:
+            self.retired.remove(monitor)
+
+    def set_eta_estimator(self, estimator):
+        """设置剩余时间估计器，汇总数据中会带上 eta 和 queue_drain（秒）"""
+        self.eta_estimator = estimator
+        self._schedule_aggregate()
+
+    def extra_monitors(self) -> List[TaskMonitorAPI]:
+        """除主服务器外的监控器"""
+        return [monitor for name, monitor in self.monitors.items() if name != self.primary_name]
+
+    def set_refresh_interval(self, interval: int):
+        """设置额外服务器的刷新间隔（主服务器由调用方直接设置）"""
+        for monitor in self.extra_monitors():
+            monitor.set_refresh_interval(interval)
+
+    def set_max_refresh_interval(self, interval: int):
+        """设置额外服务器的最慢刷新间隔"""
+        for monitor in self.extra_monitors():
+            monitor.set_max_refresh_interval(interval)
+
+    def set_transport(self, transport: str):
+        """设置额外服务器的数据通道"""
+        for monitor in self.extra_monitors():
+            monitor.set_transport(transport)
+
+    def set_power_saving(self, enabled: bool):
+        """所有服务器进入/退出省电模式"""
+        for monitor in self.monitors.values():
+            monitor.set_power_saving(enabled)
+
+    def set_power_save_interval(self, interval: int):
+        """设置所有服务器的省电轮询间隔"""
+        for monitor in self.monitors.values():
+            monitor.set_power_save_interval(interval)
+
+    def set_recorder(self, recorder):
+        """所有服务器的状态数据写入同一个录制器"""
+        for monitor in self.monitors.values():
+            monitor.set_recorder(recorder)
+
+    def start_monitoring(self):
+        """开始监控所有服务器"""
+        self.is_monitoring = True
+        for monitor in self.monitors.values():
+            monitor.start_monitoring()
+
+    def shutdown(self):
+        """停止所有服务器的监控并结束后台线程"""
+        self.is_monitoring = False
+        for monitor in list(self.monitors.values()) + self.retired:
+            monitor.shutdown()
+
+    def _on_connection_changed(self, monitor: TaskMonitorAPI, connected: bool):
+        """单个服务器连接状态变化"""
+        name = self._name_of(monitor)
+        if name is None:
+            return
+        self.server_connection_changed.emit(name, connected)
+        self._schedule_aggregate()
+
+    def _on_error(self, monitor: TaskMonitorAPI, message: str):
+        """单个服务器出错"""
+        name = self._name_of(monitor)
+        if name is not None:
+            self.error_occurred.emit(f"[{name}] {message}")
+
+    def _on_preview_frame(self, monitor: TaskMonitorAPI, message: QByteArray, offset: int, image_format: str):
+        """单个服务器的实时预览帧"""
+        name = self._name_of(monitor)
+        if name is not None:
+            self.preview_frame.emit(name, message, offset, image_format)
+
+    def _on_server_progress(self, monitor: TaskMonitorAPI, data: Dict[str, Any]):
+        """单个服务器进度更新"""
+        name = self._name_of(monitor)
+        if name is None:
+            return
+        if self.eta_estimator is not None:
+            self.eta_estimator.observe(name, data)
+        self.server_progress_updated.emit(name, data)
+        self._schedule_aggregate()
+
+    def _schedule_aggregate(self, *_):
+        """推迟到事件循环空闲时再汇总"""
+        if not self.aggregate_timer.isActive():
+            self.aggregate_timer.start()
+
+    def _server_load(self, monitor: TaskMonitorAPI) -> Tuple[int, int]:
+        """服务器繁忙程度：(状态优先级, 队列长度)"""
+        queue = monitor.last_task_data.get("queue") or {}
+        queued = queue.get("running_count", 0) + queue.get("pending_count", 0)
+        return STATUS_RANK.get(monitor.last_status, 0), queued
+
+    def aggregate(self) -> Dict[str, Any]:
+        """计算汇总视图：总运行/等待数、最忙的服务器以及每个服务器的明细"""
+        servers = []
+        total_running = 0
+        total_pending = 0
+        busiest_name = self.primary_name
+        busiest_load = (-1, -1)
+
+        for name, monitor in self.monitors.items():
+            queue = monitor.last_task_data.get("queue") or {}
+            running_count = queue.get("running_count", 0) if monitor.is_connected else 0
+            pending_count = queue.get("pending_count", 0) if monitor.is_connected else 0
+            total_running += running_count
+            total_pending += pending_count
+            servers.append({
+                "name": name,
+                "url": monitor.base_url,
+                "connected": monitor.is_connected,
+                "status": monitor.last_status.value,
+                "running_count": running_count,
+                "pending_count": pending_count
+            })
+
+            load = self._server_load(monitor) if monitor.is_connected else (-1, -1)
+            if load > busiest_load:
+                busiest_name = name
+                busiest_load = load
+
+        busiest = self.monitors[busiest_name]
+        data = busiest.get_progress_info() or {"status": busiest.last_status.value}
+        data["queue"] = {"running_count": total_running, "pending_count": total_pending}
+        data["server_name"] = busiest_name
+        data["servers"] = servers
+        data["eta"], data["queue_drain"] = self._estimate(busiest_name)
+        return data
+
+    def _estimate(self, busiest_name: str) -> Tuple[Any, Any]:
+        """最忙服务器的剩余时间，以及所有服务器中最晚的队列清空时间（取整到秒）"""
+        if self.eta_estimator is None:
+            return None, None
+
+        busiest = self.monitors[busiest_name]
+        eta = self.eta_estimator.estimate(busiest_name, busiest.last_task_data) if busiest.is_connected else None
+
+        # 各服务器并行处理，整体清空时间取最晚的一个
+        drains = []
+        for name, monitor in self.monitors.items():
+            if monitor.is_connected:
+                drain = self.eta_estimator.queue_drain(name, monitor.last_task_data)
+                if drain is not None:
+                    drains.append(drain)
+        queue_drain = max(drains) if drains else None
+
+        return (round(eta) if eta is not None else None,
+                round(queue_drain) if queue_drain is not None else None)
+
+    def _emit_aggregate(self):
+        """发送汇总信号"""
+        data = self.aggregate()
+        self.last_aggregate = data
+
+        status = TaskStatus(data.get("status", "idle"))
+        if status != self.last_status:
+            self.last_status = status
+            self.status_changed.emit(status.value)
+
+        delta = self.differ.diff(data)
+        if delta:
+            self.progress_delta.emit(delta)
+            self.progress_updated.emit(data)
+
+    def get_progress_info(self) -> Dict[str, Any]:
+        """获取汇总后的进度信息"""
+        return self.aggregate()
+
+    def get_overall_progress_percentage(self) -> float:
+        """获取最忙服务器的整体进度百分比"""
+        monitor = self.monitors.get(self.last_aggregate.get("server_name"))
+        if monitor is None:
+            return 0.0
+        return monitor.get_overall_progress_percentage()
+
+    def is_task_running(self) -> bool:
+        """是否有任意服务器正在运行任务"""
+        return any(monitor.is_task_running() for monitor in self.monitors.values())
@@ -0,0 +1,198 @@
+import glob
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage, QImageReader
+from frame_cache import CACHE_FORMAT, FrameDiskCache
+from frame_store import slice_frames
+
+# 打包宠物的清单文件名
+PET_MANIFEST = "pet.json"
+
+# 可直接作为宠物的动图格式（APNG 需要支持动画的 PNG 插件，否则只显示首帧）
+ANIMATED_EXTENSIONS = (".gif", ".webp", ".apng")
+
+# 动画状态
+PET_STATES = ("idle", "running", "completed", "error")
+
+def frame_number(filename: str) -> int:
+    """序列图片文件名中的帧号（取最后一组数字，兼容 Girl_00001_.png 这类命名）"""
+    numbers = re.findall(r"\d+", os.path.splitext(os.path.basename(filename))[0])
+    return int(numbers[-1]) if numbers else 0
+
+def find_frame_files(pet_dir: str, pet_name: str) -> List[str]:
+    """旧版目录格式：按帧号排序的 <宠物名>_*.png"""
+    image_files = glob.glob(os.path.join(pet_dir, f"{pet_name}_*.png"))
+    image_files.sort(key=lambda image_file: (frame_number(image_file), image_file))
+    return image_files
+
+def find_animated_file(pet_dir: str) -> Optional[str]:
+    """目录中的动图文件（没有清单时使用）"""
+    try:
+        names = sorted(os.listdir(pet_dir))
+    except OSError:
+        return None
+    for name in names:
+        if name.lower().endswith(ANIMATED_EXTENSIONS):
+            return os.path.join(pet_dir, name)
+    return None
+
+def is_pet_directory(pet_dir: str) -> bool:
+    """目录是否可作为宠物：包含清单、动图或序列图片"""
+    try:
+        names = os.listdir(pet_dir)
+    except OSError:
+        return False
+    return any(name == PET_MANIFEST or name.lower().endswith((".png",) + ANIMATED_EXTENSIONS) for name in names)
+
+def default_state_ranges(count: int) -> Dict[str, Tuple[int, int]]:
+    """未指定时的状态帧范围：空闲和错误显示首帧，运行时循环全部帧，完成时显示末帧"""
+    last = max(0, count - 1)
+    return {"idle": (0, 0), "running": (0, last), "completed": (last, last), "error": (0, 0)}
+
+def read_sheet(image_path: str, disk_cache: Optional[FrameDiskCache] = None) -> QImage:
+    """读取精灵图；有磁盘缓存时优先读取已解码的原始像素，未命中则解码后写入缓存"""
+    cache_name = os.path.basename(os.path.dirname(image_path)) + ".sheet"
+    if disk_cache is not None:
+        frame_set = disk_cache.open(cache_name, 1.0, [image_path])
+        sheet = frame_set.read_frame(0) if frame_set is not None and len(frame_set) == 1 else None
+        if sheet is not None:
+            return sheet
+
+    sheet = QImage(image_path)
+    if sheet.isNull():
+        return sheet
+    sheet = sheet.convertToFormat(CACHE_FORMAT)
+    if disk_cache is not None:
+        disk_cache.save(cache_name, 1.0, [image_path], [sheet])
+    return sheet
+
+def read_animation(path: str) -> Tuple[List[QImage], List[int]]:
+    """顺序解码动图的全部帧，返回 (帧, 每帧时长（毫秒）)"""
+    reader = QImageReader(path)
+    frames, durations = [], []
+    while True:
+        image = reader.read()
+        if image.isNull():
+            break
+        frames.append(image.convertToFormat(CACHE_FORMAT))
+        durations.append(reader.nextImageDelay())
+        if not reader.supportsAnimation() or not reader.canRead():
+            break
+    return frames, durations
+
+class PetSource:
+    """一个宠物的帧来源
+
+    旧版目录格式只给出按顺序排列的图片文件，由 FrameProvider 逐帧解码；
+    打包格式（精灵图 + 清单）和动图在加载时一次性读入，frames 为内存中的各帧，
+    精灵图的各帧是共享同一块像素数据的视图。
+    """
+
+    def __init__(self, name: str, image_files: Optional[List[str]] = None,
+                 frames: Optional[List[QImage]] = None, sheet: Optional[QImage] = None,
+                 durations: Optional[List[int]] = None, states: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.name = name
+        self.image_files = image_files or []
+        self.frames = frames
+        self.sheet = sheet  # 帧视图引用的精灵图，须与 frames 同生命周期
+        self.durations = durations  # 每帧时长（毫秒），None 表示使用设置中的动画速度
+        self.states = states or {}
+
+    def frame_duration(self, index: int) -> Optional[int]:
+        """某一帧的显示时长，未指定时返回 None"""
+        if self.durations and 0 <= index < len(self.durations) and self.durations[index] > 0:
+            return self.durations[index]
+        return None
+
+    def state_range(self, state: str, count: int) -> Tuple[int, int]:
+        """状态对应的帧范围 (起始, 结束)，包含两端并限制在实际帧数内"""
+        start, end = self.states.get(state) or default_state_ranges(count)[state]
+        last = max(0, count - 1)
+        start = max(0, min(start, last))
+        return start, max(start, min(end, last))
+
+def _parse_states(states: dict) -> Dict[str, Tuple[int, int]]:
+    """解析清单中的状态帧范围，单个整数表示只有一帧"""
+    ranges = {}
+    for state in PET_STATES:
+        value = states.get(state)
+        if isinstance(value, int):
+            ranges[state] = (value, value)
+        elif isinstance(value, list) and len(value) == 2 and all(isinstance(v, int) for v in value):
+            ranges[state] = (value[0], value[1])
+    return ranges
+
+def load_packed_pet(pet_dir: str, name: str, disk_cache: Optional[FrameDiskCache] = None) -> Optional[PetSource]:
+    """读取清单描述的打包宠物"""
+    manifest_path = os.path.join(pet_dir, PET_MANIFEST)
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        image_path = os.path.join(pet_dir, manifest["image"])
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"宠物清单读取失败: {manifest_path}: {e}")
+        return None
+
+    rects = manifest.get("frames")
+    if rects:
+        # 精灵图：一次读入，各帧为视图
+        sheet = read_sheet(image_path, disk_cache)
+        if sheet.isNull():
+            print(f"精灵图读取失败: {image_path}")
+            return None
+        bounds = sheet.rect()
+        try:
+            rects = [QRect(*rect[:4]) for rect in rects]
+        except TypeError:
+            print(f"宠物清单中的帧区域无效: {manifest_path}")
+            return None
+        if not all(bounds.contains(rect) and not rect.isEmpty() for rect in rects):
+            print(f"宠物清单中的帧区域超出精灵图: {manifest_path}")
+            return None
+        frames = slice_frames(sheet, rects)
+        durations = None
+    else:
+        # 动图：帧时长默认取自文件
+        sheet = None
+        frames, durations = read_animation(image_path)
+        if not frames:
+            print(f"动图读取失败: {image_path}")
+            return None
+
+    if "durations" in manifest:
+        durations = manifest["durations"]
+        if isinstance(durations, int):
+            durations = [durations] * len(frames)
+        elif not isinstance(durations, list) or not all(isinstance(d, int) for d in durations):
+            print(f"宠物清单中的帧时长无效: {manifest_path}")
+            durations = None
+    states = manifest.get("states")
+    return PetSource(name, frames=frames, sheet=sheet, durations=durations,
+                     states=_parse_states(states) if isinstance(states, dict) else None)
+
+def load_pet_source(pet_name: str, images_dir: str = "images",
+                    disk_cache: Optional[FrameDiskCache] = None) -> Optional[PetSource]:
+    """查找宠物的帧来源：清单 > 序列图片 > 动图
+
+    传入 disk_cache 时，解码后的精灵图以原始像素缓存，之后启动只需读取一次文件。
+    """
+    pet_dir = os.path.join(images_dir, pet_name)
+    if not os.path.isdir(pet_dir):
+        return None
+
+    if os.path.exists(os.path.join(pet_dir, PET_MANIFEST)):
+        return load_packed_pet(pet_dir, pet_name, disk_cache)
+
+    image_files = find_frame_files(pet_dir, pet_name)
+    if image_files:
+        return PetSource(pet_name, image_files=image_files)
+
+    animated_file = find_animated_file(pet_dir)
+    if animated_file is not None:
+        frames, durations = read_animation(animated_file)
+        if frames:
+            return PetSource(pet_name, frames=frames, durations=durations)
+    return None
@@ -1,9 +1,13 @@
 import os
-import glob
+from typing import Optional, Tuple
 from PyQt5.QtWidgets import QLabel, QMenu, QAction, QApplication
 from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QPoint
-from PyQt5.QtGui import QPixmap, QIcon, QCursor
-from task_monitor_api import TaskStatus
+from PyQt5.QtGui import QIcon, QCursor
+from monitor_core import TaskStatus
+from frame_provider import FrameProvider
+from pet_source import load_pet_source
+from power_monitor import wakeup_counter, display_frame_interval
+import metrics
 
 class PetWidget(QLabel):
     """桌面宠物挂件组件"""
@@ -12,23 +16,39 @@ class PetWidget(QLabel):
     double_clicked = pyqtSignal()  # 双击信号
     settings_requested = pyqtSignal()  # 设置请求信号
     quit_requested = pyqtSignal()  # 退出请求信号
-    position_changed = pyqtSignal(int, int)  # 位置变化信号 (x, y)
+    position_changed = pyqtSignal(int, int)  # 位置变化信号 (x, y)，拖动时每个显示帧最多一次
+    drag_finished = pyqtSignal(int, int)  # 拖动结束信号 (x, y)
 
-    def __init__(self, pet_name: str = "meizi", parent=None):
+    def __init__(self, pet_name: str = "meizi", size_scale: float = 1.0, parent=None):
         super().__init__(parent)
 
         self.pet_name = pet_name
-        self.images = []
-        self.current_frame = 0
+        self.pet_source = None  # 帧来源，提供各状态的帧范围和每帧时长
+        self.frames = FrameProvider()
+        self.frames.frame_ready.connect(self._on_frame_ready)
+        self.current_frame = 0  # 期望显示的帧
+        self.displayed_frame = -1  # 实际已显示的帧
         self.animation_timer = QTimer()
         self.animation_speed = 250  # 毫秒
         self.is_dragging = False
+        self.drag_moved = False  # 本次拖动中窗口是否实际移动过
+        self.drag_enabled = True
         self.drag_start_position = QPoint()
-        self.size_scale = 1.0
+
+        # 拖动时合并鼠标移动事件，每个显示帧只移动一次窗口
+        self.pending_position = None
+        self.move_timer = QTimer(self)
+        self.move_timer.setSingleShot(True)
+        self.move_timer.setInterval(display_frame_interval())
+        self.move_timer.timeout.connect(self.flush_move)
+        self.size_scale = size_scale  # 构造时即按目标比例解码，避免先按 1.0 加载再重新加载
 
         # 动画状态
-        self.animation_state = "idle"  # idle, running, completed
+        self.animation_state = "idle"  # idle, running, completed, error
         self.is_animating = False
+        self.is_suspended = False  # 窗口不可见或锁屏时挂起动画定时器
+        self.animation_mode = "loop"  # loop: 按固定间隔循环播放；progress: 按任务进度选择帧
+        self.progress_percentage = 0.0
 
         self.init_ui()
         self.load_pet_images()
@@ -47,43 +67,33 @@ class PetWidget(QLabel):
         self.setMouseTracking(True)
 
     def load_pet_images(self):
-        """加载宠物图片"""
-        images_dir = os.path.join("images", self.pet_name)
-        if not os.path.exists(images_dir):
-            print(f"宠物图片目录不存在: {images_dir}")
+        """加载宠物图片：打包宠物（精灵图 + 清单）、动图或编号的序列图片"""
+        # 先释放当前宠物的帧，切换时新旧两套帧不同时驻留内存
+        self.frames.unload()
+        self.pet_source = None
+        pet_source = load_pet_source(self.pet_name, disk_cache=self.frames.disk_cache)
+        if pet_source is None:
+            print(f"未找到宠物图片: {self.pet_name}")
             return
 
-        # 获取所有PNG图片并排序
-        pattern = os.path.join(images_dir, f"{self.pet_name}_*.png")
-        image_files = glob.glob(pattern)
-
-        # 按数字排序
-        def extract_number(filename):
-            try:
-                base = os.path.basename(filename)
-                number_str = base.split('_')[-1].split('.')[0]
-                return int(number_str)
-            except:
-                return 0
-
-        image_files.sort(key=extract_number)
-
-        # 加载图片
-        self.images = []
-        for image_file in image_files:
-            pixmap = QPixmap(image_file)
-            if not pixmap.isNull():
-                # 应用缩放
-                if self.size_scale != 1.0:
-                    size = pixmap.size()
-                    new_size = size * self.size_scale
-                    pixmap = pixmap.scaled(new_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                self.images.append(pixmap)
-
-        if self.images:
-            self.setPixmap(self.images[0])
+        self.pet_source = pet_source
+        if self.pet_source.frames is not None:
+            # 帧已随精灵图或动图一次读入
+            first = self.frames.load_frames(self.pet_name, self.pet_source.frames, self.size_scale,
+                                            self.pet_source.sheet)
+            # 帧已交给 FrameProvider，存储构建完成后原帧即可释放
+            self.pet_source.frames = self.pet_source.sheet = None
+        else:
+            # 首帧同步加载，其余帧在后台按需解码
+            first = self.frames.load(self.pet_name, self.pet_source.image_files, self.size_scale)
+        if first is not None:
+            self.current_frame = 0
+            self.displayed_frame = 0
+            self.setPixmap(first)
             self.adjustSize()
+            self.show_state_frame()
         else:
+            self.displayed_frame = -1
             print(f"未找到宠物图片: {self.pet_name}")
 
     def setup_animation(self):
@@ -121,27 +131,59 @@ class PetWidget(QLabel):
         # 显示菜单
         menu.exec_(self.mapToGlobal(position))
 
-    def set_pet(self, pet_name: str):
-        """设置宠物"""
-        if pet_name != self.pet_name:
+    def set_pet(self, pet_name: str, size_scale: float = None):
+        """设置宠物（同时指定缩放比例时只重新加载一次）"""
+        if size_scale is None:
+            size_scale = self.size_scale
+        if pet_name != self.pet_name or size_scale != self.size_scale:
             self.pet_name = pet_name
+            self.size_scale = size_scale
             self.load_pet_images()
-            self.current_frame = 0
-            if self.images:
-                self.setPixmap(self.images[0])
 
     def set_animation_speed(self, speed: int):
         """设置动画速度"""
         self.animation_speed = speed
         if self.animation_timer.isActive():
             self.animation_timer.stop()
-            self.animation_timer.start(speed)
+            self.animation_timer.start(self.frame_interval(self.displayed_frame))
+
+    def set_animation_mode(self, mode: str):
+        """设置动画模式（loop 或 progress）"""
+        if mode not in ("loop", "progress") or mode == self.animation_mode:
+            return
+
+        self.animation_mode = mode
+        if self.animation_state == "running":
+            self.show_state_frame()
+
+    def set_progress(self, percentage: float):
+        """更新任务进度，progress 模式下只在对应帧变化时重绘"""
+        self.progress_percentage = max(0.0, min(100.0, percentage))
+        if self.animation_mode == "progress" and self.animation_state == "running":
+            self.show_progress_frame()
+
+    def progress_frame_index(self) -> int:
+        """进度对应的帧索引：0% 为运行状态的首帧，100% 为其末帧"""
+        start, end = self.state_range("running")
+        return start + round(self.progress_percentage / 100 * (end - start))
+
+    def show_progress_frame(self):
+        """显示当前进度对应的帧"""
+        if not self.frames.frame_count():
+            return
+        index = self.progress_frame_index()
+        if index != self.displayed_frame:
+            self.show_frame(index)
 
     def set_size_scale(self, scale: float):
         """设置大小缩放"""
-        if scale != self.size_scale:
-            self.size_scale = scale
-            self.load_pet_images()  # 重新加载并缩放图片
+        self.set_pet(self.pet_name, scale)  # 重新加载并缩放图片
+
+    def set_frame_budget(self, memory_budget_mb: float, prefetch_count: int, indexed_color: bool = True):
+        """设置帧的内存上限、预取帧数以及是否以索引色存储"""
+        self.frames.set_memory_budget(memory_budget_mb)
+        self.frames.set_prefetch_count(prefetch_count)
+        self.frames.set_indexed_color(indexed_color)
 
     def set_task_status(self, status: TaskStatus):
         """根据任务状态设置动画"""
@@ -152,7 +194,7 @@ class PetWidget(QLabel):
         elif status == TaskStatus.COMPLETED:
             self.set_animation_state("completed")
         elif status == TaskStatus.ERROR:
-            self.set_animation_state("idle")  # 错误时显示静止状态
+            self.set_animation_state("error")  # 未指定错误帧时与空闲相同，显示静止的首帧
 
     def set_animation_state(self, state: str):
         """设置动画状态"""
@@ -160,44 +202,104 @@ class PetWidget(QLabel):
             return
 
         self.animation_state = state
+        self.show_state_frame()
 
-        if state == "idle":
-            # 显示第一帧静态图片
+    def state_range(self, state: Optional[str] = None) -> Tuple[int, int]:
+        """动画状态对应的帧范围 (起始, 结束)，默认为当前状态"""
+        if self.pet_source is None:
+            return 0, 0
+        return self.pet_source.state_range(state or self.animation_state, self.frames.frame_count())
+
+    def show_state_frame(self):
+        """按当前状态显示：运行中的进度模式按进度选帧，多帧范围循环播放，单帧范围显示静态图片"""
+        if not self.frames.frame_count():
+            return
+
+        if self.animation_state == "running" and self.animation_mode == "progress":
+            # 按任务进度选择帧，不启动定时器
             self.stop_animation()
-            if self.images:
-                self.current_frame = 0
-                self.setPixmap(self.images[0])
+            self.show_progress_frame()
+            return
 
-        elif state == "running":
-            # 播放完整动画
+        start, end = self.state_range()
+        if not start <= self.displayed_frame <= end:
+            self.show_frame(start)
+        if end > start:
             self.start_animation()
-
-        elif state == "completed":
-            # 显示最后一帧静态图片
+        else:
             self.stop_animation()
-            if self.images:
-                self.current_frame = len(self.images) - 1
-                self.setPixmap(self.images[-1])
+
+    def frame_interval(self, index: int) -> int:
+        """某一帧的显示时长：打包宠物或动图指定了每帧时长时使用，否则为设置中的动画速度"""
+        if self.pet_source is not None:
+            duration = self.pet_source.frame_duration(index)
+            if duration is not None:
+                return duration
+        return self.animation_speed
 
     def start_animation(self):
         """开始动画"""
-        if self.images and not self.animation_timer.isActive():
-            self.animation_timer.start(self.animation_speed)
+        if self.frames.frame_count() and not self.is_animating:
             self.is_animating = True
+            if not self.is_suspended:
+                self.animation_timer.start(self.frame_interval(self.displayed_frame))
 
     def stop_animation(self):
         """停止动画"""
-        if self.animation_timer.isActive():
+        if self.is_animating:
             self.animation_timer.stop()
             self.is_animating = False
 
+    def set_suspended(self, suspended: bool):
+        """挂起/恢复动画：挂起期间定时器完全停止，恢复时立即继续"""
+        if suspended == self.is_suspended:
+            return
+
+        self.is_suspended = suspended
+        if suspended:
+            self.animation_timer.stop()
+        elif self.is_animating:
+            self.animation_timer.start(self.frame_interval(self.displayed_frame))
+
+    def show_frame(self, index: int) -> bool:
+        """显示指定帧，尚未解码时在解码完成后再显示"""
+        self.current_frame = index
+        pixmap = self.frames.frame(index)
+        if pixmap is None:
+            return False
+        self.setPixmap(pixmap)
+        self.displayed_frame = index
+        metrics.frames_rendered_total.inc()
+        return True
+
+    def _on_frame_ready(self, index: int):
+        """后台解码完成，若正是等待显示的帧则立即显示"""
+        if index == self.current_frame and index != self.displayed_frame:
+            self.show_frame(index)
+
     def next_frame(self):
-        """下一帧动画"""
-        if not self.images:
+        """下一帧动画（帧尚未解码时保持当前画面，不阻塞）"""
+        wakeup_counter.tick("animation")
+        if not self.frames.frame_count():
+            return
+
+        # 在当前状态的帧范围内循环
+        start, end = self.state_range()
+        next_index = self.displayed_frame + 1
+        if not start <= next_index <= end:
+            next_index = start
+        pixmap = self.frames.frame(next_index)
+        if pixmap is None:
             return
 
-        self.current_frame = (self.current_frame + 1) % len(self.images)
-        self.setPixmap(self.images[self.current_frame])
+        self.current_frame = next_index
+        self.displayed_frame = next_index
+        self.setPixmap(pixmap)
+        metrics.frames_rendered_total.inc()
+
+        interval = self.frame_interval(next_index)
+        if interval != self.animation_timer.interval():
+            self.animation_timer.setInterval(interval)
 
     def mouseDoubleClickEvent(self, event):
         """鼠标双击事件"""
@@ -207,8 +309,9 @@ class PetWidget(QLabel):
 
     def mousePressEvent(self, event):
         """鼠标按下事件"""
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.drag_enabled:
             self.is_dragging = True
+            self.drag_moved = False
             self.drag_start_position = event.globalPos() - self.frameGeometry().topLeft()
             self.setCursor(QCursor(Qt.OpenHandCursor))
         super().mousePressEvent(event)
@@ -216,19 +319,39 @@ class PetWidget(QLabel):
     def mouseMoveEvent(self, event):
         """鼠标移动事件"""
         if self.is_dragging and event.buttons() == Qt.LeftButton:
-            new_position = event.globalPos() - self.drag_start_position
-            self.move(new_position)
-            # 发送位置变化信号
-            self.position_changed.emit(new_position.x(), new_position.y())
+            # 只记录目标位置，在下一显示帧统一移动
+            self.pending_position = event.globalPos() - self.drag_start_position
+            if not self.move_timer.isActive():
+                self.move_timer.start()
         super().mouseMoveEvent(event)
 
     def mouseReleaseEvent(self, event):
         """鼠标释放事件"""
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.is_dragging:
             self.is_dragging = False
             self.setCursor(QCursor(Qt.ArrowCursor))
+            self.flush_move()
+            # 单击、双击没有移动窗口，不需要保存位置
+            if self.drag_moved:
+                pos = self.pos()
+                self.drag_finished.emit(pos.x(), pos.y())
         super().mouseReleaseEvent(event)
 
+    def flush_move(self):
+        """移动到最近一次鼠标事件的位置并发送位置变化信号"""
+        self.move_timer.stop()
+        if self.pending_position is None:
+            return
+        new_position, self.pending_position = self.pending_position, None
+        if new_position != self.pos():
+            self.move(new_position)
+            self.drag_moved = True
+            self.position_changed.emit(new_position.x(), new_position.y())
+
+    def set_drag_enabled(self, enabled: bool):
+        """设置是否允许拖动"""
+        self.drag_enabled = enabled
+
     def get_position(self):
         """获取当前位置"""
         pos = self.pos()
@@ -0,0 +1,154 @@
+import sys
+import time
+from collections import deque
+from typing import Dict, List
+from PyQt5.QtCore import QObject, QEvent, QAbstractNativeEventFilter, QCoreApplication, QTimer, pyqtSignal
+from PyQt5.QtGui import QGuiApplication
+
+# Windows 会话通知
+WM_WTSSESSION_CHANGE = 0x02B1
+WTS_SESSION_LOCK = 0x7
+WTS_SESSION_UNLOCK = 0x8
+NOTIFY_FOR_THIS_SESSION = 0
+
+class WakeupCounter:
+    """统计各类定时器唤醒次数，用于对比省电模式前后的开销"""
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self.events: Dict[str, deque] = {}
+        self.totals: Dict[str, int] = {}
+
+    def tick(self, source: str):
+        """记录一次唤醒"""
+        now = time.monotonic()
+        events = self.events.setdefault(source, deque())
+        events.append(now)
+        self.totals[source] = self.totals.get(source, 0) + 1
+        self._trim(events, now)
+
+    def _trim(self, events: deque, now: float):
+        """丢弃统计窗口之外的记录"""
+        while events and now - events[0] > self.window:
+            events.popleft()
+
+    def per_minute(self) -> Dict[str, float]:
+        """最近一个窗口内各来源的唤醒次数（次/分钟）"""
+        now = time.monotonic()
+        rates = {}
+        for source, events in self.events.items():
+            self._trim(events, now)
+            rates[source] = len(events) * 60.0 / self.window
+        return rates
+
+# 全局唤醒计数器：动画、轮询和重绘的定时器回调都在这里计数
+wakeup_counter = WakeupCounter()
+
+def display_frame_interval() -> int:
+    """根据屏幕刷新率计算一帧的毫秒数，用于把高频更新合并到每帧一次"""
+    screen = QGuiApplication.primaryScreen()
+    refresh_rate = screen.refreshRate() if screen else 60.0
+    return max(1, int(1000 / (refresh_rate or 60.0)))
+
+class SessionLockFilter(QAbstractNativeEventFilter):
+    """监听 Windows 会话锁定/解锁消息"""
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+
+    def nativeEventFilter(self, event_type, message):
+        if event_type == b"windows_generic_MSG":
+            import ctypes.wintypes
+            msg = ctypes.wintypes.MSG.from_address(int(message))
+            if msg.message == WM_WTSSESSION_CHANGE:
+                if msg.wParam == WTS_SESSION_LOCK:
+                    self.callback(True)
+                elif msg.wParam == WTS_SESSION_UNLOCK:
+                    self.callback(False)
+        return False, 0
+
+class PowerStateMonitor(QObject):
+    """跟踪窗口是否对用户可见（显示、未最小化、未被完全遮挡）以及会话是否锁定"""
+
+    # 信号定义
+    state_changed = pyqtSignal()  # 任一窗口的可见状态或锁屏状态变化
+
+    WATCHED_EVENTS = (QEvent.Show, QEvent.Hide, QEvent.WindowStateChange, QEvent.Expose)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.widgets: List = []
+        self.session_locked = False
+        self.session_filter = None
+        self.last_state = None
+
+        # 同一轮事件中的多次变化只通知一次
+        self.notify_timer = QTimer(self)
+        self.notify_timer.setSingleShot(True)
+        self.notify_timer.setInterval(0)
+        self.notify_timer.timeout.connect(self._notify)
+
+    def watch(self, widget):
+        """开始跟踪一个顶层窗口"""
+        if widget in self.widgets:
+            return
+        self.widgets.append(widget)
+        widget.installEventFilter(self)
+        # 遮挡/暴露事件发给底层 QWindow，需要单独过滤
+        widget.winId()
+        window = widget.windowHandle()
+        if window is not None:
+            window.installEventFilter(self)
+
+        if sys.platform == "win32" and self.session_filter is None:
+            self._register_session_notification(int(widget.winId()))
+        self._schedule_notify()
+
+    def _register_session_notification(self, hwnd: int):
+        """注册 Windows 锁屏通知"""
+        try:
+            import ctypes
+            if ctypes.windll.wtsapi32.WTSRegisterSessionNotification(hwnd, NOTIFY_FOR_THIS_SESSION):
+                self.session_filter = SessionLockFilter(self._on_session_lock_changed)
+                QCoreApplication.instance().installNativeEventFilter(self.session_filter)
+        except (OSError, AttributeError) as e:
+            print(f"锁屏通知注册失败: {e}")
+
+    def _on_session_lock_changed(self, locked: bool):
+        """会话锁定状态变化"""
+        self.session_locked = locked
+        self._schedule_notify()
+
+    def eventFilter(self, obj, event):
+        if event.type() in self.WATCHED_EVENTS:
+            self._schedule_notify()
+        return False
+
+    def _schedule_notify(self):
+        """推迟到事件处理完成后再检查状态"""
+        if not self.notify_timer.isActive():
+            self.notify_timer.start()
+
+    def _notify(self):
+        """状态确有变化时发出信号"""
+        state = (self.session_locked, tuple(self.is_widget_visible(widget) for widget in self.widgets))
+        if state != self.last_state:
+            self.last_state = state
+            self.state_changed.emit()
+
+    @staticmethod
+    def is_widget_visible(widget) -> bool:
+        """窗口是否显示、未最小化且未被完全遮挡"""
+        if not widget.isVisible() or widget.isMinimized():
+            return False
+        window = widget.windowHandle()
+        return window is None or window.isExposed()
+
+    def is_active(self, widget) -> bool:
+        """窗口对用户可见且会话未锁定"""
+        return not self.session_locked and self.is_widget_visible(widget)
+
+    def any_active(self) -> bool:
+        """是否有任一被跟踪的窗口对用户可见"""
+        return any(self.is_active(widget) for widget in self.widgets)
@@ -1,8 +1,84 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                              QProgressBar, QTextEdit, QFrame, QPushButton)
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
-from PyQt5.QtGui import QFont, QPalette, QColor
+from PyQt5.QtCore import Qt, QTimer, QBuffer, QByteArray, QIODevice, QRect, pyqtSignal
+from PyQt5.QtGui import QFont, QPalette, QColor, QImage, QImageReader, QPainter
 from typing import Dict, Any
+import time
+from power_monitor import wakeup_counter, display_frame_interval
+import metrics
+
+# 状态显示文本
+STATUS_TEXT = {
+    "idle": "空闲",
+    "running": "运行中",
+    "completed": "已完成",
+    "error": "错误",
+    "queued": "排队中"
+}
+
+# 状态颜色
+STATUS_COLORS = {
+    "idle": "#888888",
+    "running": "#00ff00",
+    "completed": "#4CAF50",
+    "error": "#f44336",
+    "queued": "#ff9800"
+}
+
+STATUS_STYLE_TEMPLATE = """
+    QLabel {{
+        color: {color};
+        font-size: 12px;
+        padding: 2px;
+    }}
+"""
+
+# 预先生成每种状态的样式表，避免每次更新都重新拼接和解析
+STATUS_STYLES = {status: STATUS_STYLE_TEMPLATE.format(color=color) for status, color in STATUS_COLORS.items()}
+
+def format_eta(seconds: float) -> str:
+    """格式化预计时间（精确到秒）"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}秒"
+    if seconds < 3600:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds // 3600}时{seconds % 3600 // 60}分"
+
+def decode_preview(message: QByteArray, offset: int, image_format: str) -> QImage:
+    """直接从收到的消息缓冲区解码预览图
+
+    QBuffer 与消息共享同一块数据（隐式共享，不复制），跳过消息头后交给 QImageReader，
+    图片数据不经过 Python bytes 或切片副本。
+    """
+    buffer = QBuffer()
+    buffer.setData(message)
+    buffer.open(QIODevice.ReadOnly)
+    buffer.seek(offset)
+    return QImageReader(buffer, image_format.encode("ascii")).read()
+
+class PreviewView(QWidget):
+    """实时预览画面：按比例缩放居中绘制 QImage，不转换为 QPixmap"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.image = QImage()
+        self.setFixedHeight(160)
+
+    def set_image(self, image: QImage):
+        """更新画面"""
+        self.image = image
+        self.update()
+
+    def paintEvent(self, event):
+        if self.image.isNull():
+            return
+        size = self.image.size().scaled(self.size(), Qt.KeepAspectRatio)
+        target = QRect(0, 0, size.width(), size.height())
+        target.moveCenter(self.rect().center())
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(target, self.image)
 
 class ProgressWindow(QWidget):
     """进度显示窗体"""
@@ -10,17 +86,49 @@ class ProgressWindow(QWidget):
     # 信号定义
     close_requested = pyqtSignal()
 
+    # update_progress 处理的字段，与 TaskMonitorAPI.progress_delta 的字段一致
+    DELTA_FIELDS = ("status", "task_id", "workflow_progress", "current_task_progress",
+                    "execution_time", "eta", "queue", "queue_drain", "server_name", "servers")
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
         self.auto_hide_timer = QTimer()
         self.auto_hide_timer.timeout.connect(self.hide_window)
         self.auto_hide_delay = 3000  # 3秒后自动隐藏
+        self.auto_hide_enabled = True  # 对应 monitor_settings.auto_hide_progress
 
         # 进度窗口相对于宠物的偏移量
         self.offset_x = 0  # 相对于宠物中心点的X偏移
         self.offset_y = 50  # 相对于宠物中心点的Y偏移
 
+        # 多服务器明细
+        self.servers = []
+        self.busiest_name = None
+
+        # 当前显示的状态，只有变化时才重新设置样式
+        self.current_status = None
+
+        # 与剩余时间估计合并显示的字段
+        self.execution_time = 0
+        self.eta = None
+        self.queue_info = {}
+        self.queue_drain = None
+
+        # 合并短时间内的多次更新，每个显示帧最多刷新一次
+        self.pending_delta = {}
+        self.repaint_timer = QTimer()
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.setInterval(display_frame_interval())
+        self.repaint_timer.timeout.connect(self.flush_updates)
+
+        # 实时预览：只保留最新一帧，每个显示帧最多解码一次，来不及显示的旧帧直接丢弃
+        self.pending_preview = None
+        self.preview_timer = QTimer()
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(display_frame_interval())
+        self.preview_timer.timeout.connect(self.flush_preview)
+
         self.init_ui()
 
     def init_ui(self):
@@ -173,6 +281,33 @@ class ProgressWindow(QWidget):
         """)
         content_layout.addWidget(self.queue_label)
 
+        # 多服务器明细（仅在监控多个服务器时显示）
+        self.servers_label = QLabel("")
+        self.servers_label.setStyleSheet("""
+            QLabel {
+                color: #cccccc;
+                font-size: 10px;
+                padding: 2px;
+            }
+        """)
+        self.servers_label.hide()
+        content_layout.addWidget(self.servers_label)
+
+        # 运行中的实时预览（收到预览帧时显示）
+        self.preview_view = PreviewView()
+        self.preview_view.hide()
+        content_layout.addWidget(self.preview_view)
+
+        # 最近完成任务的输出缩略图（有缩略图时显示）
+        self.thumbnail_strip = QWidget()
+        self.thumbnail_layout = QHBoxLayout(self.thumbnail_strip)
+        self.thumbnail_layout.setContentsMargins(0, 0, 0, 0)
+        self.thumbnail_layout.setSpacing(6)
+        self.thumbnail_layout.addStretch()
+        self.thumbnail_labels = []
+        self.thumbnail_strip.hide()
+        content_layout.addWidget(self.thumbnail_strip)
+
         # 关闭按钮
         button_layout = QHBoxLayout()
         button_layout.addStretch()
@@ -197,48 +332,70 @@ class ProgressWindow(QWidget):
         content_layout.addLayout(button_layout)
 
     def update_progress(self, progress_data: Dict[str, Any]):
-        """更新进度信息"""
-        # 重置自动隐藏定时器
+        """更新全部进度信息"""
+        delta = {field: progress_data.get(field) for field in self.DELTA_FIELDS}
+        self.apply_delta(delta)
+
+    def apply_delta(self, delta: Dict[str, Any]):
+        """合并增量，在下一显示帧统一刷新"""
+        self.pending_delta.update(delta)
+        if not self.repaint_timer.isActive():
+            self.repaint_timer.start()
+
+    def flush_updates(self):
+        """立即应用所有待刷新的增量"""
+        wakeup_counter.tick("repaint")
+        self.repaint_timer.stop()
+        delta, self.pending_delta = self.pending_delta, {}
+        started = time.perf_counter()
+        self._render_delta(delta)
+        metrics.progress_update_seconds.observe(time.perf_counter() - started)
+
+    def _render_delta(self, delta: Dict[str, Any]):
+        """只更新增量中出现的字段"""
+        if "status" in delta:
+            self._update_status(delta["status"] or "idle")
+        if "task_id" in delta:
+            self._update_task_id(delta["task_id"])
+        if "workflow_progress" in delta:
+            self._update_workflow(delta["workflow_progress"] or {})
+        if "current_task_progress" in delta:
+            self._update_node(delta["current_task_progress"])
+        if "execution_time" in delta or "eta" in delta:
+            self.eta = delta.get("eta", self.eta)
+            self._update_time(delta.get("execution_time", self.execution_time) or 0)
+        if "queue" in delta or "queue_drain" in delta:
+            self.queue_drain = delta.get("queue_drain", self.queue_drain)
+            self._update_queue(delta.get("queue", self.queue_info) or {})
+        if "servers" in delta or "server_name" in delta:
+            self.update_servers(delta.get("servers", self.servers), delta.get("server_name", self.busiest_name))
+
+    def _update_status(self, status: str):
+        """更新状态"""
+        if status == self.current_status:
+            return
+        self.current_status = status
+
+        if status != "running":
+            self.clear_preview()
+
+        self.status_label.setText(f"状态: {STATUS_TEXT.get(status, status)}")
+        self.status_label.setStyleSheet(STATUS_STYLES.get(status, STATUS_STYLES["idle"]))
+
+        # 如果任务完成且开启了自动隐藏，设置自动隐藏；其他状态取消自动隐藏
         self.auto_hide_timer.stop()
+        if self.auto_hide_enabled and status in ["completed", "error"]:
+            self.auto_hide_timer.start(self.auto_hide_delay)
 
-        # 更新状态
-        status = progress_data.get("status", "idle")
-        status_text = {
-            "idle": "空闲",
-            "running": "运行中",
-            "completed": "已完成",
-            "error": "错误",
-            "queued": "排队中"
-        }.get(status, status)
-
-        self.status_label.setText(f"状态: {status_text}")
-
-        # 设置状态颜色
-        status_colors = {
-            "idle": "#888888",
-            "running": "#00ff00",
-            "completed": "#4CAF50",
-            "error": "#f44336",
-            "queued": "#ff9800"
-        }
-        color = status_colors.get(status, "#888888")
-        self.status_label.setStyleSheet(f"""
-            QLabel {{
-                color: {color};
-                font-size: 12px;
-                padding: 2px;
-            }}
-        """)
-
-        # 更新任务ID
-        task_id = progress_data.get("task_id")
+    def _update_task_id(self, task_id):
+        """更新任务ID"""
         if task_id:
             self.task_id_label.setText(f"任务ID: {task_id}")
         else:
             self.task_id_label.setText("任务ID: 无")
 
-        # 更新工作流进度
-        workflow_progress = progress_data.get("workflow_progress", {})
+    def _update_workflow(self, workflow_progress: Dict[str, Any]):
+        """更新工作流进度"""
         total_nodes = workflow_progress.get("total_nodes", 0)
         executed_nodes = workflow_progress.get("executed_nodes", 0)
 
@@ -250,8 +407,8 @@ class ProgressWindow(QWidget):
             self.workflow_progress.setValue(0)
             self.workflow_label.setText("工作流进度: 无数据")
 
-        # 更新当前节点进度
-        current_progress = progress_data.get("current_task_progress")
+    def _update_node(self, current_progress):
+        """更新当前节点进度"""
         if current_progress:
             node_type = current_progress.get("node_type", "未知")
             step = current_progress.get("step", 0)
@@ -268,8 +425,9 @@ class ProgressWindow(QWidget):
             self.node_progress.setValue(0)
             self.node_label.setText("当前节点: 无")
 
-        # 更新执行时间
-        execution_time = progress_data.get("execution_time", 0)
+    def _update_time(self, execution_time: float):
+        """更新执行时间和预计剩余时间"""
+        self.execution_time = execution_time
         if execution_time > 0:
             if execution_time < 60:
                 time_text = f"{execution_time:.1f}秒"
@@ -277,19 +435,117 @@ class ProgressWindow(QWidget):
                 minutes = int(execution_time // 60)
                 seconds = execution_time % 60
                 time_text = f"{minutes}分{seconds:.1f}秒"
-            self.time_label.setText(f"执行时间: {time_text}")
+            time_text = f"执行时间: {time_text}"
         else:
-            self.time_label.setText("执行时间: 0秒")
+            time_text = "执行时间: 0秒"
+
+        if self.eta is not None:
+            time_text += f" | 预计剩余: {format_eta(self.eta)}"
+        self.time_label.setText(time_text)
 
-        # 更新队列信息
-        queue_info = progress_data.get("queue", {})
+    def _update_queue(self, queue_info: Dict[str, Any]):
+        """更新队列信息和预计清空时间"""
+        self.queue_info = queue_info
         running_count = queue_info.get("running_count", 0)
         pending_count = queue_info.get("pending_count", 0)
-        self.queue_label.setText(f"队列: 运行中 {running_count} | 等待中 {pending_count}")
-
-        # 如果任务完成，设置自动隐藏
-        if status in ["completed", "error"]:
-            self.auto_hide_timer.start(self.auto_hide_delay)
+        queue_text = f"队列: 运行中 {running_count} | 等待中 {pending_count}"
+        if self.queue_drain is not None and (running_count or pending_count):
+            queue_text += f" | 预计清空: {format_eta(self.queue_drain)}"
+        self.queue_label.setText(queue_text)
+
+    def update_servers(self, servers: list, busiest_name: str):
+        """更新多服务器明细，单服务器时隐藏"""
+        servers = servers or []
+        self.servers = servers
+        self.busiest_name = busiest_name
+        if len(servers) <= 1:
+            if not self.servers_label.isHidden():
+                self.servers_label.hide()
+                self._update_height()
+            return
+
+        lines = []
+        for server in servers:
+            marker = "▶ " if server["name"] == busiest_name else "   "
+            if server["connected"]:
+                lines.append(f"{marker}{server['name']}: {server['status']} | "
+                             f"运行中 {server['running_count']} | 等待中 {server['pending_count']}")
+            else:
+                lines.append(f"{marker}{server['name']}: 离线")
+        self.servers_label.setText("\n".join(lines))
+        if self.servers_label.isHidden():
+            self.servers_label.show()
+        self._update_height()
+
+    def submit_preview(self, message: QByteArray, offset: int, image_format: str):
+        """收到预览帧：替换尚未显示的旧帧，在下一显示帧解码"""
+        if self.pending_preview is not None:
+            metrics.preview_frames_total.inc(result="dropped")
+        self.pending_preview = (message, offset, image_format)
+        if not self.preview_timer.isActive():
+            self.preview_timer.start()
+
+    def flush_preview(self):
+        """解码并显示最新的预览帧"""
+        if self.pending_preview is None:
+            return
+        message, offset, image_format = self.pending_preview
+        self.pending_preview = None
+        image = decode_preview(message, offset, image_format)
+        if image.isNull():
+            metrics.preview_frames_total.inc(result="invalid")
+            return
+        metrics.preview_frames_total.inc(result="shown")
+        self.preview_view.set_image(image)
+        if self.preview_view.isHidden():
+            self.preview_view.show()
+            self._update_height()
+
+    def clear_preview(self):
+        """任务不再运行：丢弃待显示的帧并隐藏预览"""
+        self.pending_preview = None
+        self.preview_timer.stop()
+        if not self.preview_view.isHidden():
+            self.preview_view.hide()
+            self.preview_view.set_image(QImage())
+            self._update_height()
+
+    def set_thumbnails(self, pixmaps: list):
+        """显示输出缩略图（已缩放好的 QPixmap），没有时隐藏"""
+        while len(self.thumbnail_labels) < len(pixmaps):
+            label = QLabel()
+            label.setAlignment(Qt.AlignCenter)
+            label.setStyleSheet("""
+                QLabel {
+                    background-color: rgba(0, 0, 0, 80);
+                    border: none;
+                    border-radius: 4px;
+                }
+            """)
+            self.thumbnail_layout.insertWidget(len(self.thumbnail_labels), label)
+            self.thumbnail_labels.append(label)
+
+        for index, label in enumerate(self.thumbnail_labels):
+            if index < len(pixmaps):
+                label.setPixmap(pixmaps[index])
+                label.setFixedSize(pixmaps[index].size())
+                label.show()
+            else:
+                label.hide()
+        self.thumbnail_strip.setVisible(bool(pixmaps))
+        self._update_height()
+
+    def _update_height(self):
+        """按多服务器明细和缩略图的显示情况调整窗口高度"""
+        height = 300
+        if not self.servers_label.isHidden():
+            height += 16 * len(self.servers)
+        if not self.preview_view.isHidden():
+            height += self.preview_view.height() + 10
+        if not self.thumbnail_strip.isHidden():
+            height += max(label.height() for label in self.thumbnail_labels if not label.isHidden()) + 10
+        if self.height() != height:
+            self.setFixedSize(400, height)
 
     def show_at_position(self, x: int, y: int):
         """在指定位置显示窗口"""
@@ -332,6 +588,12 @@ class ProgressWindow(QWidget):
         self.offset_x = offset_x
         self.offset_y = offset_y
 
+    def set_auto_hide(self, enabled: bool):
+        """设置任务完成后是否自动隐藏"""
+        self.auto_hide_enabled = enabled
+        if not enabled:
+            self.auto_hide_timer.stop()
+
     def get_offset(self):
         """获取当前偏移量"""
         return {"x": self.offset_x, "y": self.offset_y}
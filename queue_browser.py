@@ -0,0 +1,339 @@
+import os
+from typing import Any, Dict, List, Tuple
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox,
+                             QPushButton, QTabWidget, QListView)
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, QAbstractListModel, QModelIndex, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QBrush, QColor, QIcon
+from monitor_core import FetchError
+from queue_history import QueueHistoryClient
+
+# 条目状态颜色
+ENTRY_COLORS = {
+    "running": "#2e7d32",
+    "pending": "#ef6c00",
+    "success": "#333333",
+    "error": "#c62828",
+    "interrupted": "#888888",
+    "unknown": "#888888"
+}
+
+ENTRY_BRUSHES = {}
+
+def entry_brush(state: str) -> QBrush:
+    """状态对应的文字颜色（首次使用时创建，之后复用）"""
+    if state not in ENTRY_BRUSHES:
+        ENTRY_BRUSHES[state] = QBrush(QColor(ENTRY_COLORS.get(state, "#333333")))
+    return ENTRY_BRUSHES[state]
+
+class QueueHistoryWorker(QObject):
+    """队列与历史请求工作者，运行在后台线程中，每个服务器一个 QueueHistoryClient"""
+
+    # 信号定义 (服务器 URL, 请求类型, 条目摘要, 是否替换已显示的条目, 是否还有更旧的历史)
+    finished = pyqtSignal(str, str, list, bool, bool)
+    failed = pyqtSignal(str, str, str)  # (服务器 URL, 请求类型, 错误信息)
+
+    def __init__(self):
+        super().__init__()
+        self.clients: Dict[str, QueueHistoryClient] = {}
+
+    @pyqtSlot(str, str)
+    def sync(self, url: str, kind: str):
+        """执行一次请求：queue 队列，history 新历史，reload 重新加载历史，older 更旧的一页"""
+        client = self.clients.get(url)
+        if client is None:
+            client = self.clients[url] = QueueHistoryClient(url)
+        try:
+            reset = False
+            if kind == "queue":
+                entries = client.sync_queue()
+                reset = True
+            elif kind == "older":
+                entries = client.load_older_history()
+            else:
+                if kind == "reload":
+                    client.reset_history()
+                entries, reset = client.sync_history()
+            self.finished.emit(url, kind, entries, reset, client.has_older_history())
+        except FetchError as e:
+            self.failed.emit(url, kind, str(e))
+        except Exception as e:
+            self.failed.emit(url, kind, f"未知错误: {e}")
+
+class EntryListModel(QAbstractListModel):
+    """队列或历史条目列表，数据为预先格式化的摘要，配合等高的 QListView 只绘制可见行"""
+
+    # 信号定义
+    fetch_more_requested = pyqtSignal()  # 滚动到底部，需要加载更旧的条目
+
+    EntryRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries: List[Dict[str, Any]] = []
+        self.more_available = False
+        self.loading = False
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entries[index.row()]
+        if role == Qt.DisplayRole:
+            return entry["text"]
+        if role == Qt.ForegroundRole:
+            return entry_brush(entry["state"])
+        if role == Qt.ToolTipRole:
+            return f"{entry['prompt_id']}\n{entry['error']}" if entry.get("error") else entry["prompt_id"]
+        if role == self.EntryRole:
+            return entry
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self.more_available and not self.loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self.loading = True
+            self.fetch_more_requested.emit()
+
+    def reset_entries(self, entries: List[Dict[str, Any]]):
+        """替换全部条目"""
+        self.beginResetModel()
+        self.entries = list(entries)
+        self.endResetModel()
+
+    def prepend(self, entries: List[Dict[str, Any]]):
+        """在顶部插入更新的条目"""
+        if entries:
+            self.beginInsertRows(QModelIndex(), 0, len(entries) - 1)
+            self.entries[0:0] = entries
+            self.endInsertRows()
+
+    def append(self, entries: List[Dict[str, Any]]):
+        """在底部追加更旧的条目"""
+        if entries:
+            self.beginInsertRows(QModelIndex(), len(self.entries), len(self.entries) + len(entries) - 1)
+            self.entries.extend(entries)
+            self.endInsertRows()
+
+    def update_entries(self, entries: List[Dict[str, Any]]):
+        """按 prompt_id 与当前条目比较，只删除消失的行、插入新出现的行，保留滚动位置和选中项"""
+        new_ids = [entry["prompt_id"] for entry in entries]
+        kept = set(new_ids)
+        for row in range(len(self.entries) - 1, -1, -1):
+            if self.entries[row]["prompt_id"] not in kept:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.entries[row]
+                self.endRemoveRows()
+
+        current_ids = [entry["prompt_id"] for entry in self.entries]
+        current = set(current_ids)
+        if current_ids != [prompt_id for prompt_id in new_ids if prompt_id in current]:
+            # 保留的条目顺序发生了变化（很少见），直接整体替换
+            self.reset_entries(entries)
+            return
+
+        for row, entry in enumerate(entries):
+            if row < len(self.entries) and self.entries[row]["prompt_id"] == entry["prompt_id"]:
+                if self.entries[row] != entry:
+                    self.entries[row] = entry
+                    index = self.index(row)
+                    self.dataChanged.emit(index, index)
+                continue
+            self.beginInsertRows(QModelIndex(), row, row)
+            self.entries.insert(row, entry)
+            self.endInsertRows()
+
+def create_entry_view(model: EntryListModel) -> QListView:
+    """创建条目列表视图：所有行等高，滚动时只计算和绘制可见行"""
+    view = QListView()
+    view.setModel(model)
+    view.setUniformItemSizes(True)
+    view.setVerticalScrollMode(QListView.ScrollPerPixel)
+    view.setSelectionMode(QListView.SingleSelection)
+    view.setEditTriggers(QListView.NoEditTriggers)
+    return view
+
+class QueueBrowser(QWidget):
+    """队列与历史浏览窗口
+
+    窗口可见时才请求数据：打开时同步一次，之后只在当前服务器的队列数量或任务变化时增量同步，
+    历史滚动到底部时再向前加载一页。
+    """
+
+    # 信号定义
+    sync_requested = pyqtSignal(str, str)  # 内部信号：通知工作线程发起请求 (服务器 URL, 请求类型)
+
+    def __init__(self, servers: List[Tuple[str, str]], parent=None):
+        super().__init__(parent)
+        self.servers = []
+        self.current_url = None
+        self.last_activity = None  # 上次触发同步时的 (状态, 任务, 运行数, 等待数)
+
+        # 每种请求同一时间最多一个在途，期间的新请求合并为完成后的一次
+        self.in_flight = set()
+        self.pending = set()
+
+        # 后台请求线程
+        self.sync_thread = QThread()
+        self.sync_worker = QueueHistoryWorker()
+        self.sync_worker.moveToThread(self.sync_thread)
+        self.sync_requested.connect(self.sync_worker.sync)
+        self.sync_worker.finished.connect(self._on_sync_finished)
+        self.sync_worker.failed.connect(self._on_sync_failed)
+        self.sync_thread.start()
+
+        # 状态变化后稍等片刻再同步：任务结束时服务器写入历史略晚于状态变化
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(300)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+        self.queue_model = EntryListModel(self)
+        self.history_model = EntryListModel(self)
+        self.history_model.fetch_more_requested.connect(lambda: self.request("older"))
+
+        self.init_ui()
+        self.set_servers(servers)
+
+    def init_ui(self):
+        """初始化UI"""
+        self.setWindowTitle("ComfyUI 宠物监控 - 队列与历史")
+        self.resize(460, 520)
+        icon_path = os.path.join("images", "net.png")
+        if os.path.exists(icon_path):
+            self.setWindowIcon(QIcon(icon_path))
+
+        main_layout = QVBoxLayout(self)
+
+        # 服务器选择和刷新按钮
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(QLabel("服务器:"))
+        self.server_combo = QComboBox()
+        self.server_combo.currentIndexChanged.connect(self.on_server_selected)
+        top_layout.addWidget(self.server_combo, 1)
+        self.refresh_button = QPushButton("刷新")
+        self.refresh_button.clicked.connect(self.reload)
+        top_layout.addWidget(self.refresh_button)
+        main_layout.addLayout(top_layout)
+
+        self.tab_widget = QTabWidget()
+        self.tab_widget.addTab(create_entry_view(self.queue_model), "队列")
+        self.tab_widget.addTab(create_entry_view(self.history_model), "历史")
+        main_layout.addWidget(self.tab_widget)
+
+        self.status_label = QLabel("")
+        main_layout.addWidget(self.status_label)
+
+    def set_servers(self, servers: List[Tuple[str, str]]):
+        """设置可选的服务器 [(名称, URL)]，尽量保留当前选择"""
+        servers = [(name, url.rstrip('/')) for name, url in servers]
+        if servers == self.servers:
+            return
+        self.servers = servers
+        self.server_combo.blockSignals(True)
+        self.server_combo.clear()
+        for name, _ in servers:
+            self.server_combo.addItem(name)
+        urls = [url for _, url in servers]
+        self.server_combo.setCurrentIndex(urls.index(self.current_url) if self.current_url in urls else 0)
+        self.server_combo.blockSignals(False)
+        self.on_server_selected(self.server_combo.currentIndex())
+
+    def on_server_selected(self, index: int):
+        """切换服务器：清空列表并重新加载"""
+        url = self.servers[index][1] if 0 <= index < len(self.servers) else None
+        if url == self.current_url:
+            return
+        self.current_url = url
+        self.last_activity = None
+        self.queue_model.reset_entries([])
+        self.history_model.reset_entries([])
+        self.history_model.more_available = False
+        self.history_model.loading = False
+        if self.isVisible():
+            self.reload()
+
+    def current_server_name(self):
+        """当前选择的服务器名称"""
+        index = self.server_combo.currentIndex()
+        return self.servers[index][0] if 0 <= index < len(self.servers) else None
+
+    def on_server_progress(self, name: str, data: Dict[str, Any]):
+        """服务器状态更新：当前服务器的队列数量或任务变化时安排同步"""
+        if name != self.current_server_name() or not self.isVisible():
+            return
+        queue = data.get("queue") or {}
+        activity = (data.get("status"), data.get("task_id"),
+                    queue.get("running_count", 0), queue.get("pending_count", 0))
+        if activity != self.last_activity:
+            self.last_activity = activity
+            self.refresh_timer.start()
+
+    def request(self, kind: str):
+        """向工作线程发起请求；同类请求在途时合并到完成之后"""
+        if self.current_url is None:
+            return
+        if kind in self.in_flight:
+            self.pending.add(kind)
+            return
+        self.in_flight.add(kind)
+        self.sync_requested.emit(self.current_url, kind)
+
+    def refresh(self):
+        """增量同步队列和历史"""
+        self.request("queue")
+        self.request("history")
+
+    def reload(self):
+        """重新加载队列和历史"""
+        self.history_model.loading = False
+        self.request("queue")
+        self.request("reload")
+
+    def _on_sync_finished(self, url: str, kind: str, entries: list, reset: bool, has_older: bool):
+        """请求完成：更新对应的列表"""
+        self.in_flight.discard(kind)
+        if url == self.current_url:
+            if kind == "queue":
+                self.queue_model.update_entries(entries)
+            else:
+                if reset:
+                    self.history_model.reset_entries(entries)
+                elif kind == "older":
+                    self.history_model.append(entries)
+                else:
+                    self.history_model.prepend(entries)
+                if kind == "older" or reset:
+                    self.history_model.loading = False
+                self.history_model.more_available = has_older
+            self.status_label.setText(f"队列 {self.queue_model.rowCount()} 项，"
+                                      f"已加载历史 {self.history_model.rowCount()} 项")
+        self._request_pending(kind)
+
+    def _on_sync_failed(self, url: str, kind: str, message: str):
+        """请求失败：显示错误，等待下一次状态变化或手动刷新"""
+        self.in_flight.discard(kind)
+        if url == self.current_url:
+            if kind == "older":
+                self.history_model.loading = False
+            self.status_label.setText(f"请求失败: {message}")
+        self._request_pending(kind)
+
+    def _request_pending(self, kind: str):
+        """发出请求在途期间被合并的同类请求"""
+        if kind in self.pending:
+            self.pending.discard(kind)
+            self.request(kind)
+
+    def showEvent(self, event):
+        """窗口显示时同步一次"""
+        super().showEvent(event)
+        self.refresh()
+
+    def shutdown(self):
+        """结束后台请求线程"""
+        self.sync_thread.quit()
+        self.sync_thread.wait()
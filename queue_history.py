@@ -0,0 +1,226 @@
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from monitor_core import HTTP_TIMEOUT, FetchError, get_http_session
+
+# 条目状态显示文本
+ENTRY_STATE_TEXT = {
+    "running": "运行中",
+    "pending": "等待中",
+    "success": "成功",
+    "error": "错误",
+    "interrupted": "已中断",
+    "unknown": "未知"
+}
+
+def summarize_queue_item(item: list, state: str) -> Dict[str, Any]:
+    """把 /queue 中的一项 [序号, prompt_id, prompt, extra_data, 输出节点] 压缩为显示用的摘要"""
+    number, prompt_id = item[0], item[1]
+    prompt = item[2] if len(item) > 2 and isinstance(item[2], dict) else {}
+    extra = item[3] if len(item) > 3 and isinstance(item[3], dict) else {}
+    entry = {
+        "prompt_id": prompt_id,
+        "number": number,
+        "state": state,
+        "node_count": len(prompt),
+        "client_id": extra.get("client_id")
+    }
+    entry["text"] = f"#{number}  {ENTRY_STATE_TEXT[state]}  {len(prompt)} 个节点  {prompt_id[:8]}"
+    return entry
+
+def summarize_history_item(prompt_id: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """把 /history 中的一项压缩为显示用的摘要（不保留工作流本身）"""
+    prompt = item.get("prompt") or [0]
+    status = item.get("status") or {}
+    state = status.get("status_str") or ("success" if status.get("completed") else "unknown")
+    started = ended = error = None
+    for message in status.get("messages") or []:
+        if not isinstance(message, (list, tuple)) or len(message) < 2 or not isinstance(message[1], dict):
+            continue
+        name, data = message[0], message[1]
+        if name == "execution_start":
+            started = data.get("timestamp")
+        elif name in ("execution_success", "execution_error", "execution_interrupted"):
+            ended = data.get("timestamp")
+            if name == "execution_error":
+                error = data.get("exception_message")
+            elif name == "execution_interrupted":
+                state = "interrupted"
+    if state not in ENTRY_STATE_TEXT:
+        state = "unknown"
+
+    images = []
+    for output in (item.get("outputs") or {}).values():
+        for image in output.get("images") or []:
+            images.append((image.get("filename", ""), image.get("subfolder", ""), image.get("type", "output")))
+
+    entry = {
+        "prompt_id": prompt_id,
+        "number": prompt[0],
+        "state": state,
+        "started": started,
+        "ended": ended,
+        "error": error,
+        "images": images
+    }
+    parts = [f"#{prompt[0]}", ENTRY_STATE_TEXT[state]]
+    if started and ended:
+        parts.append(f"{(ended - started) / 1000:.1f}秒")
+    if images:
+        parts.append(f"{len(images)} 张")
+    if ended:
+        parts.append(time.strftime("%m-%d %H:%M", time.localtime(ended / 1000)))
+    parts.append(prompt_id[:8])
+    entry["text"] = "  ".join(parts)
+    return entry
+
+class QueueHistoryClient:
+    """增量获取单个服务器的 /queue 与 /history，条目摘要按 prompt_id 缓存
+
+    ComfyUI 的 /history 按提交顺序保存（最旧在前），支持 offset 与 max_items 但不返回总数。
+    首次同步用单条请求二分探测总数，之后每次只从已知最新条目处向后请求，
+    旧条目在滚动到底部时按页向前加载。历史超过上限时服务器会删除最旧的条目，
+    偏移随之前移，同步时通过在回看窗口内定位已知最新条目来校正。
+    阻塞调用，由后台线程使用；子类可以重写 _get() 更换 HTTP 客户端。
+    """
+
+    def __init__(self, base_url: str, page_size: int = 100, lookback: int = 16):
+        self.base_url = base_url.rstrip('/')
+        self.page_size = page_size
+        self.lookback = lookback  # 增量同步时在已知最新条目之前多请求的条数
+
+        # 条目摘要缓存 prompt_id -> 摘要，队列中的任务进入历史后重新解析
+        self.queue_entries: Dict[str, Dict[str, Any]] = {}
+        self.history_entries: Dict[str, Dict[str, Any]] = {}
+
+        # 历史同步位置：history_length 为 None 表示需要完整同步
+        self.history_length: Optional[int] = None
+        self.newest_id: Optional[str] = None
+        self.oldest_offset = 0  # 已加载的最旧条目的偏移
+
+    def _get(self, path: str) -> bytes:
+        """发送 GET 请求并返回响应体；网络错误或非 200 响应抛出 FetchError"""
+        import requests
+        try:
+            response = get_http_session().get(self.base_url + path, timeout=HTTP_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            raise FetchError(str(e))
+        if response.status_code != 200:
+            raise FetchError(f"HTTP {response.status_code}")
+        return response.content
+
+    def _get_json(self, path: str) -> Any:
+        """请求并解析 JSON"""
+        try:
+            return json.loads(self._get(path))
+        except json.JSONDecodeError as e:
+            raise FetchError(f"JSON 解析错误: {e}")
+
+    def _history_page(self, offset: int, max_items: int) -> Dict[str, Any]:
+        """按偏移获取一段历史（最旧在前）"""
+        return self._get_json(f"/history?offset={offset}&max_items={max_items}")
+
+    def sync_queue(self) -> List[Dict[str, Any]]:
+        """获取队列，返回运行中和等待中任务的摘要（按执行顺序）；只解析新出现的任务"""
+        data = self._get_json("/queue")
+        items = [(item, "running") for item in data.get("queue_running") or []]
+        # 等待队列按堆顺序返回，按序号排序后才是执行顺序
+        items += sorted(((item, "pending") for item in data.get("queue_pending") or []),
+                        key=lambda pair: pair[0][0])
+
+        entries = {}
+        for item, state in items:
+            cached = self.queue_entries.get(item[1])
+            entries[item[1]] = cached if cached and cached["state"] == state else summarize_queue_item(item, state)
+        self.queue_entries = entries
+        return list(entries.values())
+
+    def probe_history_length(self) -> int:
+        """探测历史条目总数：先按 2 的幂找到上界，再二分，每次只请求一条"""
+        if not self._history_page(0, 1):
+            return 0
+        low, high = 0, 1
+        while self._history_page(high, 1):
+            low, high = high, high * 2
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._history_page(middle, 1):
+                low = middle
+            else:
+                high = middle
+        return high
+
+    def _summarize_page(self, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """解析一段历史，返回新条目的摘要（最新在前），已缓存的条目跳过"""
+        entries = []
+        for prompt_id, item in page.items():
+            if prompt_id in self.history_entries:
+                continue
+            entry = summarize_history_item(prompt_id, item)
+            self.history_entries[prompt_id] = entry
+            entries.append(entry)
+        entries.reverse()
+        return entries
+
+    def reset_history(self):
+        """丢弃同步位置，下次同步时重新加载最新一页"""
+        self.history_length = None
+        self.newest_id = None
+        self.oldest_offset = 0
+        self.history_entries.clear()
+
+    def sync_history(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """同步历史，返回 (新条目摘要（最新在前）, 是否需要清空已显示的条目)"""
+        if self.history_length is None:
+            self.reset_history()
+            length = self.probe_history_length()
+            offset = max(0, length - self.page_size)
+            page = self._history_page(offset, self.page_size)
+            self.oldest_offset = offset
+            self.history_length = offset + len(page)
+            self.newest_id = next(reversed(page)) if page else None
+            return self._summarize_page(page), True
+
+        if self.newest_id is None:
+            # 上次同步时历史为空
+            start = 0
+            page = self._history_page(0, self.page_size)
+        else:
+            anchor = self.history_length - 1
+            offset = max(0, anchor - self.lookback)
+            page = self._history_page(offset, anchor - offset + 1 + self.page_size)
+            ids = list(page)
+            if self.newest_id not in page:
+                # 历史被清空或删除的条目超过回看窗口：重新同步
+                self.history_length = None
+                return self.sync_history()
+            position = ids.index(self.newest_id)
+            # 最旧条目被删除时偏移前移
+            shift = anchor - (offset + position)
+            self.oldest_offset = max(0, self.oldest_offset - shift)
+            start = offset + position + 1
+            page = {prompt_id: page[prompt_id] for prompt_id in ids[position + 1:]}
+
+        new_items = dict(page)
+        # 新条目多于一页时继续向后请求
+        while len(page) >= self.page_size:
+            page = self._history_page(start + len(new_items), self.page_size)
+            new_items.update(page)
+
+        self.history_length = start + len(new_items)
+        if new_items:
+            self.newest_id = next(reversed(new_items))
+        return self._summarize_page(new_items), False
+
+    def has_older_history(self) -> bool:
+        """是否还有未加载的旧条目"""
+        return self.history_length is not None and self.oldest_offset > 0
+
+    def load_older_history(self) -> List[Dict[str, Any]]:
+        """向前加载一页旧条目，返回摘要（最新在前）"""
+        if not self.has_older_history():
+            return []
+        offset = max(0, self.oldest_offset - self.page_size)
+        page = self._history_page(offset, self.oldest_offset - offset)
+        self.oldest_offset = offset
+        return self._summarize_page(page)
@@ -2,10 +2,11 @@ import os
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
                              QLineEdit, QSpinBox, QDoubleSpinBox, QComboBox,
                              QCheckBox, QPushButton, QGroupBox, QFormLayout,
-                             QTabWidget, QWidget, QMessageBox)
+                             QTabWidget, QWidget, QMessageBox, QPlainTextEdit)
 from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QIcon
 from config import ConfigManager
+from monitor_core import get_http_session, HTTP_TIMEOUT
 
 class SettingsDialog(QDialog):
     """设置对话框"""
@@ -95,6 +96,16 @@ class SettingsDialog(QDialog):
         server_form.addRow("端口:", self.port_spin)
 
         layout.addWidget(server_group)
+
+        # 额外服务器组
+        extra_group = QGroupBox("额外监控的服务器")
+        extra_layout = QVBoxLayout(extra_group)
+        extra_layout.addWidget(QLabel("每行一个，格式: 名称=http://主机:端口（名称可省略）"))
+        self.extra_servers_edit = QPlainTextEdit()
+        self.extra_servers_edit.setPlaceholderText("render-2=http://192.168.1.12:8188")
+        extra_layout.addWidget(self.extra_servers_edit)
+
+        layout.addWidget(extra_group)
         layout.addStretch()
 
         self.tab_widget.addTab(server_widget, "服务器")
@@ -128,6 +139,11 @@ class SettingsDialog(QDialog):
         self.animation_speed_spin.setSuffix(" ms")
         appearance_form.addRow("动画速度:", self.animation_speed_spin)
 
+        self.animation_mode_combo = QComboBox()
+        self.animation_mode_combo.addItem("循环播放", "loop")
+        self.animation_mode_combo.addItem("跟随任务进度", "progress")
+        appearance_form.addRow("动画模式:", self.animation_mode_combo)
+
         layout.addWidget(appearance_group)
         layout.addStretch()
 
@@ -149,6 +165,18 @@ class SettingsDialog(QDialog):
         self.refresh_interval_spin.setSuffix(" ms")
         monitor_form.addRow("刷新间隔:", self.refresh_interval_spin)
 
+        self.max_refresh_interval_spin = QSpinBox()
+        self.max_refresh_interval_spin.setRange(100, 60000)
+        self.max_refresh_interval_spin.setSingleStep(500)
+        self.max_refresh_interval_spin.setValue(5000)
+        self.max_refresh_interval_spin.setSuffix(" ms")
+        monitor_form.addRow("空闲最大刷新间隔:", self.max_refresh_interval_spin)
+
+        self.transport_combo = QComboBox()
+        self.transport_combo.addItem("WebSocket 推送（自动回退轮询）", "websocket")
+        self.transport_combo.addItem("HTTP 轮询", "http")
+        monitor_form.addRow("数据通道:", self.transport_combo)
+
         self.auto_hide_check = QCheckBox("任务完成后自动隐藏进度窗口")
         self.auto_hide_check.setChecked(True)
         monitor_form.addRow(self.auto_hide_check)
@@ -181,6 +209,21 @@ class SettingsDialog(QDialog):
         monitor_form.addRow("进度窗口偏移:", offset_widget)
 
         layout.addWidget(monitor_group)
+
+        # 指标接口组
+        metrics_group = QGroupBox("指标接口")
+        metrics_form = QFormLayout(metrics_group)
+
+        self.metrics_enabled_check = QCheckBox("提供 Prometheus 指标（/metrics）")
+        self.metrics_enabled_check.setChecked(False)
+        metrics_form.addRow(self.metrics_enabled_check)
+
+        self.metrics_port_spin = QSpinBox()
+        self.metrics_port_spin.setRange(1, 65535)
+        self.metrics_port_spin.setValue(9464)
+        metrics_form.addRow("端口:", self.metrics_port_spin)
+
+        layout.addWidget(metrics_group)
         layout.addStretch()
 
         self.tab_widget.addTab(monitor_widget, "监控")
@@ -218,6 +261,11 @@ class SettingsDialog(QDialog):
         self.host_edit.setText(self.config_manager.get("comfyui_server.host", "127.0.0.1"))
         self.port_spin.setValue(self.config_manager.get("comfyui_server.port", 8188))
 
+        extra_lines = []
+        for name, url in self.config_manager.get_comfyui_servers()[1:]:
+            extra_lines.append(f"{name}={url}" if name and name != url else url)
+        self.extra_servers_edit.setPlainText("\n".join(extra_lines))
+
         # 宠物设置
         selected_pet = self.config_manager.get("pet_settings.selected_pet", "meizi")
         index = self.pet_combo.findText(selected_pet)
@@ -226,11 +274,18 @@ class SettingsDialog(QDialog):
 
         self.size_scale_spin.setValue(self.config_manager.get("pet_settings.size_scale", 1.0))
         self.animation_speed_spin.setValue(self.config_manager.get("pet_settings.animation_speed", 250))
+        mode_index = self.animation_mode_combo.findData(self.config_manager.get("pet_settings.animation_mode", "loop"))
+        self.animation_mode_combo.setCurrentIndex(max(mode_index, 0))
 
         # 监控设置
         self.refresh_interval_spin.setValue(self.config_manager.get("monitor_settings.refresh_interval", 1000))
+        self.max_refresh_interval_spin.setValue(self.config_manager.get("monitor_settings.max_refresh_interval", 5000))
+        transport_index = self.transport_combo.findData(self.config_manager.get("monitor_settings.transport", "websocket"))
+        self.transport_combo.setCurrentIndex(max(transport_index, 0))
         self.auto_hide_check.setChecked(self.config_manager.get("monitor_settings.auto_hide_progress", True))
         self.progress_opacity_spin.setValue(self.config_manager.get("monitor_settings.progress_window_opacity", 0.8))
+        self.metrics_enabled_check.setChecked(self.config_manager.get("monitor_settings.metrics_enabled", False))
+        self.metrics_port_spin.setValue(self.config_manager.get("monitor_settings.metrics_port", 9464))
 
         # 进度窗口偏移设置
         offset = self.config_manager.get("monitor_settings.progress_window_offset", {"x": 0, "y": 50})
@@ -249,15 +304,31 @@ class SettingsDialog(QDialog):
         self.config_manager.set("comfyui_server.host", self.host_edit.text())
         self.config_manager.set("comfyui_server.port", self.port_spin.value())
 
+        extra_servers = []
+        for line in self.extra_servers_edit.toPlainText().splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            name, sep, url = line.partition("=")
+            if not sep:
+                name, url = "", line
+            extra_servers.append({"name": name.strip(), "url": url.strip()})
+        self.config_manager.set("comfyui_server.extra_servers", extra_servers)
+
         # 宠物设置
         self.config_manager.set("pet_settings.selected_pet", self.pet_combo.currentText())
         self.config_manager.set("pet_settings.size_scale", self.size_scale_spin.value())
         self.config_manager.set("pet_settings.animation_speed", self.animation_speed_spin.value())
+        self.config_manager.set("pet_settings.animation_mode", self.animation_mode_combo.currentData())
 
         # 监控设置
         self.config_manager.set("monitor_settings.refresh_interval", self.refresh_interval_spin.value())
+        self.config_manager.set("monitor_settings.max_refresh_interval", self.max_refresh_interval_spin.value())
+        self.config_manager.set("monitor_settings.transport", self.transport_combo.currentData())
         self.config_manager.set("monitor_settings.auto_hide_progress", self.auto_hide_check.isChecked())
         self.config_manager.set("monitor_settings.progress_window_opacity", self.progress_opacity_spin.value())
+        self.config_manager.set("monitor_settings.metrics_enabled", self.metrics_enabled_check.isChecked())
+        self.config_manager.set("monitor_settings.metrics_port", self.metrics_port_spin.value())
 
         # 进度窗口偏移设置
         offset = {"x": self.offset_x_spin.value(), "y": self.offset_y_spin.value()}
@@ -280,8 +351,7 @@ class SettingsDialog(QDialog):
         url = f"{protocol}://{host}:{port}"
 
         try:
-            import requests
-            response = requests.get(f"{url}/task_monitor/status", timeout=5)
+            response = get_http_session().get(f"{url}/task_monitor/status", timeout=HTTP_TIMEOUT)
             if response.status_code == 200:
                 QMessageBox.information(self, "连接测试", "连接成功！")
             else:
@@ -295,7 +365,7 @@ class SettingsDialog(QDialog):
                                    QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
             # 重置为默认配置
-            self.config_manager.config = self.config_manager.default_config.copy()
+            self.config_manager.reset_to_defaults()
             self.load_settings()
 
     def accept_settings(self):
@@ -0,0 +1,43 @@
+import sys
+import time
+from typing import List, Tuple
+
+def _pad(text: str, width: int) -> str:
+    """按显示宽度补齐（中文字符占两列）"""
+    display_width = sum(2 if ord(char) > 0x2E80 else 1 for char in text)
+    return text + " " * max(0, width - display_width)
+
+class StartupProfiler:
+    """记录启动各阶段（含模块导入）的耗时，使用 --profile-startup 时输出"""
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.last_module_count = len(sys.modules)
+        self.phases: List[Tuple[str, float, float, int]] = []  # (阶段, 耗时, 累计, 新加载模块数)
+        self.reported = False
+
+    def mark(self, name: str):
+        """结束一个阶段：记录从上一个标记到现在的耗时"""
+        now = time.perf_counter()
+        module_count = len(sys.modules)
+        self.phases.append((name, now - self.last, now - self.started, module_count - self.last_module_count))
+        self.last = now
+        self.last_module_count = module_count
+
+    def report(self) -> str:
+        """格式化耗时明细"""
+        lines = [f"{_pad('启动阶段', 20)}{'耗时 ms':>8}{'累计 ms':>8}{'新模块':>5}"]
+        for name, duration, elapsed, modules in self.phases:
+            lines.append(f"{_pad(name, 20)}{duration * 1000:>10.1f}{elapsed * 1000:>10.1f}{modules:>8}")
+        return "\n".join(lines)
+
+    def finish(self, name: str):
+        """记录最后一个阶段并输出明细（只输出一次）"""
+        if self.reported:
+            return
+        self.mark(name)
+        self.reported = True
+        if self.enabled:
+            print(self.report(), flush=True)
@@ -0,0 +1,164 @@
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+RECORDINGS_DIR = "recordings"
+RECORDING_FORMAT = "comfyui-status-recording"
+RECORDING_VERSION = 1
+
+def default_recording_path() -> str:
+    """按当前时间生成录制文件路径"""
+    return os.path.join(RECORDINGS_DIR, time.strftime("status-%Y%m%d-%H%M%S.jsonl.gz"))
+
+class StatusRecorder:
+    """把状态数据录制到 gzip 压缩的 JSON Lines 文件
+
+    第一行为文件头，之后每行一条 {"t": 距开始的秒数, "server": 服务器, "payload": 原始数据}。
+    record() 只把数据引用放入队列，序列化、压缩和写盘都在后台线程中进行；
+    每批写入后执行一次同步刷新，程序异常退出时已写入的部分仍可读取。
+    """
+
+    def __init__(self, path: Optional[str] = None, flush_interval: float = 1.0):
+        self.path = path or default_recording_path()
+        self.flush_interval = flush_interval
+        self.started = time.monotonic()
+        self.write_queue = queue.Queue()
+        self.count = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = gzip.open(self.path, "wt", encoding="utf-8")
+        header = {"format": RECORDING_FORMAT, "version": RECORDING_VERSION, "started_at": time.time()}
+        self.file.write(json.dumps(header) + "\n")
+
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="StatusRecorder", daemon=True)
+        self.writer_thread.start()
+
+    def record(self, server: str, payload: Dict[str, Any]):
+        """记录一条原始状态数据（调用方之后不应再修改 payload）"""
+        self.write_queue.put((time.monotonic() - self.started, server, payload))
+        self.count += 1
+
+    def close(self):
+        """写完剩余数据并关闭文件"""
+        if self.writer_thread.is_alive():
+            self.write_queue.put(None)
+            self.writer_thread.join(timeout=5.0)
+
+    def _writer_loop(self):
+        """后台写入：取出队列中的全部数据后统一刷新"""
+        running = True
+        while running:
+            try:
+                items = [self.write_queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while True:
+                try:
+                    items.append(self.write_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for item in items:
+                if item is None:
+                    running = False
+                    continue
+                elapsed, server, payload = item
+                lines.append(json.dumps({"t": round(elapsed, 4), "server": server, "payload": payload},
+                                        ensure_ascii=False, separators=(",", ":")))
+            try:
+                if lines:
+                    self.file.write("\n".join(lines) + "\n")
+                self.file.flush()
+            except (OSError, ValueError) as e:
+                print(f"状态录制写入失败: {e}")
+                running = False
+        self.file.close()
+
+def read_recording(path: str) -> Iterator[Dict[str, Any]]:
+    """逐条读取录制文件中的记录（跳过文件头和截断的末行）"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "payload" in entry:
+                    yield entry
+        except (EOFError, OSError):
+            # 录制进程异常退出时压缩流可能不完整
+            return
+
+def recording_servers(path: str) -> List[str]:
+    """录制文件中出现的服务器（按首次出现顺序）"""
+    servers = []
+    for entry in read_recording(path):
+        if entry["server"] not in servers:
+            servers.append(entry["server"])
+    return servers
+
+class ReplayTransport(QObject):
+    """按录制时的时间间隔（或加速）重新发送状态数据"""
+
+    # 信号定义
+    payload_ready = pyqtSignal(dict)  # 回放的状态数据
+    connected_changed = pyqtSignal(bool)  # 回放开始/结束
+    finished = pyqtSignal()  # 回放结束
+
+    def __init__(self, path: str, speed: float = 1.0, server: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.speed = speed  # 0 表示不等待，尽快回放
+        self.entries = [entry for entry in read_recording(path) if server is None or entry["server"] == server]
+        if server is None and self.entries:
+            # 未指定服务器时只回放第一个服务器的数据
+            first = self.entries[0]["server"]
+            self.entries = [entry for entry in self.entries if entry["server"] == first]
+        self.position = 0
+        self.is_connected = False
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._emit_next)
+
+    def start(self):
+        """从头开始回放"""
+        self.position = 0
+        if not self.is_connected:
+            self.is_connected = True
+            self.connected_changed.emit(True)
+        self._schedule()
+
+    def stop(self):
+        """停止回放"""
+        self.timer.stop()
+        if self.is_connected:
+            self.is_connected = False
+            self.connected_changed.emit(False)
+
+    def _schedule(self):
+        """安排下一条数据"""
+        if self.position >= len(self.entries):
+            self.stop()
+            self.finished.emit()
+            return
+        delay = 0
+        if self.position > 0 and self.speed > 0:
+            gap = self.entries[self.position]["t"] - self.entries[self.position - 1]["t"]
+            delay = max(0, int(gap * 1000 / self.speed))
+        self.timer.start(delay)
+
+    def _emit_next(self):
+        """发送一条数据并安排下一条"""
+        entry = self.entries[self.position]
+        self.position += 1
+        self.payload_ready.emit(entry["payload"])
+        self._schedule()
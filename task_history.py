@@ -0,0 +1,245 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+HISTORY_FILE = "task_history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    server TEXT NOT NULL,
+    task_id TEXT,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    status TEXT NOT NULL,
+    total_nodes INTEGER NOT NULL DEFAULT 0,
+    executed_nodes INTEGER NOT NULL DEFAULT 0,
+    node_steps TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_started_at ON tasks (started_at, status, duration);
+CREATE INDEX IF NOT EXISTS idx_tasks_status_started_at ON tasks (status, started_at);
+"""
+
+INSERT_SQL = """
+INSERT INTO tasks (server, task_id, started_at, ended_at, duration, status, total_nodes, executed_nodes, node_steps)
+VALUES (:server, :task_id, :started_at, :ended_at, :duration, :status, :total_nodes, :executed_nodes, :node_steps)
+"""
+
+class TaskHistoryStore:
+    """任务历史存储（SQLite）
+
+    每个任务一行。写入在后台线程中批量提交，界面线程只负责入队；
+    按开始时间和状态建立索引，查询一周的历史也只需几毫秒。
+    查询看不到尚在写入队列中的记录。
+    """
+
+    def __init__(self, path: str = HISTORY_FILE, batch_size: int = 32, flush_interval: float = 2.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_queue = queue.Queue()
+        self.read_connection = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+
+        self.writer_thread = threading.Thread(target=self._writer_loop, name="TaskHistoryWriter", daemon=True)
+        self.writer_thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开连接（WAL 模式下读取不会被后台写入阻塞）"""
+        connection = sqlite3.connect(self.path, timeout=5.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def add(self, record: Dict[str, Any]):
+        """记录一个已结束的任务（只入队，不阻塞调用线程）"""
+        row = {
+            "server": record.get("server", ""),
+            "task_id": record.get("task_id"),
+            "started_at": record["started_at"],
+            "ended_at": record["ended_at"],
+            "duration": max(0.0, record["ended_at"] - record["started_at"]),
+            "status": record.get("status", "completed"),
+            "total_nodes": record.get("total_nodes", 0),
+            "executed_nodes": record.get("executed_nodes", 0),
+            "node_steps": json.dumps(record.get("node_steps") or {}, ensure_ascii=False)
+        }
+        self.write_queue.put(row)
+
+    def close(self):
+        """写完队列中剩余的记录并结束后台线程"""
+        if self.writer_thread.is_alive():
+            self.write_queue.put(None)
+            self.writer_thread.join(timeout=5.0)
+        if self.read_connection is not None:
+            self.read_connection.close()
+            self.read_connection = None
+
+    def _writer_loop(self):
+        """后台写入：攒够一批或等待超时后在一个事务中提交"""
+        connection = self._connect()
+        batch = []
+        running = True
+        while running:
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = self.write_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if row is None:
+                    running = False
+                    break
+                batch.append(row)
+
+            if batch:
+                try:
+                    with connection:
+                        connection.executemany(INSERT_SQL, batch)
+                except sqlite3.Error as e:
+                    print(f"任务历史写入失败: {e}")
+                batch = []
+        connection.close()
+
+    def _reader(self) -> sqlite3.Connection:
+        """调用线程使用的只读连接"""
+        if self.read_connection is None:
+            self.read_connection = self._connect()
+            self.read_connection.row_factory = sqlite3.Row
+        return self.read_connection
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              status: Optional[str] = None, server: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """按时间范围、状态和服务器查询任务，最新的在前"""
+        conditions = []
+        params = []
+        if since is not None:
+            conditions.append("started_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("started_at < ?")
+            params.append(until)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        if server is not None:
+            conditions.append("server = ?")
+            params.append(server)
+
+        sql = "SELECT * FROM tasks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+
+        rows = []
+        for row in self._reader().execute(sql, params):
+            record = dict(row)
+            record["node_steps"] = json.loads(record["node_steps"] or "{}")
+            rows.append(record)
+        return rows
+
+    def summary(self, since: Optional[float] = None) -> Dict[str, Any]:
+        """统计任务数、各状态数量和平均耗时"""
+        where = "WHERE started_at >= ?" if since is not None else ""
+        params = [since] if since is not None else []
+        # GROUP BY +status：让查询走按时间的覆盖索引，而不是扫描整个状态索引
+        rows = self._reader().execute(
+            f"SELECT status, COUNT(*), SUM(duration), MAX(duration) FROM tasks {where} GROUP BY +status",
+            params).fetchall()
+        count = sum(row[1] for row in rows)
+        total_duration = sum(row[2] for row in rows)
+        return {
+            "count": count,
+            "avg_duration": total_duration / count if count else 0.0,
+            "max_duration": max((row[3] for row in rows), default=0.0),
+            "status_counts": {row[0]: row[1] for row in rows}
+        }
+
+    def throughput(self, since: float, bucket_seconds: int = 3600) -> List[tuple]:
+        """按时间段统计任务数 [(时间段开始, 数量)]"""
+        sql = ("SELECT CAST(started_at / ? AS INTEGER) * ? AS bucket, COUNT(*) FROM tasks "
+               "WHERE started_at >= ? GROUP BY bucket ORDER BY bucket")
+        return [tuple(row) for row in self._reader().execute(sql, (bucket_seconds, bucket_seconds, since))]
+
+class TaskHistoryRecorder:
+    """从状态数据中识别任务的开始和结束，为每个任务生成一条历史记录"""
+
+    FINAL_STATUSES = ("completed", "error")
+
+    def __init__(self, store: TaskHistoryStore):
+        self.store = store
+        self.active: Dict[str, Dict[str, Any]] = {}  # 服务器名称 -> 进行中的任务
+
+    def observe(self, server: str, data: Dict[str, Any]):
+        """处理某个服务器的一次状态更新"""
+        status = data.get("status", "idle")
+        task_id = data.get("task_id")
+        record = self.active.get(server)
+
+        # 任务切换：上一个任务没有等到结束状态
+        if record is not None and task_id != record["task_id"]:
+            self._finish(server, self._unfinished_status(record))
+            record = None
+
+        if record is None:
+            if status != "running" or not task_id:
+                return
+            record = {
+                "server": server,
+                "task_id": task_id,
+                "started_at": time.time(),
+                "total_nodes": 0,
+                "executed_nodes": 0,
+                "node_steps": {}
+            }
+            self.active[server] = record
+
+        workflow_progress = data.get("workflow_progress") or {}
+        record["total_nodes"] = workflow_progress.get("total_nodes", record["total_nodes"])
+        record["executed_nodes"] = workflow_progress.get("executed_nodes", record["executed_nodes"])
+
+        node_progress = data.get("current_task_progress")
+        if node_progress and node_progress.get("node_id") is not None:
+            node_id = str(node_progress["node_id"])
+            node = record["node_steps"].setdefault(node_id, {"type": node_progress.get("node_type"), "steps": 0})
+            node["steps"] = max(node["steps"], node_progress.get("total_steps") or 0)
+
+        if status in self.FINAL_STATUSES:
+            self._finish(server, status)
+        elif status == "idle":
+            self._finish(server, self._unfinished_status(record))
+
+    @staticmethod
+    def _unfinished_status(record: Dict[str, Any]) -> str:
+        """未观察到结束状态时，根据已执行节点数推断结果"""
+        if record["total_nodes"] and record["executed_nodes"] >= record["total_nodes"]:
+            return "completed"
+        return "interrupted"
+
+    def _finish(self, server: str, status: str):
+        """结束进行中的任务并写入历史"""
+        record = self.active.pop(server, None)
+        if record is None:
+            return
+        record["ended_at"] = time.time()
+        record["status"] = status
+        self.store.add(record)
+
+    def close(self):
+        """关闭存储（进行中的任务不记录）"""
+        self.store.close()
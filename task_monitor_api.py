@@ -1,141 +1,347 @@
-import requests
-import json
 import time
-from typing import Dict, Any, Optional
-from PyQt5.QtCore import QObject, pyqtSignal, QTimer
-from enum import Enum
-
-class TaskStatus(Enum):
-    """任务状态枚举"""
-    IDLE = "idle"
-    RUNNING = "running"
-    COMPLETED = "completed"
-    ERROR = "error"
-    QUEUED = "queued"
+from typing import Dict, Any
+from PyQt5.QtCore import QObject, pyqtSignal, pyqtSlot, QTimer, QThread, QByteArray
+from monitor_core import TaskStatus, PollScheduler, StatusFetcher, MonitorState
+from ws_transport import WebSocketTransport
+from power_monitor import wakeup_counter
+import metrics
+
+class StatusFetchWorker(QObject):
+    """状态请求工作者，运行在后台线程中执行阻塞的 HTTP 请求"""
+
+    # 信号定义 (请求序号, 数据/错误信息)
+    fetched = pyqtSignal(int, dict)
+    not_modified = pyqtSignal(int)  # 响应内容与上次相同
+    failed = pyqtSignal(int, str)
+
+    def __init__(self):
+        super().__init__()
+        self.fetcher = StatusFetcher()
+
+    @pyqtSlot(int, str)
+    def fetch(self, seq: int, url: str):
+        """请求状态接口，内容未变化时跳过 JSON 解析"""
+        result, value = self.fetcher.fetch(url)
+        if result == "fetched":
+            self.fetched.emit(seq, value)
+        elif result == "not_modified":
+            self.not_modified.emit(seq)
+        else:
+            self.failed.emit(seq, value)
 
 class TaskMonitorAPI(QObject):
-    """ComfyUI 任务监控 API 客户端"""
+    """ComfyUI 任务监控 API 客户端（MonitorState 状态机的 Qt 适配层）"""
 
     # 信号定义
     status_changed = pyqtSignal(str)  # 状态变化信号
-    progress_updated = pyqtSignal(dict)  # 进度更新信号
+    progress_updated = pyqtSignal(dict)  # 进度更新信号（完整数据，仅在有字段变化时发送）
+    progress_delta = pyqtSignal(dict)  # 增量更新信号（只包含变化的字段）
     error_occurred = pyqtSignal(str)  # 错误信号
     connection_changed = pyqtSignal(bool)  # 连接状态变化信号
+    preview_frame = pyqtSignal(QByteArray, int, str)  # 实时预览帧 (WebSocket 消息, 图片数据偏移, 图片格式)
+    fetch_requested = pyqtSignal(int, str)  # 内部信号：通知工作线程发起请求
 
-    def __init__(self, base_url: str, refresh_interval: int = 1000):
+    def __init__(self, base_url: str, refresh_interval: int = 1000, max_refresh_interval: int = 5000):
         super().__init__()
         self.base_url = base_url.rstrip('/')
         self.refresh_interval = refresh_interval
+        self.scheduler = PollScheduler(refresh_interval, max_refresh_interval)
         self.is_connected = False
-        self.last_status = TaskStatus.IDLE
-        self.last_task_data = {}
 
-        # 执行时间跟踪
-        self.execution_start_time = None
-        self.current_execution_time = 0
-        self.last_task_id = None
+        # 任务状态、执行时间和字段差异
+        self.state = MonitorState(self.base_url)
+
+        # 请求跟踪：同一时间最多一个请求在途，序号不大于 discard_up_to 的响应视为过期
+        self.request_seq = 0
+        self.request_in_flight = False
+        self.discard_up_to = 0
+        self.request_started = 0.0
+
+        # 后台请求线程
+        self.fetch_thread = QThread()
+        self.fetch_worker = StatusFetchWorker()
+        self.fetch_worker.moveToThread(self.fetch_thread)
+        self.fetch_requested.connect(self.fetch_worker.fetch)
+        self.fetch_worker.fetched.connect(self._on_fetch_finished)
+        self.fetch_worker.not_modified.connect(self._on_fetch_not_modified)
+        self.fetch_worker.failed.connect(self._on_fetch_failed)
+        self.fetch_thread.start()
 
         # 创建定时器
         self.timer = QTimer()
         self.timer.timeout.connect(self.fetch_status)
 
+        # 数据通道："http" 定时轮询，"websocket" 订阅 /ws 事件并在不可用时回退到轮询
+        self.transport = "http"
+        self.is_monitoring = False
+        self.ws_transport = WebSocketTransport(self.base_url)
+        self.ws_transport.payload_ready.connect(self._on_ws_payload)
+        self.ws_transport.resync_requested.connect(self.fetch_status)
+        self.ws_transport.connected_changed.connect(self._on_ws_connected_changed)
+        self.ws_transport.preview_frame.connect(self.preview_frame)
+
+        # 状态录制与回放
+        self.recorder = None
+        self.replay_transport = None
+
+    @property
+    def last_status(self) -> TaskStatus:
+        return self.state.last_status
+
+    @property
+    def last_task_data(self) -> Dict[str, Any]:
+        return self.state.last_task_data
+
+    def set_recorder(self, recorder):
+        """设置状态录制器（None 表示停止录制）"""
+        self.recorder = recorder
+
+    def set_replay(self, replay_transport):
+        """用回放数据代替服务器（None 表示恢复正常监控）"""
+        if self.replay_transport is not None:
+            self.replay_transport.stop()
+            self.replay_transport.payload_ready.disconnect(self._on_ws_payload)
+            self.replay_transport.connected_changed.disconnect(self._on_replay_connected_changed)
+
+        self.replay_transport = replay_transport
+        if replay_transport is not None:
+            replay_transport.payload_ready.connect(self._on_ws_payload)
+            replay_transport.connected_changed.connect(self._on_replay_connected_changed)
+        if self.is_monitoring:
+            self.stop_monitoring()
+            self.start_monitoring()
+
+    def _on_replay_connected_changed(self, connected: bool):
+        """回放开始/结束视为连接/断开"""
+        if connected:
+            self._mark_connected()
+        else:
+            self._handle_connection_error("回放结束")
+
     def start_monitoring(self):
         """开始监控"""
-        self.timer.start(self.refresh_interval)
+        self.is_monitoring = True
+        if self.replay_transport is not None:
+            # 回放期间不访问服务器；正在回放时不从头开始
+            self.timer.stop()
+            if not self.replay_transport.is_connected:
+                self.replay_transport.start()
+            return
+        if self.transport == "websocket" and not self.scheduler.power_saving:
+            self.ws_transport.start()
+            if self.ws_transport.is_connected:
+                self.timer.stop()
+                return
+        self.scheduler.reset()
+        self.timer.start(self.scheduler.current_interval)
 
     def stop_monitoring(self):
         """停止监控"""
+        self.is_monitoring = False
         self.timer.stop()
+        self.ws_transport.stop()
+        if self.replay_transport is not None:
+            self.replay_transport.stop()
+        # 丢弃停止前发出的请求结果
+        self.discard_up_to = self.request_seq
+
+    def shutdown(self):
+        """停止监控并结束后台请求线程（等待线程退出，用于程序退出）"""
+        self.stop_monitoring()
+        self.fetch_thread.quit()
+        self.fetch_thread.wait()
+
+    def release(self):
+        """停止监控并通知后台请求线程退出，不等待正在进行的请求
+
+        线程在请求结束后自行退出；调用方需保留本对象直到 fetch_thread.finished。
+        """
+        self.stop_monitoring()
+        self.fetch_thread.finished.connect(self.fetch_worker.deleteLater)
+        self.fetch_thread.quit()
 
     def set_refresh_interval(self, interval: int):
-        """设置刷新间隔"""
+        """设置刷新间隔（任务运行时的最快轮询间隔）"""
         self.refresh_interval = interval
-        if self.timer.isActive():
-            self.timer.stop()
-            self.timer.start(interval)
+        self.scheduler.set_bounds(interval, self.scheduler.max_interval)
+        self._apply_scheduled_interval()
+
+    def set_max_refresh_interval(self, interval: int):
+        """设置空闲时的最慢轮询间隔"""
+        self.scheduler.set_bounds(self.scheduler.min_interval, interval)
+        self._apply_scheduled_interval()
+
+    def get_effective_refresh_interval(self) -> int:
+        """获取调度器当前的轮询间隔（毫秒）"""
+        return self.scheduler.current_interval
+
+    def get_effective_poll_rate(self) -> float:
+        """获取调度器当前的轮询频率（次/秒），用于诊断"""
+        return self.scheduler.effective_rate()
+
+    def _apply_scheduled_interval(self):
+        """把调度器的间隔应用到正在运行的定时器"""
+        if self.timer.isActive() and self.timer.interval() != self.scheduler.current_interval:
+            self.timer.setInterval(self.scheduler.current_interval)
+
+    def _reschedule(self):
+        """根据最新状态调整下一次轮询"""
+        self.scheduler.update(self.state.last_status, self.state.queue_active())
+        self._apply_scheduled_interval()
+
+    def set_power_saving(self, enabled: bool):
+        """省电模式：界面不可见时断开 WebSocket，只以低频率轮询是否有任务；退出时立即刷新"""
+        if enabled == self.scheduler.power_saving:
+            return
+
+        self.scheduler.power_saving = enabled
+        if not self.is_monitoring:
+            return
+        if enabled:
+            self.ws_transport.stop()
+        self.start_monitoring()
+        if not enabled:
+            self.fetch_status()
+
+    def set_power_save_interval(self, interval: int):
+        """设置省电模式的轮询间隔"""
+        self.scheduler.power_save_interval = interval
+        if self.scheduler.power_saving:
+            self.scheduler.reset()
+            self._apply_scheduled_interval()
+
+    def set_transport(self, transport: str):
+        """设置数据通道（"http" 或 "websocket"）"""
+        if transport not in ("http", "websocket"):
+            transport = "http"
+        if transport == self.transport:
+            return
+
+        self.transport = transport
+        if self.is_monitoring:
+            if transport == "http":
+                self.ws_transport.stop()
+            self.start_monitoring()
 
     def set_base_url(self, url: str):
         """设置服务器 URL"""
-        self.base_url = url.rstrip('/')
+        url = url.rstrip('/')
+        if url != self.base_url:
+            self.base_url = url
+            self.state.server = url
+            self.ws_transport.set_base_url(url)
+            # 旧地址的在途响应不再有效
+            self.discard_up_to = self.request_seq
 
     def fetch_status(self):
-        """获取任务状态"""
-        try:
-            url = f"{self.base_url}/task_monitor/status"
-            response = requests.get(url, timeout=5)
-
-            if response.status_code == 200:
-                data = response.json()
-                self._handle_status_response(data)
-
-                # 更新连接状态
-                if not self.is_connected:
-                    self.is_connected = True
-                    self.connection_changed.emit(True)
-
-            else:
-                self._handle_connection_error(f"HTTP {response.status_code}")
-
-        except requests.exceptions.RequestException as e:
-            self._handle_connection_error(str(e))
-        except json.JSONDecodeError as e:
-            self._handle_connection_error(f"JSON 解析错误: {e}")
-        except Exception as e:
-            self._handle_connection_error(f"未知错误: {e}")
+        """获取任务状态（在后台线程中发起请求，不阻塞界面）"""
+        wakeup_counter.tick("poll")
+        if self.replay_transport is not None:
+            return
+        if self.request_in_flight:
+            # 上一个请求尚未返回，跳过本次轮询
+            return
+
+        self.request_seq += 1
+        self.request_in_flight = True
+        self.request_started = time.perf_counter()
+        metrics.polls_total.inc(server=self.base_url)
+        self.fetch_requested.emit(self.request_seq, f"{self.base_url}/task_monitor/status")
+
+    def _observe_poll_latency(self):
+        """记录本次轮询请求的耗时"""
+        metrics.poll_latency.observe(time.perf_counter() - self.request_started, server=self.base_url)
+
+    def _on_fetch_finished(self, seq: int, data: dict):
+        """后台请求成功"""
+        self.request_in_flight = False
+        self._observe_poll_latency()
+        if seq <= self.discard_up_to:
+            return
+
+        if self.ws_transport.is_connected:
+            self.ws_transport.sync(data)
+        self._handle_status_response(data)
+        self._mark_connected()
+        self._reschedule()
+
+    def _on_fetch_not_modified(self, seq: int):
+        """后台请求返回的内容未变化"""
+        self.request_in_flight = False
+        self._observe_poll_latency()
+        if seq <= self.discard_up_to:
+            return
+
+        self._mark_connected()
+        self._reschedule()
+        # 运行中仍需刷新本地计算的执行时间，其余状态不重复处理
+        self._publish(self.state.refresh())
+
+    def _on_ws_payload(self, data: dict):
+        """WebSocket 推送的状态数据"""
+        self._handle_status_response(data)
+        self._mark_connected()
+
+    def _on_ws_connected_changed(self, connected: bool):
+        """WebSocket 可用时停止轮询，不可用时回退到 HTTP 轮询"""
+        if not self.is_monitoring or self.transport != "websocket" or self.scheduler.power_saving:
+            return
+        if connected:
+            self.timer.stop()
+        elif not self.timer.isActive():
+            self.scheduler.reset()
+            self.timer.start(self.scheduler.current_interval)
+
+    def _mark_connected(self):
+        """更新连接状态"""
+        if not self.is_connected:
+            self.is_connected = True
+            metrics.connection_changes_total.inc(server=self.base_url, connected="true")
+            self.connection_changed.emit(True)
+
+    def _on_fetch_failed(self, seq: int, error_msg: str):
+        """后台请求失败"""
+        self.request_in_flight = False
+        self._observe_poll_latency()
+        metrics.poll_failures_total.inc(server=self.base_url)
+        if seq <= self.discard_up_to:
+            return
+
+        self._handle_connection_error(error_msg)
+        # 服务器不可用时同样逐步放慢轮询
+        self.scheduler.update(TaskStatus.IDLE, False)
+        self._apply_scheduled_interval()
 
     def _handle_status_response(self, data: Dict[str, Any]):
         """处理状态响应"""
+        if self.recorder is not None:
+            self.recorder.record(self.base_url, data)
         try:
-            status_str = data.get("status", "idle")
-            current_status = TaskStatus(status_str)
-            current_task_id = data.get("task_id")
-
-            # 检查任务是否变化
-            if current_task_id != self.last_task_id:
-                self.last_task_id = current_task_id
-                if current_status == TaskStatus.RUNNING:
-                    # 新任务开始
-                    self.execution_start_time = time.time()
-                    self.current_execution_time = 0
-                else:
-                    # 任务结束或空闲
-                    self.execution_start_time = None
-                    self.current_execution_time = 0
-
-            # 计算当前执行时间
-            if self.execution_start_time and current_status == TaskStatus.RUNNING:
-                self.current_execution_time = time.time() - self.execution_start_time
-            elif current_status in [TaskStatus.COMPLETED, TaskStatus.ERROR]:
-                # 任务完成，保持最后的执行时间
-                if self.execution_start_time:
-                    self.current_execution_time = time.time() - self.execution_start_time
-                    self.execution_start_time = None
-            elif current_status == TaskStatus.IDLE:
-                # 空闲状态，重置时间
-                self.execution_start_time = None
-                self.current_execution_time = 0
-
-            # 检查状态是否变化
-            if current_status != self.last_status:
-                self.last_status = current_status
-                self.status_changed.emit(status_str)
-
-            # 更新数据，添加我们计算的执行时间
-            updated_data = data.copy()
-            updated_data["execution_time"] = self.current_execution_time
-
-            # 发送进度更新信号
-            self.last_task_data = updated_data
-            self.progress_updated.emit(updated_data)
-
-        except ValueError:
-            # 未知状态值
-            self.error_occurred.emit(f"未知状态: {data.get('status')}")
+            status_changed, delta = self.state.update(data)
+        except ValueError as e:
+            # 非对象数据或未知状态值
+            self.error_occurred.emit(str(e))
+            return
+
+        if status_changed:
+            self.status_changed.emit(self.state.last_status.value)
+        self._publish(delta)
+
+    def _publish(self, delta: Dict[str, Any]):
+        """有字段变化时发送增量和完整数据"""
+        if delta:
+            self.progress_delta.emit(delta)
+            self.progress_updated.emit(self.state.last_task_data.copy())
+
+    def get_diff_stats(self) -> Dict[str, Any]:
+        """获取空操作轮询统计"""
+        return self.state.differ.stats()
 
     def _handle_connection_error(self, error_msg: str):
         """处理连接错误"""
         if self.is_connected:
             self.is_connected = False
+            metrics.connection_changes_total.inc(server=self.base_url, connected="false")
             self.connection_changed.emit(False)
             self.error_occurred.emit(f"连接错误: {error_msg}")
 
@@ -149,41 +355,20 @@ class TaskMonitorAPI(QObject):
 
     def is_task_running(self) -> bool:
         """检查是否有任务正在运行"""
-        return self.last_status in [TaskStatus.RUNNING, TaskStatus.QUEUED]
+        return self.state.is_task_running()
 
     def get_progress_info(self) -> Dict[str, Any]:
         """获取进度信息"""
-        if not self.last_task_data:
-            return {}
-
-        progress_info = {
-            "status": self.last_status.value,
-            "task_id": self.last_task_data.get("task_id"),
-            "execution_time": self.last_task_data.get("execution_time", 0),
-            "workflow_progress": self.last_task_data.get("workflow_progress", {}),
-            "current_task_progress": self.last_task_data.get("current_task_progress"),
-            "queue": self.last_task_data.get("queue", {}),
-            "error_info": self.last_task_data.get("error_info")
-        }
-
-        return progress_info
+        return self.state.get_progress_info()
 
     def get_workflow_progress_percentage(self) -> float:
         """获取工作流进度百分比"""
-        workflow_progress = self.last_task_data.get("workflow_progress", {})
-        total_nodes = workflow_progress.get("total_nodes", 0)
-        executed_nodes = workflow_progress.get("executed_nodes", 0)
-
-        if total_nodes > 0:
-            return (executed_nodes / total_nodes) * 100
-        return 0.0
+        return self.state.get_workflow_progress_percentage()
 
     def get_current_node_progress_percentage(self) -> float:
         """获取当前节点进度百分比"""
-        current_progress = self.last_task_data.get("current_task_progress")
-        if current_progress:
-            step = current_progress.get("step", 0)
-            total_steps = current_progress.get("total_steps", 0)
-            if total_steps > 0:
-                return (step / total_steps) * 100
-        return 0.0
+        return self.state.get_current_node_progress_percentage()
+
+    def get_overall_progress_percentage(self) -> float:
+        """获取整体进度百分比（已完成节点加上当前节点的步骤进度）"""
+        return self.state.get_overall_progress_percentage()
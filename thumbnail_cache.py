@@ -0,0 +1,122 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from PyQt5.QtGui import QImage
+
+# 缓存目录
+THUMBNAIL_CACHE_DIR = os.path.join("cache", "thumbnails")
+
+def thumbnail_key(server: str, filename: str, subfolder: str, image_type: str, size: int) -> str:
+    """输出图片缩略图的缓存键：服务器、文件名、子目录、类型和缩略图尺寸"""
+    text = f"{server}|{filename}|{subfolder}|{image_type}|{size}"
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:24]
+
+class ThumbnailDiskCache:
+    """按总大小限制的缩略图磁盘缓存，超出上限时删除最久未使用的文件
+
+    每个缩略图一个 PNG 文件，命中时更新修改时间作为最近使用时间，
+    重启后按修改时间恢复使用顺序。可在任意线程调用。
+    """
+
+    def __init__(self, cache_dir: str = THUMBNAIL_CACHE_DIR, budget_mb: float = 64):
+        self.cache_dir = cache_dir
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.entries: Optional[OrderedDict] = None  # 文件名 -> 大小，最久未使用的在前
+        self.total_bytes = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def _load_index(self):
+        """首次使用时扫描缓存目录（调用方持有锁）"""
+        if self.entries is not None:
+            return
+        files = []
+        try:
+            with os.scandir(self.cache_dir) as scan:
+                for entry in scan:
+                    if entry.name.endswith(".png") and entry.is_file():
+                        stat = entry.stat()
+                        files.append((stat.st_mtime_ns, entry.name, stat.st_size))
+        except OSError:
+            pass
+        files.sort()
+        self.entries = OrderedDict((name, size) for _, name, size in files)
+        self.total_bytes = sum(size for _, _, size in files)
+
+    def get(self, key: str) -> Optional[QImage]:
+        """读取缩略图，未命中或文件损坏时返回 None"""
+        name = key + ".png"
+        with self.lock:
+            self._load_index()
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        image = QImage(self._path(key))
+        if image.isNull():
+            self._remove(name)
+            return None
+        try:
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return image
+
+    def put(self, key: str, image: QImage) -> bool:
+        """写入缩略图并按总大小淘汰旧文件"""
+        name = key + ".png"
+        path = self._path(key)
+        temp_path = path + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            if not image.save(temp_path, "PNG"):
+                return False
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"缩略图缓存写入失败: {e}")
+            return False
+        finally:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+        with self.lock:
+            self._load_index()
+            self.total_bytes += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+            evicted = []
+            while self.total_bytes > self.budget and len(self.entries) > 1:
+                old_name, old_size = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(os.path.join(self.cache_dir, old_name))
+            except OSError:
+                pass
+        return True
+
+    def _remove(self, name: str):
+        """删除损坏的缓存文件"""
+        with self.lock:
+            self.total_bytes -= self.entries.pop(name, 0)
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def set_budget(self, budget_mb: float):
+        """设置总大小上限，下次写入时按新上限淘汰"""
+        self.budget = int(budget_mb * 1024 * 1024)
+
+    def usage(self) -> Tuple[int, int]:
+        """(文件数, 总字节数)"""
+        with self.lock:
+            self._load_index()
+            return len(self.entries), self.total_bytes
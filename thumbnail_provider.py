@@ -0,0 +1,241 @@
+import urllib.parse
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, QBuffer, QByteArray, QIODevice, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader, QPixmap
+from monitor_core import HTTP_TIMEOUT, get_http_session
+from queue_history import summarize_history_item
+from thumbnail_cache import ThumbnailDiskCache, thumbnail_key
+
+# 单张输出图片的下载上限，超过时不生成缩略图
+MAX_OUTPUT_BYTES = 64 * 1024 * 1024
+
+def decode_thumbnail(data: bytes, size: int) -> QImage:
+    """解码图片数据并缩小到 size 以内（只使用 QImage，可在后台线程调用）
+
+    先只读文件头取得原图尺寸，再让 QImageReader 直接按缩小后的尺寸解码，
+    JPEG 等格式在解码时即缩放，不会生成全尺寸图像。
+    """
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QIODevice.ReadOnly)
+    reader = QImageReader(buffer)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid() and (original.width() > size or original.height() > size):
+        scaled = original.scaled(size, size, Qt.KeepAspectRatio)
+        scaled.setWidth(max(1, scaled.width()))
+        scaled.setHeight(max(1, scaled.height()))
+        reader.setScaledSize(scaled)
+    image = reader.read()
+    if image.isNull():
+        return image
+    return image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+class ThumbnailSignals(QObject):
+    """后台任务的回调信号（QRunnable 本身不能发信号）"""
+
+    outputs_found = pyqtSignal(str, str, list)  # (服务器, prompt_id, [(文件名, 子目录, 类型)])
+    outputs_missing = pyqtSignal(str, str)  # (服务器, prompt_id) 历史中还没有该任务
+    decoded = pyqtSignal(str, QImage)  # (缓存键, 缩略图)
+    failed = pyqtSignal(str, str)  # (缓存键, 错误信息)
+
+class OutputsTask(QRunnable):
+    """通过 /history/{prompt_id} 查询任务的输出图片"""
+
+    def __init__(self, signals: ThumbnailSignals, server: str, prompt_id: str):
+        super().__init__()
+        self.signals = signals
+        self.server = server
+        self.prompt_id = prompt_id
+
+    def run(self):
+        import requests
+        try:
+            response = get_http_session().get(
+                f"{self.server}/history/{urllib.parse.quote(self.prompt_id)}", timeout=HTTP_TIMEOUT)
+            item = response.json().get(self.prompt_id) if response.status_code == 200 else None
+            if item is None:
+                self.signals.outputs_missing.emit(self.server, self.prompt_id)
+            else:
+                images = summarize_history_item(self.prompt_id, item)["images"]
+                self.signals.outputs_found.emit(self.server, self.prompt_id, images)
+        except (requests.exceptions.RequestException, ValueError, AttributeError):
+            self.signals.outputs_missing.emit(self.server, self.prompt_id)
+        except RuntimeError:
+            # 程序退出时信号对象可能已被销毁
+            pass
+
+class ThumbnailTask(QRunnable):
+    """生成一张缩略图：优先读取磁盘缓存，否则通过 /view 下载原图后缩放解码"""
+
+    def __init__(self, signals: ThumbnailSignals, disk_cache: ThumbnailDiskCache, key: str,
+                 server: str, image: Tuple[str, str, str], size: int):
+        super().__init__()
+        self.signals = signals
+        self.disk_cache = disk_cache
+        self.key = key
+        self.server = server
+        self.image = image
+        self.size = size
+
+    def run(self):
+        import requests
+        try:
+            thumbnail = self.disk_cache.get(self.key)
+            if thumbnail is None:
+                filename, subfolder, image_type = self.image
+                query = urllib.parse.urlencode({"filename": filename, "subfolder": subfolder, "type": image_type})
+                try:
+                    response = get_http_session().get(f"{self.server}/view?{query}", timeout=HTTP_TIMEOUT,
+                                                      stream=True)
+                    if response.status_code != 200:
+                        self.signals.failed.emit(self.key, f"HTTP {response.status_code}")
+                        return
+                    if int(response.headers.get("Content-Length") or 0) > MAX_OUTPUT_BYTES:
+                        response.close()
+                        self.signals.failed.emit(self.key, "图片过大")
+                        return
+                    # 没有 Content-Length 时边读边检查大小
+                    chunks = []
+                    received = 0
+                    for chunk in response.iter_content(64 * 1024):
+                        received += len(chunk)
+                        if received > MAX_OUTPUT_BYTES:
+                            response.close()
+                            self.signals.failed.emit(self.key, "图片过大")
+                            return
+                        chunks.append(chunk)
+                    data = b"".join(chunks)
+                except requests.exceptions.RequestException as e:
+                    self.signals.failed.emit(self.key, str(e))
+                    return
+
+                thumbnail = decode_thumbnail(data, self.size)
+                if thumbnail.isNull():
+                    self.signals.failed.emit(self.key, "无法解码图片")
+                    return
+                self.disk_cache.put(self.key, thumbnail)
+            self.signals.decoded.emit(self.key, thumbnail)
+        except RuntimeError:
+            # 程序退出时信号对象可能已被销毁
+            pass
+
+class ThumbnailProvider(QObject):
+    """已完成任务的输出缩略图
+
+    查询输出、下载和缩放解码都在线程池中进行，GUI 线程只把小尺寸的结果转换为 QPixmap。
+    缩略图先后放入有内存上限的 LRU 和有总大小上限的磁盘缓存，再次打开同一输出时直接命中。
+    """
+
+    # 信号定义
+    thumbnails_changed = pyqtSignal()  # 当前任务的缩略图有更新
+
+    # 任务刚完成时服务器可能还没写入历史，稍后重试
+    OUTPUTS_RETRY_DELAY = 1000
+    OUTPUTS_RETRIES = 3
+
+    def __init__(self, size: int = 80, max_count: int = 4, memory_budget_mb: float = 16,
+                 disk_budget_mb: float = 64, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.max_count = max_count  # 每个任务最多显示的缩略图数
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.disk_cache = ThumbnailDiskCache(budget_mb=disk_budget_mb)
+
+        # 当前显示的任务及其输出图片 [(缓存键, 图片)]
+        self.current: Optional[Tuple[str, str]] = None
+        self.current_images: List[Tuple[str, Tuple[str, str, str]]] = []
+        self.outputs_attempts = 0
+
+        # LRU：缓存键 -> QPixmap
+        self.pixmaps = OrderedDict()
+        self.pixmaps_bytes = 0
+        self.pending = set()
+        self.failed_keys = set()  # 加载失败的缩略图不再重试
+
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(2)
+        self.signals = ThumbnailSignals()
+        self.signals.outputs_found.connect(self._on_outputs_found)
+        self.signals.outputs_missing.connect(self._on_outputs_missing)
+        self.signals.decoded.connect(self._on_decoded)
+        self.signals.failed.connect(self._on_failed)
+
+    def request_outputs(self, server: str, prompt_id: str):
+        """显示某个已完成任务的输出（同一任务只查询一次）"""
+        if (server, prompt_id) == self.current:
+            return
+        self.current = (server, prompt_id)
+        self.current_images = []
+        self.outputs_attempts = 0
+        # 先清空上一个任务的缩略图，新任务没有输出或查询失败时不会残留
+        self.thumbnails_changed.emit()
+        self._query_outputs(self.current)
+
+    def _query_outputs(self, current: Tuple[str, str]):
+        """安排查询任务的输出（重试时任务已切换则放弃）"""
+        if current != self.current:
+            return
+        self.outputs_attempts += 1
+        self.thread_pool.start(OutputsTask(self.signals, *current))
+
+    def current_thumbnails(self) -> List[QPixmap]:
+        """当前任务已就绪的缩略图；已被淘汰的重新安排加载"""
+        thumbnails = []
+        for key, image in self.current_images:
+            pixmap = self.pixmaps.get(key)
+            if pixmap is not None:
+                self.pixmaps.move_to_end(key)
+                thumbnails.append(pixmap)
+            elif key not in self.failed_keys:
+                self._request(key, image)
+        return thumbnails
+
+    def memory_usage(self) -> int:
+        """LRU 中缩略图占用的字节数"""
+        return self.pixmaps_bytes
+
+    def _request(self, key: str, image: Tuple[str, str, str]):
+        """安排后台加载"""
+        if key in self.pending:
+            return
+        self.pending.add(key)
+        self.thread_pool.start(ThumbnailTask(self.signals, self.disk_cache, key, self.current[0], image, self.size))
+
+    def _store(self, key: str, pixmap: QPixmap):
+        """放入 LRU 并按内存上限淘汰，至少保留最近使用的一张"""
+        self.pixmaps[key] = pixmap
+        self.pixmaps_bytes += pixmap.width() * pixmap.height() * 4
+        while self.pixmaps_bytes > self.memory_budget and len(self.pixmaps) > 1:
+            _, old = self.pixmaps.popitem(last=False)
+            self.pixmaps_bytes -= old.width() * old.height() * 4
+
+    def _on_outputs_found(self, server: str, prompt_id: str, images: list):
+        """任务输出查询完成"""
+        if (server, prompt_id) != self.current:
+            return
+        self.current_images = [(thumbnail_key(server, *image, self.size), tuple(image))
+                               for image in images[:self.max_count]]
+        # 没有图片输出时同样通知，让进度窗口隐藏缩略图
+        self.current_thumbnails()
+        self.thumbnails_changed.emit()
+
+    def _on_outputs_missing(self, server: str, prompt_id: str):
+        """历史中还没有该任务：稍后重试"""
+        if (server, prompt_id) == self.current and self.outputs_attempts < self.OUTPUTS_RETRIES:
+            QTimer.singleShot(self.OUTPUTS_RETRY_DELAY, lambda current=self.current: self._query_outputs(current))
+
+    def _on_decoded(self, key: str, image: QImage):
+        """缩略图就绪（在 GUI 线程中转换为 QPixmap）"""
+        self.pending.discard(key)
+        if key not in self.pixmaps:
+            self._store(key, QPixmap.fromImage(image))
+        if any(key == current_key for current_key, _ in self.current_images):
+            self.thumbnails_changed.emit()
+
+    def _on_failed(self, key: str, message: str):
+        """缩略图加载失败"""
+        self.pending.discard(key)
+        self.failed_keys.add(key)
+        print(f"缩略图加载失败: {message}")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把旧版目录格式的宠物（编号的序列图片）打包为精灵图 + 清单
+
+在宠物目录中生成 sheet.png 和 pet.json，原有图片保留不动；
+存在 pet.json 时程序优先加载打包格式，删除 pet.json 即恢复使用序列图片。
+
+用法: python tools/pack_pet.py Girl meizi [--columns 10] [--duration 80]
+      python tools/pack_pet.py --all
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QGuiApplication, QImage, QPainter
+from pet_source import PET_MANIFEST, PET_STATES, find_frame_files, default_state_ranges
+
+SHEET_NAME = "sheet.png"
+
+
+def parse_range(text: str) -> list:
+    """解析 "起始-结束" 或单个帧号"""
+    start, _, end = text.partition("-")
+    return [int(start), int(end or start)]
+
+
+def format_manifest(manifest: dict) -> str:
+    """清单 JSON：每个键一行，帧区域每帧一行，便于手工编辑状态范围"""
+    lines = []
+    for key, value in manifest.items():
+        if key == "frames":
+            rows = ",\n".join(f"    {json.dumps(rect)}" for rect in value)
+            text = f"[\n{rows}\n  ]"
+        else:
+            text = json.dumps(value, ensure_ascii=False)
+        lines.append(f"  {json.dumps(key)}: {text}")
+    return "{\n" + ",\n".join(lines) + "\n}\n"
+
+
+def pack_pet(images_dir: str, pet_name: str, columns: int = 0, duration: int = 0,
+             states: dict = None) -> bool:
+    """打包一个宠物，返回是否成功"""
+    pet_dir = os.path.join(images_dir, pet_name)
+    image_files = find_frame_files(pet_dir, pet_name)
+    images = [QImage(image_file) for image_file in image_files]
+    images = [image for image in images if not image.isNull()]
+    if not images:
+        print(f"{pet_name}: 没有可打包的序列图片")
+        return False
+
+    # 按最大帧尺寸排成网格，各帧放在格子左上角
+    cell_width = max(image.width() for image in images)
+    cell_height = max(image.height() for image in images)
+    columns = columns or math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    sheet = QImage(cell_width * columns, cell_height * rows, QImage.Format_ARGB32)
+    sheet.fill(Qt.transparent)
+
+    frames = []
+    painter = QPainter(sheet)
+    painter.setCompositionMode(QPainter.CompositionMode_Source)
+    for index, image in enumerate(images):
+        x, y = index % columns * cell_width, index // columns * cell_height
+        painter.drawImage(x, y, image)
+        frames.append([x, y, image.width(), image.height()])
+    painter.end()
+
+    ranges = {state: list(frame_range) for state, frame_range in default_state_ranges(len(images)).items()}
+    ranges.update(states or {})
+    manifest = {"version": 1, "image": SHEET_NAME, "frames": frames, "states": ranges}
+    if duration:
+        manifest["durations"] = [duration] * len(frames)
+
+    sheet_path = os.path.join(pet_dir, SHEET_NAME)
+    if not sheet.save(sheet_path, "PNG"):
+        print(f"{pet_name}: 精灵图保存失败 {sheet_path}")
+        return False
+    with open(os.path.join(pet_dir, PET_MANIFEST), 'w', encoding='utf-8') as f:
+        f.write(format_manifest(manifest))
+
+    source_bytes = sum(os.path.getsize(image_file) for image_file in image_files)
+    print(f"{pet_name}: {len(images)} 帧 -> {sheet.width()}x{sheet.height()} "
+          f"({source_bytes / 1024:.0f} KB / {len(image_files)} 个文件 -> "
+          f"{os.path.getsize(sheet_path) / 1024:.0f} KB)")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把序列图片宠物打包为精灵图 + 清单")
+    parser.add_argument("pets", nargs="*", help="宠物名（images 下的目录名）")
+    parser.add_argument("--all", action="store_true", help="打包 images 下全部序列图片宠物")
+    parser.add_argument("--images-dir", default="images", help="宠物图片目录")
+    parser.add_argument("--columns", type=int, default=0, help="精灵图每行帧数，默认接近正方形")
+    parser.add_argument("--duration", type=int, default=0,
+                        help="每帧时长（毫秒），默认不写入，使用设置中的动画速度")
+    for state in PET_STATES:
+        parser.add_argument(f"--{state}", type=parse_range, metavar="START-END",
+                            help=f"{state} 状态的帧范围（包含两端）")
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv)
+
+    pets = list(args.pets)
+    if args.all:
+        pets += [name for name in sorted(os.listdir(args.images_dir))
+                 if find_frame_files(os.path.join(args.images_dir, name), name)]
+    if not pets:
+        parser.error("请指定宠物名或 --all")
+
+    states = {state: getattr(args, state) for state in PET_STATES
+              if getattr(args, state) is not None}
+    results = [pack_pet(args.images_dir, pet, args.columns, args.duration, states) for pet in pets]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+统计每个宠物的帧内存占用
+
+对比逐帧 ARGB、去重后的连续存储和索引色存储所需的字节数，
+超出帧内存上限（默认取 config.json 中的 pet_settings.frame_memory_budget_mb）的宠物标记出来，
+存在超出上限的宠物时退出码为 1。
+
+用法: python tools/pet_memory.py [Girl meizi] [--scale 1.5] [--budget 16]
+"""
+
+import argparse
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtGui import QGuiApplication
+from config import ConfigManager
+from frame_provider import decode_frame, scale_frame
+from frame_store import FrameStore
+from pet_source import load_pet_source
+
+
+def pet_frames(pet_name: str, images_dir: str, scale: float) -> list:
+    """按显示比例解码宠物的全部帧（复制为独立的图像，不引用随 source 释放的精灵图）"""
+    source = load_pet_source(pet_name, images_dir)
+    if source is None:
+        return []
+    if source.frames is not None:
+        return [scale_frame(image, scale).copy() for image in source.frames]
+    images = [decode_frame(image_file, scale) for image_file in source.image_files]
+    return [image for image in images if not image.isNull()]
+
+
+def main():
+    config_manager = ConfigManager()
+    parser = argparse.ArgumentParser(description="统计每个宠物的帧内存占用")
+    parser.add_argument("pets", nargs="*", help="宠物名，默认全部")
+    parser.add_argument("--images-dir", default="images", help="宠物图片目录")
+    parser.add_argument("--scale", type=float, default=config_manager.get("pet_settings.size_scale", 1.0),
+                        help="显示比例")
+    parser.add_argument("--budget", type=float,
+                        default=config_manager.get("pet_settings.frame_memory_budget_mb", 64),
+                        help="帧内存上限（MB）")
+    args = parser.parse_args()
+
+    app = QGuiApplication(sys.argv)
+
+    pets = args.pets or sorted(config_manager.get_available_pets())
+    budget = args.budget * 1024 * 1024
+    kb = 1024
+    print(f"{'宠物':<16}{'帧数':>6}{'去重后':>8}{'逐帧 ARGB':>12}{'连续存储':>12}{'索引色':>12}")
+    over_budget = []
+    for pet in pets:
+        images = pet_frames(pet, args.images_dir, args.scale)
+        if not images:
+            print(f"{pet:<16}  没有可用的帧")
+            continue
+        raw_bytes = sum(image.width() * image.height() * 4 for image in images)
+        store = FrameStore.build(images)
+        indexed = FrameStore.build(images, indexed=True)
+        indexed_text = f"{indexed.byte_size() / kb:.0f} KB" if indexed.is_indexed() else "颜色过多"
+        smallest = min(store.byte_size(), indexed.byte_size())
+        flag = "  超出上限" if smallest > budget else ""
+        if flag:
+            over_budget.append(pet)
+        print(f"{pet:<16}{len(images):>6}{store.unique_count():>8}{raw_bytes / kb:>9.0f} KB"
+              f"{store.byte_size() / kb:>9.0f} KB{indexed_text:>12}{flag}")
+
+    print(f"\n显示比例 {args.scale:g}，帧内存上限 {args.budget:g} MB")
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
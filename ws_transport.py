@@ -0,0 +1,323 @@
+import json
+import struct
+import uuid
+from typing import Dict, Any, Optional
+from PyQt5.QtCore import QObject, QUrl, QTimer, QByteArray, pyqtSignal
+from PyQt5.QtWebSockets import QWebSocket
+from PyQt5.QtNetwork import QAbstractSocket
+
+# 二进制消息类型（消息开头 4 字节，大端）
+PREVIEW_IMAGE = 1  # 之后 4 字节为图片格式，再之后是图片数据
+PREVIEW_IMAGE_WITH_METADATA = 4  # 之后 4 字节为元数据 JSON 长度，再之后是元数据和图片数据
+
+# PREVIEW_IMAGE 的图片格式编号
+PREVIEW_FORMATS = {1: "jpeg", 2: "png"}
+
+class ComfyUIEventModel:
+    """把 ComfyUI /ws 事件转换为 /task_monitor/status 相同结构的状态模型"""
+
+    def __init__(self):
+        self.payload = self._idle_payload()
+        self.node_types = {}  # node_id -> node_type，从 HTTP 同步数据中学习
+        self.cached_nodes = set()
+        self.finished_nodes = set()
+        self.current_node = None
+
+    @staticmethod
+    def _idle_payload() -> Dict[str, Any]:
+        """空闲状态数据"""
+        return {
+            "status": "idle",
+            "task_id": None,
+            "workflow_progress": {"total_nodes": 0, "executed_nodes": 0},
+            "current_task_progress": None,
+            "queue": {"running_count": 0, "pending_count": 0},
+            "error_info": None
+        }
+
+    def sync(self, data: Dict[str, Any]):
+        """用一次完整的 HTTP 状态数据重置模型"""
+        if data.get("task_id") != self.payload.get("task_id"):
+            self.cached_nodes = set()
+            self.finished_nodes = set()
+            self.current_node = None
+
+        self.payload = self._idle_payload()
+        self.payload.update(data)
+        # 复制嵌套字段：之后的事件会原地修改模型，不能影响已发布（或已录制）的数据
+        for field in ("workflow_progress", "queue", "current_task_progress"):
+            if isinstance(self.payload.get(field), dict):
+                self.payload[field] = dict(self.payload[field])
+
+        current = data.get("current_task_progress")
+        if current and current.get("node_id") is not None:
+            self.current_node = str(current.get("node_id"))
+            if current.get("node_type"):
+                self.node_types[self.current_node] = current["node_type"]
+
+    def apply_event(self, event_type: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """应用一个事件，状态有变化时返回新的状态数据，否则返回 None"""
+        prompt_id = data.get("prompt_id")
+
+        if event_type == "status":
+            exec_info = (data.get("status") or {}).get("exec_info") or {}
+            remaining = exec_info.get("queue_remaining")
+            if remaining is None:
+                return None
+            queue = self.payload["queue"]
+            running = 1 if self.payload["status"] == "running" else 0
+            queue["running_count"] = min(running, remaining)
+            queue["pending_count"] = max(0, remaining - running)
+            return self.snapshot()
+
+        if event_type == "execution_start":
+            total_nodes = 0
+            if prompt_id == self.payload.get("task_id"):
+                total_nodes = self.payload["workflow_progress"].get("total_nodes", 0)
+            queue = self.payload["queue"]
+            self.payload.update({
+                "status": "running",
+                "task_id": prompt_id,
+                "workflow_progress": {"total_nodes": total_nodes, "executed_nodes": 0},
+                "current_task_progress": None,
+                "error_info": None
+            })
+            queue["running_count"] = 1
+            self.cached_nodes = set()
+            self.finished_nodes = set()
+            self.current_node = None
+            return self.snapshot()
+
+        # 其余事件只处理当前任务
+        if prompt_id is not None and prompt_id != self.payload.get("task_id"):
+            return None
+
+        if event_type == "execution_cached":
+            self.cached_nodes.update(str(node) for node in data.get("nodes", []))
+            self._update_executed_count()
+            return self.snapshot()
+
+        if event_type == "executing":
+            node = data.get("node")
+            if self.current_node is not None:
+                self.finished_nodes.add(self.current_node)
+            if node is None:
+                # 旧版 ComfyUI 用 node=None 表示任务结束
+                self.current_node = None
+                return self._finish("completed")
+            self.current_node = str(node)
+            self.payload["current_task_progress"] = {
+                "node_id": self.current_node,
+                "node_type": self.node_types.get(self.current_node, self.current_node),
+                "step": 0,
+                "total_steps": 0
+            }
+            self._update_executed_count()
+            return self.snapshot()
+
+        if event_type == "progress":
+            node = data.get("node")
+            node_id = str(node) if node is not None else self.current_node
+            self.payload["current_task_progress"] = {
+                "node_id": node_id,
+                "node_type": self.node_types.get(node_id, node_id),
+                "step": data.get("value", 0),
+                "total_steps": data.get("max", 0)
+            }
+            return self.snapshot()
+
+        if event_type == "executed":
+            node = data.get("node")
+            if node is not None:
+                self.finished_nodes.add(str(node))
+                self._update_executed_count()
+                return self.snapshot()
+            return None
+
+        if event_type == "execution_success":
+            if self.current_node is not None:
+                self.finished_nodes.add(self.current_node)
+                self.current_node = None
+            return self._finish("completed")
+
+        if event_type in ("execution_error", "execution_interrupted"):
+            if event_type == "execution_error":
+                message = data.get("exception_message", "")
+            else:
+                message = "任务已中断"
+            self.payload["error_info"] = {
+                "node_id": data.get("node_id"),
+                "node_type": data.get("node_type"),
+                "message": message
+            }
+            self.current_node = None
+            return self._finish("error")
+
+        return None
+
+    def _update_executed_count(self):
+        """根据缓存节点和已完成节点更新执行计数"""
+        workflow = self.payload["workflow_progress"]
+        executed = len(self.cached_nodes | self.finished_nodes)
+        workflow["executed_nodes"] = executed
+        if workflow.get("total_nodes", 0) < executed:
+            workflow["total_nodes"] = executed
+
+    def _finish(self, status: str) -> Dict[str, Any]:
+        """任务结束"""
+        workflow = self.payload["workflow_progress"]
+        if status == "completed":
+            self._update_executed_count()
+            workflow["executed_nodes"] = max(workflow["executed_nodes"], workflow.get("total_nodes", 0))
+        self.payload["status"] = status
+        self.payload["current_task_progress"] = None
+        self.payload["queue"]["running_count"] = 0
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前状态数据的副本"""
+        data = dict(self.payload)
+        data["workflow_progress"] = dict(self.payload["workflow_progress"])
+        data["queue"] = dict(self.payload["queue"])
+        if self.payload.get("current_task_progress"):
+            data["current_task_progress"] = dict(self.payload["current_task_progress"])
+        return data
+
+
+class WebSocketTransport(QObject):
+    """订阅 ComfyUI /ws 事件流的推送通道"""
+
+    # 信号定义
+    payload_ready = pyqtSignal(dict)  # 新的状态数据
+    resync_requested = pyqtSignal()  # 需要通过 HTTP 拉取一次完整状态
+    connected_changed = pyqtSignal(bool)  # 连接状态变化
+    preview_frame = pyqtSignal(QByteArray, int, str)  # 实时预览帧 (收到的消息, 图片数据偏移, 图片格式)
+
+    def __init__(self, base_url: str, reconnect_interval: int = 5000, parent=None):
+        super().__init__(parent)
+        self.base_url = base_url.rstrip('/')
+        self.client_id = uuid.uuid4().hex
+        self.model = ComfyUIEventModel()
+        self.is_connected = False
+        self.enabled = False
+
+        self.socket = QWebSocket()
+        self.socket.connected.connect(self._on_connected)
+        self.socket.disconnected.connect(self._on_disconnected)
+        self.socket.textMessageReceived.connect(self._on_text_message)
+        self.socket.binaryMessageReceived.connect(self._on_binary_message)
+        self.socket.error.connect(self._on_error)
+
+        self.reconnect_timer = QTimer()
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.setInterval(reconnect_interval)
+        self.reconnect_timer.timeout.connect(self._open)
+
+    def ws_url(self) -> str:
+        """由 HTTP 地址推导 WebSocket 地址"""
+        if self.base_url.startswith("https://"):
+            url = "wss://" + self.base_url[len("https://"):]
+        elif self.base_url.startswith("http://"):
+            url = "ws://" + self.base_url[len("http://"):]
+        else:
+            url = "ws://" + self.base_url
+        return f"{url}/ws?clientId={self.client_id}"
+
+    def start(self):
+        """开始连接"""
+        self.enabled = True
+        if self.socket.state() == QAbstractSocket.UnconnectedState:
+            self._open()
+
+    def stop(self):
+        """断开连接并停止重连"""
+        self.enabled = False
+        self.reconnect_timer.stop()
+        self.socket.abort()
+        self._set_connected(False)
+
+    def set_base_url(self, url: str):
+        """设置服务器 URL，已连接时重新连接"""
+        url = url.rstrip('/')
+        if url == self.base_url:
+            return
+        self.base_url = url
+        self.model = ComfyUIEventModel()
+        if self.enabled:
+            self.socket.abort()
+            self._open()
+
+    def sync(self, data: Dict[str, Any]):
+        """用 HTTP 拉取的完整状态同步事件模型"""
+        self.model.sync(data)
+
+    def _open(self):
+        """打开连接"""
+        if self.enabled:
+            self.socket.open(QUrl(self.ws_url()))
+
+    def _set_connected(self, connected: bool):
+        """更新连接状态"""
+        if connected != self.is_connected:
+            self.is_connected = connected
+            self.connected_changed.emit(connected)
+
+    def _on_connected(self):
+        """连接成功，先同步一次完整状态"""
+        self._set_connected(True)
+        self.resync_requested.emit()
+
+    def _on_disconnected(self):
+        """连接断开，稍后重连"""
+        self._set_connected(False)
+        if self.enabled and not self.reconnect_timer.isActive():
+            self.reconnect_timer.start()
+
+    def _on_error(self, _):
+        """连接错误（包括首次连接失败）"""
+        self._on_disconnected()
+
+    def _on_text_message(self, message: str):
+        """处理文本事件"""
+        try:
+            event = json.loads(message)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(event, dict):
+            return
+
+        event_type = event.get("type")
+        data = event.get("data") or {}
+        if not isinstance(data, dict):
+            return
+        payload = self.model.apply_event(event_type, data)
+
+        # 队列变化或新任务开始时需要补齐总节点数等信息
+        if event_type in ("status", "execution_start"):
+            self.resync_requested.emit()
+
+        if payload is not None:
+            self.payload_ready.emit(payload)
+
+    def _on_binary_message(self, message: QByteArray):
+        """处理二进制消息：只解析消息头，图片数据连同消息缓冲区原样转交，不做复制"""
+        if message.size() < 8:
+            return
+        event_type, value = struct.unpack(">II", message.left(8).data())
+
+        if event_type == PREVIEW_IMAGE:
+            image_format = PREVIEW_FORMATS.get(value)
+            if image_format:
+                self.preview_frame.emit(message, 8, image_format)
+        elif event_type == PREVIEW_IMAGE_WITH_METADATA and message.size() >= 8 + value:
+            try:
+                metadata = json.loads(message.mid(8, value).data())
+            except ValueError:
+                return
+            if not isinstance(metadata, dict):
+                return
+            prompt_id = metadata.get("prompt_id")
+            if prompt_id is not None and prompt_id != self.model.payload.get("task_id"):
+                return
+            image_format = str(metadata.get("image_type", "image/jpeg")).split("/")[-1]
+            self.preview_frame.emit(message, 8 + value, image_format)